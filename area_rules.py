@@ -0,0 +1,127 @@
+import re
+import unicodedata
+from utils import carregar_config
+
+# Regras usadas quando config/areas.json não existe
+REGRAS_PADRAO = {
+    "areas": [
+        {"chave": "PRODUÇÃO", "rotulo": "Produção", "servidores": 1, "funcoes": ["PRODUÇÃO"], "palavras": ["PRODUÇÃO", "PRODUCAO"]},
+        {"chave": "FILMAGEM", "rotulo": "Filmagem", "servidores": 3, "funcoes": ["Filmagem", "Suporte Filmagem"], "prefixos": ["FILM"]},
+        {"chave": "PROJEÇÃO", "rotulo": "Projeção", "servidores": 1, "funcoes": ["PROJEÇÃO"], "prefixos": ["PROJE"]},
+        {"chave": "TAKE", "rotulo": "Take", "servidores": 2, "funcoes": ["Fotografo", "Suporte"], "palavras": ["TAKE"]},
+        {"chave": "ILUMINAÇÃO", "rotulo": "Iluminação", "servidores": 1, "funcoes": ["ILUMINAÇÃO"], "prefixos": ["ILUMIN"]},
+    ],
+    "sinonimos": {"FOTO": "TAKE", "FOTOGRAF": "TAKE", "LUZ": "ILUMINAÇÃO"},
+}
+
+_PALAVRA = re.compile(r"\w+")
+
+def _vazia(resposta):
+    """Resposta em branco (None, NaN ou pd.NA), sem depender do pandas."""
+    try:
+        return resposta is None or bool(resposta != resposta)
+    except TypeError:
+        # pd.NA não tem valor lógico
+        return True
+
+def _comparavel(texto):
+    """Texto sem acentos e sem diferença de caixa, para comparar nomes de áreas."""
+    return unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii").strip().casefold()
+
+class RegistroAreas:
+    """
+    Regras de correspondência de 'ÁREA DE ATUAÇÃO' compiladas em máscaras de bits.
+
+    Cada área ocupa um bit, na ordem da configuração. Palavras exatas e
+    sinônimos viram um dicionário palavra→máscara; prefixos são testados uma
+    vez por palavra distinta. Tanto palavras quanto respostas completas são
+    memorizadas, então o custo cresce com o número de respostas distintas.
+    """
+
+    def __init__(self, config):
+        self.areas = config["areas"]
+        self.chaves = [area["chave"] for area in self.areas]
+        self.bits = {chave: 1 << i for i, chave in enumerate(self.chaves)}
+        self.rotulos = {area["chave"]: area.get("rotulo", area["chave"]) for area in self.areas}
+        self.servidores = {area["chave"]: area.get("servidores", 1) for area in self.areas}
+        self.funcoes = {area["chave"]: area.get("funcoes") or [area["chave"]] for area in self.areas}
+
+        self._exatas = {}
+        for area in self.areas:
+            for palavra in area.get("palavras", []):
+                self._exatas[palavra.upper()] = self._exatas.get(palavra.upper(), 0) | self.bits[area["chave"]]
+        for palavra, chave in config.get("sinonimos", {}).items():
+            self._exatas[palavra.upper()] = self._exatas.get(palavra.upper(), 0) | self.bits[chave]
+
+        self._prefixos = [
+            (prefixo.upper(), self.bits[area["chave"]])
+            for area in self.areas for prefixo in area.get("prefixos", [])
+        ]
+
+        self._area_por_funcao = {
+            funcao: chave for chave, funcoes in self.funcoes.items() for funcao in funcoes
+        }
+
+        self._cache_palavras = {}
+        self._cache_respostas = {}
+
+    def _classificar_palavra(self, palavra):
+        mascara = self._cache_palavras.get(palavra)
+        if mascara is None:
+            mascara = self._exatas.get(palavra, 0)
+            for prefixo, bit in self._prefixos:
+                if palavra.startswith(prefixo):
+                    mascara |= bit
+            self._cache_palavras[palavra] = mascara
+        return mascara
+
+    def classificar(self, area_atuacao):
+        """Retorna a máscara de áreas correspondente a uma resposta."""
+        if _vazia(area_atuacao):
+            return 0
+        mascara = self._cache_respostas.get(area_atuacao)
+        if mascara is None:
+            mascara = 0
+            for palavra in _PALAVRA.findall(str(area_atuacao).upper()):
+                mascara |= self._classificar_palavra(palavra)
+            self._cache_respostas[area_atuacao] = mascara
+        return mascara
+
+    def matriz_elegibilidade(self, respostas, areas):
+        """Matriz booleana resposta×área, classificando cada resposta distinta uma única vez."""
+        # Importados aqui, uma vez por planilha: o módulo carrega na abertura do app, antes do numpy
+        import numpy as np
+        import pandas as pd
+
+        codigos, unicas = pd.factorize(pd.Series(respostas, dtype=object))
+        mascaras_unicas = np.array([self.classificar(r) for r in unicas] + [0], dtype=np.int64)
+        # Código -1 (resposta vazia) aponta para a última posição, de máscara 0
+        mascaras = mascaras_unicas[codigos]
+        bits = np.array([self.bits[area] for area in areas], dtype=np.int64)
+        return (mascaras[:, None] & bits[None, :]) != 0
+
+    def nome_funcao(self, area, posicao):
+        """Nome da função exibida para a posição de um slot dentro da área."""
+        funcoes = self.funcoes[area]
+        return funcoes[min(posicao, len(funcoes) - 1)]
+
+    def area_da_funcao(self, funcao):
+        """Área de origem de uma função da escala."""
+        return self._area_por_funcao.get(funcao, funcao)
+
+    def chave_da_area(self, nome):
+        """Chave da área pelo nome ou rótulo, sem diferenciar acentos e caixa; None se não houver."""
+        alvo = _comparavel(nome)
+        for chave in self.chaves:
+            if alvo in (_comparavel(chave), _comparavel(self.rotulos[chave])):
+                return chave
+        return None
+
+_registro = None
+
+def obter_registro():
+    """Registro de áreas da configuração, compilado uma única vez por processo."""
+    global _registro
+    if _registro is None:
+        _registro = RegistroAreas(carregar_config("areas.json", REGRAS_PADRAO))
+    return _registro
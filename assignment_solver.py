@@ -0,0 +1,188 @@
+import sys
+
+def resolver_escala_otima(candidatos, vagas, num_datas, max_turnos, fixos=(), carga_inicial=None,
+                          ao_iniciar_fase=None, sobrepostas=None, limites=None, exclusoes=None,
+                          carga_por_data=None, preferidos=None):
+    """
+    Distribui os voluntários em todas as datas de uma vez, maximizando os slots preenchidos.
+
+    O mês é modelado como um fluxo: origem → voluntário (capacidade max_turnos)
+    → voluntário×data (capacidade 1, uma função por dia) → data×área
+    (capacidade vagas[área]) → destino. O fluxo máximo é obtido por caminhos
+    aumentantes em fases: na fase k cada voluntário pode ter até k turnos.
+    Caminhos aumentantes nunca removem um voluntário já escalado, então o
+    resultado maximiza primeiro quantas pessoas servem e depois o total de
+    slots preenchidos, equilibrando a carga entre os voluntários. Com
+    `preferidos`, cada fase começa por caminhos que só usam quem prefere a
+    área do slot; a passada seguinte, com todos os candidatos, só tira alguém
+    da área preferida se isso preencher mais um slot.
+
+    candidatos: dict (indice_data, area) -> sequência de ids de voluntários.
+    vagas: dict area -> número de slots da área em cada data, ou
+    dict (indice_data, area) -> número de slots só daquela data e área.
+    fixos: sequência de (indice_data, area, id) que não podem ser alterados.
+    carga_inicial: dict id -> turnos já feitos fora destas datas, que contam
+    para max_turnos.
+    ao_iniciar_fase: chamado com o número de cada fase; uma exceção levantada
+    nele interrompe a busca.
+    sobrepostas: dict indice_data -> índices das datas com horário sobreposto;
+    quem serve em uma delas não pode servir nesta (além de uma função por data).
+    limites: dict id -> máximo de turnos do voluntário, no lugar de max_turnos.
+    exclusoes: dict id -> ids que não podem servir na mesma data que ele.
+    carga_por_data: dict indice_data -> dict id -> turnos já feitos fora
+    destas datas que contam para o limite só naquela data (ex.: os
+    publicados no mês dela).
+    preferidos: dict (indice_data, area) -> ids, entre os candidatos, que
+    preferem a área.
+
+    Retorna dict (indice_data, area) -> lista de ids atribuídos, com os fixos primeiro.
+    """
+    if all(isinstance(chave, tuple) for chave in vagas):
+        vagas_por_chave = vagas.items()
+    else:
+        vagas_por_chave = (((indice_data, area), num_servidores)
+                           for indice_data in range(num_datas) for area, num_servidores in vagas.items())
+
+    slots = []
+    for chave, num_servidores in vagas_por_chave:
+        slots.extend(chave for _ in range(num_servidores))
+
+    indice_slots = {}
+    for slot, chave in enumerate(slots):
+        indice_slots.setdefault(chave, []).append(slot)
+
+    ocupante = [None] * len(slots)
+    fixo = [False] * len(slots)
+    carga = dict(carga_inicial or {})
+    slot_no_dia = {}
+    slots_da_pessoa = {}
+    sobrepostas = sobrepostas or {}
+    limites = limites or {}
+    exclusoes = exclusoes or {}
+    carga_por_data = carga_por_data or {}
+    # Sem sobreposições nem exclusões, basta olhar a própria data
+    restrito = bool(sobrepostas or exclusoes)
+    # Teto de turnos na fase atual, para quem tem limite próprio e para os demais (refeitos a cada fase)
+    tetos = {}
+    teto_padrao = max_turnos
+
+    def bloqueios(pessoa, indice_data):
+        """
+        Slots que impedem a pessoa de servir na data: o dela na própria data,
+        os dela em horário sobreposto e os de quem não pode servir com ela.
+        """
+        slot = slot_no_dia.get((pessoa, indice_data))
+        bloqueando = [] if slot is None else [slot]
+        for outra in sobrepostas.get(indice_data, ()):
+            slot = slot_no_dia.get((pessoa, outra))
+            if slot is not None:
+                bloqueando.append(slot)
+        for outra_pessoa in exclusoes.get(pessoa, ()):
+            slot = slot_no_dia.get((outra_pessoa, indice_data))
+            if slot is not None:
+                bloqueando.append(slot)
+        return bloqueando
+
+    def atribuir(slot, pessoa):
+        anterior = ocupante[slot]
+        indice_data = slots[slot][0]
+        if anterior is not None:
+            carga[anterior] -= 1
+            del slot_no_dia[(anterior, indice_data)]
+            slots_da_pessoa[anterior].discard(slot)
+        ocupante[slot] = pessoa
+        carga[pessoa] = carga.get(pessoa, 0) + 1
+        slot_no_dia[(pessoa, indice_data)] = slot
+        slots_da_pessoa.setdefault(pessoa, set()).add(slot)
+
+    for indice_data, area, pessoa in fixos:
+        livres = [s for s in indice_slots.get((indice_data, area), []) if ocupante[s] is None]
+        if livres and not bloqueios(pessoa, indice_data):
+            atribuir(livres[0], pessoa)
+            fixo[livres[0]] = True
+
+    # Candidatos da passada atual: só os que preferem a área, depois todos
+    candidatos_passada = candidatos
+
+    def aumentar(slot, visitados_dia, visitados_pessoa):
+        indice_data = slots[slot][0]
+        candidatos_slot = candidatos_passada.get(slots[slot], ())
+        externa = carga_por_data.get(indice_data)
+
+        def turnos(pessoa):
+            # Turnos que contam para o limite da pessoa nesta data
+            return carga.get(pessoa, 0) + externa.get(pessoa, 0) if externa else carga.get(pessoa, 0)
+
+        # Antes de buscar caminhos longos, procura alguém livre diretamente
+        for pessoa in candidatos_slot:
+            if (turnos(pessoa) < tetos.get(pessoa, teto_padrao) and (pessoa, indice_data) not in slot_no_dia
+                    and not (restrito and bloqueios(pessoa, indice_data))):
+                atribuir(slot, pessoa)
+                return True
+
+        for pessoa in candidatos_slot:
+            chave = (pessoa, indice_data)
+            if chave in visitados_dia:
+                continue
+            visitados_dia.add(chave)
+
+            bloqueando = bloqueios(pessoa, indice_data)
+            if len(bloqueando) > 1:
+                continue
+            teto = tetos.get(pessoa, teto_padrao)
+            if bloqueando:
+                # Já serve nessa data ou em horário sobreposto, ou alguém que não pode servir
+                # com ela está na data: tenta mover a outra função para outra pessoa
+                outro_slot = bloqueando[0]
+                propria = ocupante[outro_slot] == pessoa
+                if not propria and turnos(pessoa) >= teto:
+                    continue
+                if (not fixo[outro_slot] and aumentar(outro_slot, visitados_dia, visitados_pessoa)
+                        and not bloqueios(pessoa, indice_data) and (propria or turnos(pessoa) < teto)):
+                    atribuir(slot, pessoa)
+                    return True
+            elif turnos(pessoa) < teto:
+                atribuir(slot, pessoa)
+                return True
+            elif pessoa not in visitados_pessoa:
+                # Atingiu o limite: tenta liberar um turno dela em outra data
+                visitados_pessoa.add(pessoa)
+                for outro_slot in list(slots_da_pessoa.get(pessoa, ())):
+                    chave_outra = (pessoa, slots[outro_slot][0])
+                    if fixo[outro_slot] or chave_outra in visitados_dia:
+                        continue
+                    visitados_dia.add(chave_outra)
+                    if (aumentar(outro_slot, visitados_dia, visitados_pessoa) and not bloqueios(pessoa, indice_data)
+                            and turnos(pessoa) < teto):
+                        atribuir(slot, pessoa)
+                        return True
+        return False
+
+    # Slots com menos candidatos primeiro: são os que mais dependem de quem está livre
+    ordem = sorted(range(len(slots)), key=lambda s: len(candidatos.get(slots[s], ())))
+
+    passadas = (preferidos, candidatos) if preferidos else (candidatos,)
+
+    limite_recursao = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limite_recursao, 2 * len(slots) + 100))
+    try:
+        for limite in range(1, max([max_turnos, *limites.values()]) + 1):
+            if ao_iniciar_fase is not None:
+                ao_iniciar_fase(limite)
+            tetos = {pessoa: min(limite, teto) for pessoa, teto in limites.items()}
+            teto_padrao = min(limite, max_turnos)
+            for candidatos_passada in passadas:
+                # Enquanto nenhuma atribuição muda, o que uma busca sem sucesso
+                # visitou continua sem caminho aumentante e pode ser reaproveitado
+                visitados_dia, visitados_pessoa = set(), set()
+                for slot in ordem:
+                    if ocupante[slot] is None and aumentar(slot, visitados_dia, visitados_pessoa):
+                        visitados_dia, visitados_pessoa = set(), set()
+    finally:
+        sys.setrecursionlimit(limite_recursao)
+
+    atribuicoes = {}
+    for chave, slots_chave in indice_slots.items():
+        slots_chave = sorted(slots_chave, key=lambda s: not fixo[s])
+        atribuicoes[chave] = [ocupante[s] for s in slots_chave if ocupante[s] is not None]
+    return atribuicoes
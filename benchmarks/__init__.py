@@ -0,0 +1,10 @@
+"""
+Benchmarks do PibShift.
+
+- gerador: planilhas sintéticas no formato do Google Forms e escalas prontas;
+- bench_pipeline: leitura, geração, conflitos e exportadores por faixa de tamanho, com saída JSON;
+- bench_pdf: limite de tempo do PDF de uma escala grande;
+- bench_startup: limite de tempo de abertura do aplicativo.
+
+Rodar a partir da raiz do projeto, ex.: python -m benchmarks.bench_pipeline --saida resultados.json
+"""
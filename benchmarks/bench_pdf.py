@@ -0,0 +1,46 @@
+"""
+Benchmark do exportador de PDF com uma escala sintética grande.
+
+Uso:
+    python -m benchmarks.bench_pdf [--slots 5000] [--limite 3.0]
+
+Gera uma escala com o número de slots pedido, exporta nos layouts tabela e
+mural e falha (código 1) se algum deles passar do limite de segundos.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.gerador import gerar_escala
+from export_manager import exportar_pdf
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de exportação do PDF.")
+    parser.add_argument('--slots', type=int, default=5000, help="Número de slots da escala (padrão: 5000)")
+    parser.add_argument('--limite', type=float, default=3.0, help="Tempo máximo por layout em segundos (padrão: 3.0)")
+    args = parser.parse_args(argv)
+
+    escala_df = gerar_escala(args.slots)
+    estourou = False
+    with tempfile.TemporaryDirectory() as pasta:
+        for layout in ('tabela', 'mural'):
+            caminho = os.path.join(pasta, f"{layout}.pdf")
+            inicio = time.perf_counter()
+            success, message = exportar_pdf(escala_df, caminho, layout=layout)
+            duracao = time.perf_counter() - inicio
+            if not success:
+                print(f"❌ {layout}: {message}")
+                estourou = True
+                continue
+            status = "✅" if duracao <= args.limite else "❌"
+            estourou |= duracao > args.limite
+            print(f"{status} {layout:<7} {args.slots} slots em {duracao:.2f}s "
+                  f"({os.path.getsize(caminho) / 1024:.0f} KB, limite {args.limite:.1f}s)")
+    return 1 if estourou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
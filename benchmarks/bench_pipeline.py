@@ -0,0 +1,184 @@
+"""
+Benchmark do pipeline completo por faixa de tamanho.
+
+Uso:
+    python -m benchmarks.bench_pipeline [--niveis pequeno,medio,grande] [--repeticoes 3]
+                                        [--saida resultados.json] [--comparar anterior.json]
+
+Para cada nível, gera uma planilha do Forms (ver gerador) e mede
+ler_planilha (sem e com cache), gerar_rascunho nos dois modos,
+verificar_conflitos e todos os exportadores. Os resultados vão para um
+JSON com a versão do código e da máquina; com --comparar, as medianas são
+comparadas às de um JSON anterior e o código de saída é 1 se alguma etapa
+ficou mais lenta que a tolerância (ignorando diferenças de poucos ms).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Diferenças menores que isto são ruído de medição e não contam como regressão
+DIFERENCA_MINIMA_S = 0.002
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# (voluntários, cultos) de cada nível
+NIVEIS = {
+    'pequeno': (60, 8),
+    'medio': (300, 26),
+    'grande': (1500, 104),
+}
+
+def _versao_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _medir(funcao, repeticoes):
+    """Executa `funcao` `repeticoes` vezes e retorna (tempos, último resultado)."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+def medir_nivel(nivel, num_voluntarios, num_datas, repeticoes, pasta):
+    """Mede todas as etapas de um nível e retorna a lista de resultados."""
+    import sheet_cache
+    from benchmarks.gerador import gerar_respostas, salvar_planilha
+    from core_logic import ler_planilha, gerar_rascunho, verificar_conflitos
+    from export_manager import (exportar_pdf, exportar_xlsx, exportar_ics, copiar_whatsapp,
+                                exportar_por_voluntario)
+
+    planilha = salvar_planilha(gerar_respostas(num_voluntarios, num_datas), os.path.join(pasta, f"{nivel}.xlsx"))
+    sheet_cache.CACHE_DIR = os.path.join(pasta, "cache")
+    resultados = []
+
+    def registrar(etapa, tempos, **detalhes):
+        resultados.append({
+            'nivel': nivel,
+            'etapa': etapa,
+            'mediana_s': statistics.median(tempos),
+            'minimo_s': min(tempos),
+            'repeticoes': len(tempos),
+            **detalhes,
+        })
+        print(f"  {nivel:<8} {etapa:<24} {statistics.median(tempos) * 1000:>10.1f} ms")
+
+    tempos, (df, error) = _medir(lambda: ler_planilha(planilha, usar_cache=False), repeticoes)
+    if error:
+        raise RuntimeError(error)
+    registrar('ler_planilha', tempos, linhas=len(df), colunas=len(df.columns))
+
+    # Primeira leitura grava o cache; as medidas seguintes são todas de acerto no cache
+    ler_planilha(planilha)
+    tempos, _ = _medir(lambda: ler_planilha(planilha), repeticoes)
+    registrar('ler_planilha_cache', tempos)
+
+    escalas = {}
+    for modo in ('guloso', 'otimo'):
+        tempos, (rascunho, _, error) = _medir(lambda: gerar_rascunho(df, None, modo), repeticoes)
+        if error:
+            raise RuntimeError(error)
+        escalas[modo] = rascunho
+        registrar(f'gerar_rascunho_{modo}', tempos, slots=len(rascunho))
+
+    escala = escalas['guloso']
+    tempos, conflitos = _medir(lambda: verificar_conflitos(escala), repeticoes)
+    registrar('verificar_conflitos', tempos, conflitos=len(conflitos))
+
+    tempos, escala_df = _medir(escala.para_dataframe, repeticoes)
+    registrar('escala_para_dataframe', tempos)
+
+    exportadores = [
+        ('exportar_pdf_tabela', lambda: exportar_pdf(escala_df, os.path.join(pasta, 'escala.pdf'))),
+        ('exportar_pdf_mural', lambda: exportar_pdf(escala_df, os.path.join(pasta, 'mural.pdf'), layout='mural')),
+        ('exportar_xlsx', lambda: exportar_xlsx(escala_df, os.path.join(pasta, 'escala.xlsx'))),
+        ('exportar_ics', lambda: exportar_ics(escala_df, os.path.join(pasta, 'escala.ics'))),
+        ('copiar_whatsapp', lambda: (True, copiar_whatsapp(escala_df))),
+        ('exportar_por_voluntario', lambda: exportar_por_voluntario(escala_df, os.path.join(pasta, 'individuais.zip'))),
+    ]
+    for etapa, exportar in exportadores:
+        tempos, (success, message) = _medir(exportar, repeticoes)
+        if not success:
+            raise RuntimeError(message)
+        registrar(etapa, tempos)
+
+    return resultados
+
+def comparar(resultados, anterior, tolerancia):
+    """Imprime a variação de cada etapa e retorna as que pioraram mais que `tolerancia`."""
+    base = {(r['nivel'], r['etapa']): r['mediana_s'] for r in anterior['resultados']}
+    regressoes = []
+    print(f"\nComparação com {anterior.get('versao') or 'resultado anterior'}:")
+    for r in resultados:
+        chave = (r['nivel'], r['etapa'])
+        if chave not in base or base[chave] <= 0:
+            continue
+        razao = r['mediana_s'] / base[chave]
+        piorou = razao > 1 + tolerancia and r['mediana_s'] - base[chave] > DIFERENCA_MINIMA_S
+        if piorou:
+            regressoes.append(chave)
+        print(f"  {'❌' if piorou else '  '} {r['nivel']:<8} {r['etapa']:<24} "
+              f"{base[chave] * 1000:>10.1f} ms -> {r['mediana_s'] * 1000:>10.1f} ms  ({razao:.2f}x)")
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o pipeline do PibShift por faixa de tamanho.")
+    parser.add_argument('--niveis', default=','.join(NIVEIS), help=f"Níveis separados por vírgula ({', '.join(NIVEIS)})")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por etapa (padrão: 3)")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="Piora relativa aceita na comparação (padrão: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    niveis = [n.strip() for n in args.niveis.split(',') if n.strip()]
+    desconhecidos = [n for n in niveis if n not in NIVEIS]
+    if desconhecidos:
+        parser.error(f"nível(is) desconhecido(s): {', '.join(desconhecidos)}")
+
+    pasta = tempfile.mkdtemp(prefix="pibshift_bench_")
+    resultados = []
+    try:
+        for nivel in niveis:
+            num_voluntarios, num_datas = NIVEIS[nivel]
+            resultados.extend(medir_nivel(nivel, num_voluntarios, num_datas, args.repeticoes, pasta))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    relatorio = {
+        'versao': _versao_codigo(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'niveis': {nivel: {'voluntarios': NIVEIS[nivel][0], 'cultos': NIVEIS[nivel][1]} for nivel in niveis},
+        'resultados': resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        return 1 if comparar(resultados, anterior, args.tolerancia) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
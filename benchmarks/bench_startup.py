@@ -0,0 +1,84 @@
+"""
+Verificação do tempo de abertura do aplicativo (cold start).
+
+Uso:
+    python -m benchmarks.bench_startup [--repeticoes 3] [--limite 1.5]
+
+Cada repetição roda um interpretador novo que importa main.py e desenha a
+primeira tela em uma página sem janela, com o perfil de inicialização
+ativado. Falha (código 1) se a mediana passar do limite em segundos ou se
+alguma biblioteca pesada (pandas, fpdf...) for importada antes da
+primeira tela.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Página mínima: o suficiente para main() montar e "desenhar" a primeira tela
+_CODIGO = """
+import json, startup_profile, main
+import flet as ft
+
+class Armazenamento:
+    def get(self, chave): return None
+    def set(self, chave, valor): pass
+
+class Pagina:
+    def __init__(self):
+        self.client_storage = Armazenamento()
+        self.theme_mode = ft.ThemeMode.LIGHT
+        self.overlay = []
+        self.controls = []
+    def add(self, *controles): self.controls.extend(controles)
+    def update(self, *controles): pass
+
+main.main(Pagina())
+print(json.dumps({
+    "marcas": startup_profile.marcas(),
+    "pesados": startup_profile.modulos_pesados_carregados(),
+}))
+"""
+
+def medir_uma_vez():
+    env = dict(os.environ, PIBSHIFT_PERFIL_INICIO="1")
+    inicio = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, "-c", _CODIGO], cwd=RAIZ, env=env,
+        capture_output=True, text=True, check=True
+    )
+    total = time.perf_counter() - inicio
+    return total, json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de abertura do PibShift.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Número de execuções (padrão: 3)")
+    parser.add_argument('--limite', type=float, default=1.5, help="Tempo máximo em segundos (padrão: 1.5)")
+    args = parser.parse_args(argv)
+
+    totais = []
+    for _ in range(args.repeticoes):
+        total, perfil = medir_uma_vez()
+        totais.append(total)
+
+    # Etapas da última execução, para mostrar onde o tempo foi gasto
+    for etapa, duracao, _ in perfil["marcas"]:
+        print(f"  {etapa:<20} {duracao * 1000:>8.1f} ms")
+
+    mediana = statistics.median(totais)
+    falhou = False
+    if perfil["pesados"]:
+        print(f"❌ Bibliotecas pesadas importadas antes da primeira tela: {', '.join(perfil['pesados'])}")
+        falhou = True
+    status = "✅" if mediana <= args.limite else "❌"
+    falhou |= mediana > args.limite
+    print(f"{status} Abertura em {mediana:.2f}s (mediana de {len(totais)}, limite {args.limite:.1f}s)")
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Dados sintéticos para os benchmarks.
+
+gerar_respostas imita a planilha de respostas do Google Forms: uma linha
+por envio, cabeçalhos com a capitalização do Forms, respostas livres em
+"Área de atuação" (com sinônimos, listas e erros de digitação), o mesmo
+voluntário escrito de formas diferentes (apelidos, nome do meio, caixa) e
+uma coluna SIM/NÃO por culto. gerar_escala monta direto uma escala pronta
+para os exportadores.
+"""
+import datetime
+import random
+import pandas as pd
+
+PRIMEIROS_NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Helena', 'Igor', 'Julia', 'Lucas',
+    'Marina', 'Pedro', 'Rafaela', 'Tiago', 'Beatriz', 'Caio', 'Débora', 'Élton', 'Fernanda', 'João',
+]
+SOBRENOMES = ['Silva', 'Souza', 'Marques', 'Lima', 'Costa', 'Alves', 'Rocha', 'Dias', 'Araújo', 'Conceição']
+
+# Nomes com caracteres fora do latin-1, que o PDF precisa substituir
+NOMES_FORA_LATIN1 = ['Ana D’Ávila', 'Łukasz Nowak']
+
+# Voluntários com apelidos cadastrados (config/apelidos.json) e as grafias usadas no Forms
+VARIANTES_APELIDOS = [
+    ['Gabriel Marques', 'GB Marques', 'gabriel', 'Gabriel Souza Marques'],
+    ['Gabi', 'gabi', 'Gabi Rocha'],
+]
+
+RESPOSTAS_AREA = [
+    'Produção', 'Filmagem', 'Projeção', 'Take', 'Iluminação',
+    'Filmagem, Take', 'Projeção e Luz', 'Producao', 'fotografia', 'TAKE / FILMAGEM',
+    'Foto', 'Luz', 'Filmagem; Projeção; Iluminação', 'Produção (quando precisar)', 'Não sei ainda', None,
+]
+
+DIAS_SEMANA = ['SEGUNDA', 'TERÇA', 'QUARTA', 'QUINTA', 'SEXTA', 'SÁBADO', 'DOMINGO']
+
+def colunas_cultos(num_datas, inicio=datetime.date(2025, 1, 5)):
+    """Cabeçalhos 'dd/mm/aaaa DIA' alternando domingo e quarta, a partir de `inicio`."""
+    colunas = []
+    dia = inicio
+    while len(colunas) < num_datas:
+        colunas.append(f"{dia:%d/%m/%Y} {DIAS_SEMANA[dia.weekday()]}")
+        dia += datetime.timedelta(days=3 if dia.weekday() == 6 else 4)
+    return colunas
+
+def _pessoas(num_voluntarios, rng):
+    """Lista de voluntários distintos, cada um com as grafias que pode usar no Forms."""
+    pessoas = [list(variantes) for variantes in VARIANTES_APELIDOS]
+    vistos = set()
+    while len(pessoas) < num_voluntarios:
+        primeiro, ultimo = rng.choice(PRIMEIROS_NOMES), rng.choice(SOBRENOMES)
+        if (primeiro, ultimo) in vistos:
+            # Homônimos de primeiro e último nome viram a mesma pessoa na escala; evita
+            primeiro = f"{primeiro}{len(pessoas)}"
+        vistos.add((primeiro, ultimo))
+        meio = rng.choice(SOBRENOMES)
+        pessoas.append([
+            f"{primeiro} {ultimo}",
+            f"{primeiro} {meio} {ultimo}",
+            f"{primeiro.upper()} {ultimo.upper()}",
+            f" {primeiro} {ultimo} ",
+        ])
+    return pessoas[:num_voluntarios]
+
+def gerar_respostas(num_voluntarios, num_datas, seed=0, prob_sim=0.4, prob_reenvio=0.1):
+    """
+    DataFrame com as respostas do Forms de `num_voluntarios` pessoas para `num_datas` cultos.
+
+    Cerca de `prob_reenvio` das pessoas enviam o formulário duas vezes, com
+    outra grafia do nome.
+    """
+    rng = random.Random(seed)
+    datas = colunas_cultos(num_datas)
+    linhas = []
+    inicio = datetime.datetime(2024, 12, 1, 8, 0)
+    for pessoa in _pessoas(num_voluntarios, rng):
+        envios = 2 if rng.random() < prob_reenvio else 1
+        for _ in range(envios):
+            nome = rng.choice(pessoa)
+            linha = {
+                'Carimbo de data/hora': inicio + datetime.timedelta(minutes=rng.randrange(60 * 24 * 20)),
+                'Endereço de e-mail': f"{nome.strip().split()[0].lower()}{rng.randrange(1000)}@exemplo.com",
+                'Nome': nome,
+                'Celular (WhatsApp)': f"(11) 9{rng.randrange(10000000, 99999999)}",
+                'Área de atuação': rng.choice(RESPOSTAS_AREA),
+            }
+            for data in datas:
+                linha[data] = 'SIM' if rng.random() < prob_sim else 'NÃO'
+            linhas.append(linha)
+
+    rng.shuffle(linhas)
+    return pd.DataFrame(linhas)
+
+def salvar_planilha(respostas, caminho):
+    """Grava as respostas em .xlsx, como o download do Google Forms."""
+    respostas.to_excel(caminho, index=False, engine='openpyxl')
+    return caminho
+
+FUNCOES = ['PRODUÇÃO', 'Filmagem', 'Suporte Filmagem', 'PROJEÇÃO', 'Fotografo', 'Suporte', 'ILUMINAÇÃO']
+
+def gerar_escala(num_slots, slots_por_data=16, num_voluntarios=None, seed=0, prob_vazio=0.05):
+    """Escala pronta (Data, Funcao, Voluntario) com `num_slots` linhas, para os exportadores."""
+    rng = random.Random(seed)
+    num_voluntarios = num_voluntarios or max(1, num_slots // 4)
+    datas = colunas_cultos(-(-num_slots // slots_por_data))
+    linhas = []
+    for i in range(num_slots):
+        if rng.random() < prob_vazio:
+            voluntario = "Não designado"
+        else:
+            numero = rng.randrange(num_voluntarios)
+            voluntario = (NOMES_FORA_LATIN1[numero] if numero < len(NOMES_FORA_LATIN1)
+                          else f"Voluntário {numero} Sobrenome Comprido")
+        linhas.append({
+            'Data': datas[i // slots_por_data],
+            'Funcao': rng.choice(FUNCOES),
+            'Voluntario': voluntario,
+        })
+    return pd.DataFrame(linhas, columns=['Data', 'Funcao', 'Voluntario'])
@@ -0,0 +1,205 @@
+"""
+Geração de escalas em lote, sem interface gráfica.
+
+Uso:
+    python cli.py planilha.xlsx [outra.xlsx | pasta/ ...] -o saida/ [--modo otimo] [--workers 4]
+
+Cada planilha é processada (ler_planilha → gerar_rascunho → exportadores)
+em um processo separado, e os arquivos vão para saida/<nome da planilha>/;
+planilhas de mesmo nome vindas de pastas diferentes recebem um sufixo
+(saida/escala/, saida/escala_2/, ...) em vez de sobrescreverem umas às outras.
+Ao final é exibido um resumo com o tempo de cada etapa. Com --historico,
+só as datas ainda não publicadas pelo aplicativo são planejadas, levando
+em conta os turnos já publicados (ver shift_history).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+FORMATOS = ['pdf', 'xlsx', 'ics', 'whatsapp']
+
+def processar_planilha(caminho, destino, ministerios_ativos=None, modo='guloso', formatos=FORMATOS,
+                       usar_historico=False):
+    """
+    Executa o pipeline completo para uma planilha, gravando os arquivos na pasta `destino`.
+
+    Retorna (caminho, tempos, erros): tempos é uma lista de (etapa, segundos)
+    na ordem de execução e erros uma lista de mensagens.
+    """
+    from core_logic import ler_planilha, gerar_rascunho
+    from export_manager import exportar_pdf, exportar_ics, exportar_xlsx, copiar_whatsapp
+
+    tempos = []
+    erros = []
+
+    def medir(etapa, funcao, *args):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append((etapa, time.perf_counter() - inicio))
+        return resultado
+
+    df, error = medir('ler_planilha', ler_planilha, caminho)
+    if error:
+        return caminho, tempos, [error]
+
+    historico = None
+    if usar_historico:
+        from shift_history import HistoricoTurnos
+        historico = medir('carregar_historico', HistoricoTurnos.carregar)
+
+    rascunho, _, error = medir('gerar_rascunho', gerar_rascunho, df, ministerios_ativos, modo, historico)
+    if error:
+        return caminho, tempos, [error]
+
+    escala_df = rascunho.para_dataframe()
+    os.makedirs(destino, exist_ok=True)
+
+    exportadores = {
+        'pdf': ('exportar_pdf', exportar_pdf, 'escala_pibshift.pdf'),
+        'xlsx': ('exportar_xlsx', exportar_xlsx, 'escala_pibshift.xlsx'),
+        'ics': ('exportar_ics', exportar_ics, 'escala_pibshift.ics'),
+    }
+    for formato in formatos:
+        if formato == 'whatsapp':
+            texto = medir('copiar_whatsapp', copiar_whatsapp, escala_df)
+            with open(os.path.join(destino, 'escala_pibshift.txt'), 'w', encoding='utf-8') as f:
+                f.write(texto)
+            continue
+
+        etapa, exportador, nome_arquivo = exportadores[formato]
+        success, message = medir(etapa, exportador, escala_df, os.path.join(destino, nome_arquivo))
+        if not success:
+            erros.append(message)
+
+    return caminho, tempos, erros
+
+def _expandir_entradas(entradas):
+    """Planilhas das entradas, sem repetir o mesmo arquivo."""
+    arquivos = []
+    vistos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            caminhos = [
+                os.path.join(entrada, nome) for nome in sorted(os.listdir(entrada))
+                if nome.lower().endswith('.xlsx') and not nome.startswith('~$')
+            ]
+        else:
+            caminhos = [entrada]
+        for caminho in caminhos:
+            real = os.path.realpath(caminho)
+            if real not in vistos:
+                vistos.add(real)
+                arquivos.append(caminho)
+    return arquivos
+
+def _pastas_destino(arquivos, pasta_saida):
+    """Uma pasta de saída por planilha, com sufixo quando nomes de planilhas coincidem."""
+    pastas = []
+    usados = set()
+    for arquivo in arquivos:
+        base = nome_pasta = os.path.splitext(os.path.basename(arquivo))[0]
+        sufixo = 2
+        while nome_pasta.casefold() in usados:
+            nome_pasta = f"{base}_{sufixo}"
+            sufixo += 1
+        usados.add(nome_pasta.casefold())
+        pastas.append(os.path.join(pasta_saida, nome_pasta))
+    return pastas
+
+def _imprimir_resumo(resultados, tempo_total, nomes):
+    """Tabela de tempos por etapa; `nomes` dá o rótulo de cada planilha (o nome da sua pasta de saída)."""
+    etapas = []
+    for _, tempos, _ in resultados:
+        for etapa, _ in tempos:
+            if etapa not in etapas:
+                etapas.append(etapa)
+
+    largura_nome = max([len(nomes[c]) for c, _, _ in resultados] + [len('Planilha')])
+    cabecalho = f"{'Planilha':<{largura_nome}}  " + "  ".join(f"{etapa:>15}" for etapa in etapas)
+    print()
+    print(cabecalho)
+    print('-' * len(cabecalho))
+
+    totais = {etapa: 0.0 for etapa in etapas}
+    for caminho, tempos, erros in resultados:
+        tempos_dict = dict(tempos)
+        colunas = []
+        for etapa in etapas:
+            if etapa in tempos_dict:
+                totais[etapa] += tempos_dict[etapa]
+                colunas.append(f"{tempos_dict[etapa] * 1000:>13.1f}ms")
+            else:
+                colunas.append(f"{'-':>15}")
+        print(f"{nomes[caminho]:<{largura_nome}}  " + "  ".join(colunas))
+        for erro in erros:
+            print(f"  ❌ {erro}")
+
+    print('-' * len(cabecalho))
+    print(f"{'Total':<{largura_nome}}  " + "  ".join(f"{totais[e] * 1000:>13.1f}ms" for e in etapas))
+    print(f"\n{len(resultados)} planilha(s) em {tempo_total:.2f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera escalas do PibShift em lote, sem interface gráfica.")
+    parser.add_argument('entradas', nargs='+', help="Planilhas .xlsx ou pastas contendo planilhas")
+    parser.add_argument('-o', '--saida', default='escalas', help="Pasta de saída (padrão: escalas)")
+    parser.add_argument('-m', '--ministerios', help="Ministérios ativos separados por vírgula (padrão: todos)")
+    parser.add_argument('--modo', choices=['guloso', 'otimo'], default='guloso', help="Modo de alocação")
+    parser.add_argument('-f', '--formatos', default=','.join(FORMATOS),
+                        help=f"Formatos de saída separados por vírgula (padrão: {','.join(FORMATOS)})")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument('--historico', action='store_true',
+                        help="Planeja só as datas ainda não publicadas, usando o histórico de turnos")
+    args = parser.parse_args(argv)
+
+    arquivos = _expandir_entradas(args.entradas)
+    if not arquivos:
+        parser.error("nenhuma planilha .xlsx encontrada")
+
+    formatos = [f.strip().lower() for f in args.formatos.split(',') if f.strip()]
+    invalidos = [f for f in formatos if f not in FORMATOS]
+    if invalidos:
+        parser.error(f"formato(s) desconhecido(s): {', '.join(invalidos)}")
+
+    ministerios = None
+    if args.ministerios:
+        from area_rules import obter_registro
+        registro = obter_registro()
+        nomes = [m.strip() for m in args.ministerios.split(',') if m.strip()]
+        ministerios = [registro.chave_da_area(nome) for nome in nomes]
+        desconhecidos = [nome for nome, chave in zip(nomes, ministerios) if chave is None]
+        if desconhecidos:
+            parser.error(f"ministério(s) desconhecido(s): {', '.join(desconhecidos)} "
+                         f"(válidos: {', '.join(registro.chaves)})")
+        if not ministerios:
+            parser.error(f"nenhum ministério informado (válidos: {', '.join(registro.chaves)})")
+        ministerios = list(dict.fromkeys(ministerios))
+
+    inicio = time.perf_counter()
+    resultados = []
+    destinos = _pastas_destino(arquivos, args.saida)
+    workers = min(args.workers or os.cpu_count() or 1, len(arquivos))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(processar_planilha, arquivo, destino, ministerios, args.modo, formatos,
+                            args.historico): arquivo
+            for arquivo, destino in zip(arquivos, destinos)
+        }
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                resultado = (futuros[futuro], [], [f"Erro inesperado: {e}"])
+            status = "❌" if resultado[2] else "✅"
+            print(f"{status} {resultado[0]}")
+            resultados.append(resultado)
+
+    resultados.sort(key=lambda r: arquivos.index(r[0]))
+    nomes = {arquivo: os.path.basename(destino) for arquivo, destino in zip(arquivos, destinos)}
+    _imprimir_resumo(resultados, time.perf_counter() - inicio, nomes)
+    return 1 if any(erros for _, _, erros in resultados) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
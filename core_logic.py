@@ -1,27 +1,42 @@
-import re
+import numpy as np
 import pandas as pd
 import datetime
+from collections import Counter
+import sheet_cache
+import instrumentation
+from xlsx_reader import iterar_linhas
+from date_columns import IndiceDatas
+from shift_history import mes_da_coluna
+from schedule import Escala, MontadorEscala
+from service_times import HorariosCultos, slots_sobrepostos, colunas_sobrepostas
+from area_rules import obter_registro
+from assignment_solver import resolver_escala_otima
+from volunteer_rules import obter_restricoes
+from name_registry import normalizar_nome, obter_registro_voluntarios, ID_NAO_DESIGNADO
 
 def extrair_nome_sobrenome(nome_completo):
     """Extrai o primeiro e o último nome de um nome completo."""
-    nome_lower = nome_completo.lower().strip()
+    return normalizar_nome(nome_completo)
 
-    apelidos_para_nomes = {
-        "gb marques": "Gabriel Marques",
-        "gabriel": "Gabriel Marques",
-        "gabi": "Gabi",
-    }
-
-    for apelido, nome_padronizado in apelidos_para_nomes.items():
-        if apelido in nome_lower:
-            return nome_padronizado
-
-    partes = nome_completo.split()
-    return " ".join([partes[0], partes[-1]]) if len(partes) > 1 else partes[0]
+@instrumentation.medida("verificar_conflitos")
+def verificar_conflitos(escala_df, horarios=None):
+    """
+    Verifica conflitos em uma escala (Escala ou DataFrame); retorna {(data, voluntário)}.
 
-def verificar_conflitos(escala_df):
-    """Verifica conflitos em uma escala."""
+    Há conflito quando o mesmo voluntário está em dois slots com horários
+    sobrepostos (ver service_times); `horarios` é um HorariosCultos, por
+    padrão o de config/calendario.json.
+    """
     conflitos = set()
+    horarios = horarios or HorariosCultos()
+
+    if isinstance(escala_df, Escala):
+        escala = escala_df
+        inicio, fim = horarios.minutos(escala.datas)
+        em_conflito = slots_sobrepostos(escala.voluntario, inicio[escala.codigo_data], fim[escala.codigo_data])
+        for slot_id in np.flatnonzero(em_conflito):
+            conflitos.add((escala.data(slot_id), escala.nome(slot_id)))
+        return conflitos
 
     if 'Voluntario' not in escala_df.columns:
         for col in escala_df.columns:
@@ -32,214 +47,722 @@ def verificar_conflitos(escala_df):
             return conflitos
     
     escala_df['Voluntario'] = escala_df['Voluntario'].astype(str)
-    df_sem_nao_designado = escala_df[escala_df['Voluntario'] != 'Não designado']
+    ids = obter_registro_voluntarios().ids(escala_df['Voluntario'])
+    codigos_data, datas = pd.factorize(escala_df['Data'])
 
-    duplicados_dia = df_sem_nao_designado[df_sem_nao_designado.duplicated(
-        subset=['Data', 'Voluntario'], keep=False)]
-    
-    for index, row in duplicados_dia.iterrows():
-        conflitos.add((row['Data'], row['Voluntario']))
+    inicio, fim = horarios.minutos(list(datas))
+    duplicados = np.flatnonzero(slots_sobrepostos(ids, inicio[codigos_data], fim[codigos_data]))
+
+    for data, voluntario in zip(escala_df['Data'].to_numpy()[duplicados],
+                                escala_df['Voluntario'].to_numpy()[duplicados]):
+        conflitos.add((data, voluntario))
 
     return conflitos
 
-def gerar_rascunho(df, ministerios_ativos=None):
-    """Gera um rascunho de escala a partir de um DataFrame."""
+class IndiceConflitos:
+    """
+    Índice voluntário → slots, mantido incrementalmente durante a edição.
+
+    Um slot está em conflito quando o mesmo voluntário aparece em outro slot
+    com horário sobreposto. Trocar o voluntário de um slot refaz a varredura
+    só entre os slots do voluntário anterior e do novo, e retorna apenas os
+    slots cujo estado de conflito pode ter mudado.
+    """
+
+    def __init__(self, escala, horarios=None):
+        """`escala`: Escala cujos slots são indexados pela posição."""
+        self._voluntarios = obter_registro_voluntarios()
+        inicio, fim = (horarios or HorariosCultos()).minutos(escala.datas)
+        self._inicio = inicio[escala.codigo_data]
+        self._fim = fim[escala.codigo_data]
+        self._pessoa_do_slot = escala.voluntario.tolist()
+        self._slots_por_pessoa = {}
+        for slot_id, pessoa in enumerate(self._pessoa_do_slot):
+            self._slots_por_pessoa.setdefault(pessoa, set()).add(slot_id)
+        self._em_conflito = set(np.flatnonzero(
+            slots_sobrepostos(escala.voluntario, self._inicio, self._fim)
+        ).tolist())
+
+    def _reavaliar(self, pessoa):
+        """Refaz o estado de conflito dos slots de uma pessoa e os retorna."""
+        if pessoa == ID_NAO_DESIGNADO:
+            return set()
+        slots_pessoa = self._slots_por_pessoa.get(pessoa, ())
+        self._em_conflito.difference_update(slots_pessoa)
+        if len(slots_pessoa) < 2:
+            return set(slots_pessoa)
+        ids = np.fromiter(slots_pessoa, dtype=np.int64, count=len(slots_pessoa))
+        em_conflito = slots_sobrepostos(np.zeros(len(ids), dtype=np.int64), self._inicio[ids], self._fim[ids])
+        self._em_conflito.update(ids[em_conflito].tolist())
+        return set(slots_pessoa)
+
+    def atualizar(self, slot_id, voluntario):
+        """Troca o voluntário de um slot e retorna os slots afetados."""
+        instrumentation.contar("conflitos.atualizacoes")
+        anterior = self._pessoa_do_slot[slot_id]
+        pessoa = self._voluntarios.id_de(voluntario)
+        self._slots_por_pessoa[anterior].discard(slot_id)
+        if not self._slots_por_pessoa[anterior]:
+            del self._slots_por_pessoa[anterior]
+        self._pessoa_do_slot[slot_id] = pessoa
+        self._slots_por_pessoa.setdefault(pessoa, set()).add(slot_id)
+        self._em_conflito.discard(slot_id)
+        return self._reavaliar(anterior) | self._reavaliar(pessoa) | {slot_id}
+
+    def em_conflito(self, slot_id):
+        return slot_id in self._em_conflito
+
+    def slots_em_conflito(self):
+        """Todos os slots atualmente em conflito."""
+        return set(self._em_conflito)
+
+COLUNAS_IGNORAR = ['CARIMBO DE DATA/HORA', 'ENDEREÇO DE E-MAIL',
+                   'CELULAR (WHATSAPP)', 'NOME', 'ÁREA DE ATUAÇÃO']
+
+MAX_TURNOS_POR_PESSOA = 2
+
+class GeracaoCancelada(Exception):
+    """Interrompe o alocador quando a geração é cancelada."""
+
+def _avancar(ao_progredir, cancelado):
+    """Callback de progresso dos alocadores, que também verifica o cancelamento."""
+    def avancar(concluidos, total, mensagem):
+        if cancelado is not None and cancelado.is_set():
+            raise GeracaoCancelada()
+        if ao_progredir is not None:
+            ao_progredir(concluidos, total, mensagem)
+    return avancar
+
+def _progresso_fases(avancar, num_fases, etapas_antes=0):
+    """Callback ao_iniciar_fase do solver que reporta cada fase por `avancar`; None sem `avancar`."""
+    if avancar is None:
+        return None
+    total = etapas_antes + num_fases
+
+    def ao_iniciar_fase(fase):
+        avancar(etapas_antes + fase - 1, total, f"Distribuindo turnos ({fase}/{num_fases})")
+    return ao_iniciar_fase
+
+def montar_matrizes(df, areas, colunas_datas):
+    """
+    Converte a planilha, uma única vez, nas matrizes usadas pelo alocador.
+
+    Retorna (disponibilidade, elegibilidade, ids_pessoa):
+    - disponibilidade: matriz booleana linha×data (resposta 'SIM');
+    - elegibilidade: matriz booleana linha×área;
+    - ids_pessoa: id estável (ver name_registry) do voluntário de cada linha.
+    """
+    num_linhas = len(df)
+
+    # Colunas já booleanas (ver ler_planilha) são usadas direto; as demais comparam com 'SIM'
+    disponibilidade = np.zeros((num_linhas, len(colunas_datas)), dtype=bool)
+    for indice_data, coluna_data in enumerate(colunas_datas):
+        respostas = df[coluna_data]
+        disponibilidade[:, indice_data] = respostas if respostas.dtype == bool else respostas == 'SIM'
+
+    elegibilidade = obter_registro().matriz_elegibilidade(df['ÁREA DE ATUAÇÃO'], areas)
+
+    nomes = df['NOME']
+    sem_nome = nomes.isna().to_numpy()
+    elegibilidade[sem_nome] = False
+
+    # Cada nome distinto é normalizado uma única vez; linhas sem nome ficam com id de "Não designado"
+    codigos, nomes_unicos = pd.factorize(nomes)
+    ids_unicos = obter_registro_voluntarios().ids(normalizar_nome(str(nome)) for nome in nomes_unicos)
+    ids_pessoa = np.append(ids_unicos, ID_NAO_DESIGNADO)[codigos]
+    return disponibilidade, elegibilidade, ids_pessoa
+
+def _candidatos_unicos(ids_area):
+    """Remove voluntários repetidos mantendo a ordem da planilha."""
+    _, primeiras = np.unique(ids_area, return_index=True)
+    return ids_area[np.sort(primeiras)]
+
+def _ordenar_por_carga(ids, carga):
+    """Ordena os candidatos por turnos já feitos, mantendo a ordem da planilha nos empates."""
+    return ids[np.argsort(carga[ids], kind='stable')]
+
+def _vetores_historico(historico, colunas_datas):
+    """
+    (carga_inicial, prioridade) por id de voluntário a partir do histórico publicado.
+
+    carga_inicial[i]: turnos já publicados no mês da data i, que contam para
+    o limite de turnos só nas datas desse mês (datas do mesmo mês compartilham
+    o vetor); prioridade: total acumulado de turnos.
+    """
+    voluntarios = obter_registro_voluntarios()
+    ids_total = {voluntarios.id_de(nome): n for nome, n in historico.total.items()}
+    ids_mes = {mes: {voluntarios.id_de(nome): n for nome, n in turnos.items()}
+               for mes, turnos in historico.por_mes.items()}
+
+    por_mes = {}
+    carga_inicial = []
+    for coluna in colunas_datas:
+        mes = mes_da_coluna(coluna)
+        if mes not in por_mes:
+            por_mes[mes] = np.zeros(len(voluntarios), dtype=np.int64)
+            for id_voluntario, n in ids_mes.get(mes, {}).items():
+                por_mes[mes][id_voluntario] = n
+        carga_inicial.append(por_mes[mes])
+
+    prioridade = np.zeros(len(voluntarios), dtype=np.int64)
+    for id_voluntario, n in ids_total.items():
+        prioridade[id_voluntario] = n
+    return carga_inicial, prioridade
+
+def _carga_por_data(carga_inicial):
+    """carga_inicial de _vetores_historico como dict indice_data -> id -> turnos, para o solver."""
+    if carga_inicial is None:
+        return None
+    por_vetor = {}
+    carga_por_data = {}
+    for indice_data, vetor in enumerate(carga_inicial):
+        if id(vetor) not in por_vetor:
+            por_vetor[id(vetor)] = {int(p): int(vetor[p]) for p in np.flatnonzero(vetor)}
+        if por_vetor[id(vetor)]:
+            carga_por_data[indice_data] = por_vetor[id(vetor)]
+    return carga_por_data
+
+def _alocar_guloso(disponibilidade, elegibilidade, ids_pessoa, colunas_datas,
+                   num_servidores_por_area, max_shifts_per_person,
+                   carga_inicial=None, prioridade=None, avancar=None, sobrepostas=None,
+                   restricoes=None):
+    """
+    Alocação data a data: cada slot recebe o primeiro voluntário disponível.
+
+    Com histórico, `carga_inicial[i]` (turnos publicados no mês da data i)
+    conta para o limite de turnos na data i e os candidatos são ordenados
+    por `prioridade` (turnos acumulados) mais os turnos feitos nesta
+    geração. `sobrepostas[i]` lista as datas cujo horário se sobrepõe ao da
+    data i: quem já serve em uma delas fica de fora. `restricoes` (ver
+    volunteer_rules) define pares, exclusões, áreas preferidas e limites
+    por voluntário.
+    """
+    registro = obter_registro()
+    areas = list(num_servidores_por_area.keys())
+    voluntarios = obter_registro_voluntarios()
+    shifts_count = np.zeros(len(voluntarios), dtype=np.int64)
+    
+    escala = MontadorEscala()
+    available_servers_per_day = {}
+    escalados_por_data = [set() for _ in colunas_datas]
+    if restricoes is None:
+        restricoes = obter_restricoes().compilar(areas, max_shifts_per_person)
+    limite = restricoes.limite
+
+    for indice_data, coluna_data in enumerate(colunas_datas):
+        if avancar is not None:
+            avancar(indice_data, len(colunas_datas), coluna_data)
+        with instrumentation.etapa("gerar_rascunho.data", data=coluna_data):
+            disponiveis_dia = disponibilidade[:, indice_data]
+            daily_pools = {}
+            # Turnos que contam para o limite nesta data: os desta geração e os já publicados no mês dela
+            turnos_no_limite = shifts_count if carga_inicial is None else shifts_count + carga_inicial[indice_data]
+
+            for indice_area, area_key in enumerate(areas):
+                # Linhas disponíveis na data e elegíveis para a área
+                linhas = np.flatnonzero(disponiveis_dia & elegibilidade[:, indice_area])
+                ids_area = ids_pessoa[linhas]
+
+                # Filtrar por máximo de turnos
+                ids_area = _candidatos_unicos(ids_area[turnos_no_limite[ids_area] < limite[ids_area]])
+                if prioridade is not None:
+                    ids_area = _ordenar_por_carga(ids_area, prioridade + shifts_count)
+                daily_pools[area_key] = restricoes.ordenar(area_key, ids_area).tolist()
+
+            # Quem já serve em um culto de horário sobreposto, ou não pode servir com
+            # alguém já escalado nesta data, não pode ser escalado nela
+            allocated_for_day = set()
+            for outra in (sobrepostas[indice_data] if sobrepostas else ()):
+                allocated_for_day |= escalados_por_data[outra]
+            area_counters = {area: 0 for area in areas}
+
+            def alocar(area, pessoa):
+                escala.adicionar(coluna_data, registro.nome_funcao(area, area_counters[area]), pessoa)
+                allocated_for_day.add(pessoa)
+                allocated_for_day.update(restricoes.exclusoes.get(pessoa, ()))
+                escalados_por_data[indice_data].add(pessoa)
+                shifts_count[pessoa] += 1
+                daily_pools[area].remove(pessoa)
+                area_counters[area] += 1
+        
+            # PARES: se os dois estão disponíveis, alocar juntos
+            for pessoa_a, areas_a, pessoa_b, areas_b in restricoes.pares:
+                if (pessoa_a in allocated_for_day or pessoa_b in allocated_for_day
+                        or pessoa_b in restricoes.exclusoes.get(pessoa_a, ())):
+                    continue
+                area_a = next((area for area in areas_a if pessoa_a in daily_pools[area]), None)
+                area_b = next((area for area in areas_b if pessoa_b in daily_pools[area]), None)
+                if area_a is None or area_b is None:
+                    continue
+                vagas_necessarias = Counter((area_a, area_b))
+                if all(area_counters[area] + n <= num_servidores_por_area[area]
+                       for area, n in vagas_necessarias.items()):
+                    alocar(area_a, pessoa_a)
+                    alocar(area_b, pessoa_b)
+
+            # ÁREAS PREFERIDAS: quem prefere uma área entra nela antes das outras áreas serem preenchidas
+            for area, num_servidores in num_servidores_por_area.items():
+                for voluntario in restricoes.preferem(area, daily_pools[area]):
+                    if area_counters[area] >= num_servidores:
+                        break
+                    if voluntario not in allocated_for_day:
+                        alocar(area, voluntario)
+
+            # ALOCAÇÃO NORMAL PARA CADA ÁREA
+            for area, num_servidores in num_servidores_por_area.items():
+                area_pool = daily_pools[area]
+            
+                for i in range(area_counters[area], num_servidores):
+                    voluntario = next((v for v in area_pool if v not in allocated_for_day), None)
+                
+                    if voluntario is not None:
+                        alocar(area, voluntario)
+                    else:
+                        # Preencher com "Não designado" se não houver voluntários
+                        escala.adicionar(coluna_data, registro.nome_funcao(area, i), ID_NAO_DESIGNADO)
+                        area_counters[area] += 1
+
+            available_servers_per_day[coluna_data] = {
+                area: [voluntarios.nome(p) for p in pool] for area, pool in daily_pools.items()
+            }
+
+    return escala.escala(), available_servers_per_day
+
+def _fixos_pares(candidatos, num_datas, restricoes, carga, carga_por_data=None):
+    """
+    Slots fixos dos pares (ver volunteer_rules): os dois servem juntos nas
+    primeiras datas em que ambos puderem, até o limite de turnos de cada um.
+    `carga_por_data` é a do solver (ver _carga_por_data).
+    """
+    fixos = []
+    turnos = dict(carga)
+    carga_por_data = carga_por_data or {}
+    usados = set()
+    for pessoa_a, areas_a, pessoa_b, areas_b in restricoes.pares:
+        if pessoa_b in restricoes.exclusoes.get(pessoa_a, ()):
+            continue
+        for indice_data in range(num_datas):
+            externa = carga_por_data.get(indice_data, {})
+            if (turnos.get(pessoa_a, 0) + externa.get(pessoa_a, 0) >= restricoes.limite[pessoa_a]
+                    or turnos.get(pessoa_b, 0) + externa.get(pessoa_b, 0) >= restricoes.limite[pessoa_b]):
+                if externa:
+                    continue
+                break
+            if (indice_data, pessoa_a) in usados or (indice_data, pessoa_b) in usados:
+                continue
+            area_a = next((area for area in areas_a if pessoa_a in candidatos.get((indice_data, area), [])), None)
+            area_b = next((area for area in areas_b if pessoa_b in candidatos.get((indice_data, area), [])), None)
+            if area_a and area_b:
+                for area, pessoa in ((area_a, pessoa_a), (area_b, pessoa_b)):
+                    fixos.append((indice_data, area, pessoa))
+                    turnos[pessoa] = turnos.get(pessoa, 0) + 1
+                    usados.add((indice_data, pessoa))
+    return fixos
+
+def _sobrepostas_por_data(sobrepostas):
+    """dict indice_data -> datas com horário sobreposto, só para as datas que têm alguma."""
+    return {indice_data: outras for indice_data, outras in enumerate(sobrepostas or ()) if outras}
+
+def _alocar_otimo(disponibilidade, elegibilidade, ids_pessoa, colunas_datas,
+                  num_servidores_por_area, max_shifts_per_person,
+                  carga_inicial=None, prioridade=None, avancar=None, sobrepostas=None,
+                  restricoes=None):
+    """
+    Alocação do mês inteiro como problema de fluxo (ver assignment_solver).
+
+    Com histórico, `carga_inicial[i]` conta para o limite na data i, como no
+    alocador guloso, e os candidatos são tentados em ordem de `prioridade`
+    (turnos acumulados).
+    `sobrepostas[i]` lista as datas com horário sobreposto ao da data i e
+    `restricoes` (ver volunteer_rules) vale como no alocador guloso.
+    """
+    registro = obter_registro()
+    areas = list(num_servidores_por_area.keys())
+    voluntarios = obter_registro_voluntarios()
+    if restricoes is None:
+        restricoes = obter_restricoes().compilar(areas, max_shifts_per_person)
+
+    # Progresso: uma etapa por data ao montar os candidatos e uma por fase do solver
+    num_fases = max(max_shifts_per_person, restricoes.maior_limite)
+    total_etapas = len(colunas_datas) + num_fases
+    ao_iniciar_fase = _progresso_fases(avancar, num_fases, len(colunas_datas))
+
+    candidatos = {}
+    preferidos = {}
+    for indice_data in range(len(colunas_datas)):
+        if avancar is not None:
+            avancar(indice_data, total_etapas, colunas_datas[indice_data])
+        disponiveis_dia = disponibilidade[:, indice_data]
+        for indice_area, area in enumerate(areas):
+            linhas = np.flatnonzero(disponiveis_dia & elegibilidade[:, indice_area])
+            ids_area = _candidatos_unicos(ids_pessoa[linhas])
+            if prioridade is not None:
+                ids_area = _ordenar_por_carga(ids_area, prioridade)
+            candidatos[(indice_data, area)] = restricoes.ordenar(area, ids_area).tolist()
+            preferidos[(indice_data, area)] = restricoes.preferem(area, candidatos[(indice_data, area)])
+
+    carga_por_data = _carga_por_data(carga_inicial)
+    fixos = _fixos_pares(candidatos, len(colunas_datas), restricoes, {}, carga_por_data)
+
+    with instrumentation.etapa("gerar_rascunho.resolver", datas=len(colunas_datas)):
+        atribuicoes = resolver_escala_otima(candidatos, num_servidores_por_area, len(colunas_datas),
+                                            max_shifts_per_person, fixos, None, ao_iniciar_fase,
+                                            _sobrepostas_por_data(sobrepostas),
+                                            restricoes.limites, restricoes.exclusoes, carga_por_data,
+                                            {chave: ids for chave, ids in preferidos.items() if ids})
+
+    escala = MontadorEscala()
+    available_servers_per_day = {}
+    for indice_data, coluna_data in enumerate(colunas_datas):
+        daily_available_servers = {}
+        for area, num_servidores in num_servidores_por_area.items():
+            escalados = atribuicoes.get((indice_data, area), [])
+            for i in range(num_servidores):
+                escala.adicionar(coluna_data, registro.nome_funcao(area, i),
+                                 escalados[i] if i < len(escalados) else ID_NAO_DESIGNADO)
+            daily_available_servers[area] = [voluntarios.nome(p) for p in candidatos[(indice_data, area)]
+                                             if p not in escalados]
+        available_servers_per_day[coluna_data] = daily_available_servers
+
+    return escala.escala(), available_servers_per_day
+
+MODOS_ALOCACAO = {
+    'guloso': _alocar_guloso,
+    'otimo': _alocar_otimo,
+}
+
+@instrumentation.medida("gerar_rascunho")
+def gerar_rascunho(df, ministerios_ativos=None, modo='guloso', historico=None,
+                   ao_progredir=None, cancelado=None):
+    """
+    Gera um rascunho de escala a partir de um DataFrame.
+
+    Retorna (escala, available_servers_per_day, error), com a escala no
+    formato de colunas (ver schedule.Escala). `modo` escolhe o alocador:
+    'guloso' preenche data a data com o primeiro voluntário disponível;
+    'otimo' resolve o mês inteiro, maximizando os slots preenchidos e
+    equilibrando a carga. Ninguém é escalado em dois cultos de horários
+    sobrepostos (ver service_times), mas cultos em horários diferentes no
+    mesmo dia podem ter o mesmo voluntário. Pares, exclusões, áreas
+    preferidas e limites por voluntário vêm de config/restricoes.json (ver
+    volunteer_rules).
+
+    Com um `historico` (ver shift_history), apenas as datas ainda não
+    publicadas são planejadas, os turnos já publicados no mês de cada data
+    contam para o limite nela e quem serviu menos no acumulado tem
+    preferência.
+
+    `ao_progredir(concluidos, total, mensagem)` é chamado a cada data. Se o
+    evento `cancelado` for marcado, a geração para na próxima data e
+    retorna o erro "Geração cancelada.".
+    """
     if 'ÁREA DE ATUAÇÃO' not in df.columns:
         return None, None, "A coluna 'ÁREA DE ATUAÇÃO' não foi encontrada."
+    if modo not in MODOS_ALOCACAO:
+        return None, None, f"Modo de alocação desconhecido: {modo}"
     
+    registro = obter_registro()
+
     # Ministérios padrão se não for especificado
     if ministerios_ativos is None:
-        ministerios_ativos = ['PRODUÇÃO', 'FILMAGEM', 'PROJEÇÃO', 'TAKE', 'ILUMINAÇÃO']
-    
-    num_servidores_por_area = {
-        'PRODUÇÃO': 1,
-        'FILMAGEM': 3,
-        'PROJEÇÃO': 1,
-        'TAKE': 2,
-        'ILUMINAÇÃO': 1,
-    }
+        ministerios_ativos = registro.chaves
     
     # Filtrar apenas ministérios ativos
-    num_servidores_por_area = {k: v for k, v in num_servidores_por_area.items() 
+    num_servidores_por_area = {k: v for k, v in registro.servidores.items() 
                               if k in ministerios_ativos}
+    areas = list(num_servidores_por_area.keys())
 
-    shifts_count = {}
-    max_shifts_per_person = 2
+    max_shifts_per_person = MAX_TURNOS_POR_PESSOA
 
-    colunas_ignorar = ['CARIMBO DE DATA/HORA', 'ENDEREÇO DE E-MAIL', 
-                      'CELULAR (WHATSAPP)', 'NOME', 'ÁREA DE ATUAÇÃO']
-    colunas_datas = [col for col in df.columns if col not in colunas_ignorar]
-    
-    escala_final_slots = []
-    available_servers_per_day = {}
+    # Datas em ordem cronológica, independentemente da ordem das colunas na planilha
+    indice_datas = IndiceDatas(col for col in df.columns if col not in COLUNAS_IGNORAR)
+    if historico:
+        novas = historico.datas_novas(indice_datas.rotulos)
+        if not novas:
+            return None, None, "Todas as datas da planilha já foram publicadas."
+        if len(novas) < len(indice_datas):
+            indice_datas = IndiceDatas(novas)
+    colunas_datas = indice_datas.rotulos
 
-    # EXCEÇÃO: Gabriel e Gabi devem servir juntos
-    gabriel = "Gabriel Marques"
-    gabi = "Gabi"
+    with instrumentation.etapa("gerar_rascunho.matrizes", linhas=len(df)):
+        disponibilidade, elegibilidade, ids_pessoa = montar_matrizes(df, areas, colunas_datas)
+        # Cultos com horários sobrepostos não podem ter o mesmo voluntário (ver service_times)
+        sobrepostas = colunas_sobrepostas(*HorariosCultos().minutos(colunas_datas))
+        restricoes = obter_restricoes().compilar(areas, max_shifts_per_person)
 
-    for coluna_data in colunas_datas:
-        dia_df = df[df[coluna_data] == 'SIM']
-        daily_available_servers = {}
+    carga_inicial = prioridade = None
+    if historico:
+        carga_inicial, prioridade = _vetores_historico(historico, colunas_datas)
 
-        # CORREÇÃO: Detecção mais precisa das áreas
-        for area_key in num_servidores_por_area.keys():
-            # Buscar correspondência exata ou por palavra inteira
-            servidores_area = []
-            
-            for idx, row in dia_df.iterrows():
-                area_atuacao = str(row['ÁREA DE ATUAÇÃO']).upper()
-                nome_servidor = row['NOME']
-                
-                # Verificar se a área de atuação contém a área_key como palavra completa
-                if pd.isna(area_atuacao) or area_atuacao == 'NAN':
-                    continue
-                    
-                # Dividir a área de atuação em palavras e verificar correspondências
-                palavras_areas = area_atuacao.split()
-                
-                # CORREÇÃO: Busca mais precisa
-                if area_key == 'PRODUÇÃO':
-                    # Para produção, buscar exatamente "PRODUÇÃO"
-                    if 'PRODUÇÃO' in palavras_areas or 'PRODUCAO' in palavras_areas:
-                        servidores_area.append(nome_servidor)
-                elif area_key == 'FILMAGEM':
-                    # Para filmagem, buscar "FILMAGEM" ou "FILMA"
-                    if any(palavra.startswith('FILM') for palavra in palavras_areas):
-                        servidores_area.append(nome_servidor)
-                elif area_key == 'PROJEÇÃO':
-                    # Para projeção, buscar exatamente "PROJEÇÃO" ou "PROJET"
-                    if any(palavra.startswith('PROJE') for palavra in palavras_areas):
-                        servidores_area.append(nome_servidor)
-                elif area_key == 'TAKE':
-                    # Para take, buscar "TAKE" ou "FOTO"
-                    if any(palavra in ['TAKE', 'FOTO', 'FOTOGRAF'] for palavra in palavras_areas):
-                        servidores_area.append(nome_servidor)
-                elif area_key == 'ILUMINAÇÃO':
-                    # Para iluminação, buscar "ILUMINA" ou "LUZ"
-                    if any(palavra.startswith('ILUMIN') or palavra == 'LUZ' for palavra in palavras_areas):
-                        servidores_area.append(nome_servidor)
-            
-            # Filtrar por máximo de turnos
-            current_area_available = []
-            for nome_servidor in servidores_area:
-                nome_normalizado = extrair_nome_sobrenome(nome_servidor)
-                if shifts_count.get(nome_normalizado, 0) < max_shifts_per_person:
-                    current_area_available.append(nome_normalizado)
-            
-            daily_available_servers[area_key] = list(set(current_area_available))
-        
-        available_servers_per_day[coluna_data] = daily_available_servers
+    avancar = _avancar(ao_progredir, cancelado) if ao_progredir or cancelado else None
+    try:
+        escala, available_servers_per_day = MODOS_ALOCACAO[modo](
+            disponibilidade, elegibilidade, ids_pessoa, colunas_datas,
+            num_servidores_por_area, max_shifts_per_person,
+            carga_inicial=carga_inicial, prioridade=prioridade, avancar=avancar,
+            sobrepostas=sobrepostas, restricoes=restricoes
+        )
+    except GeracaoCancelada:
+        return None, None, "Geração cancelada."
+    # O editor e os exportadores reaproveitam o índice das datas
+    escala.adotar_indice_datas(indice_datas)
+    return escala, available_servers_per_day, None
 
-        allocated_for_day = set()
-        area_counters = {area: 0 for area in num_servidores_por_area.keys()}
-        
-        # VERIFICAR SE GABRIEL ESTÁ DISPONÍVEL (PRODUÇÃO OU FILMAGEM)
-        gabriel_available = False
-        gabriel_area = None
-        
-        # Verificar se Gabriel está disponível em PRODUÇÃO
-        if (gabriel in daily_available_servers.get('PRODUÇÃO', []) and 
-            gabriel not in allocated_for_day):
-            gabriel_available = True
-            gabriel_area = 'PRODUÇÃO'
-        # Se não, verificar se está disponível em FILMAGEM
-        elif (gabriel in daily_available_servers.get('FILMAGEM', []) and 
-              gabriel not in allocated_for_day):
-            gabriel_available = True
-            gabriel_area = 'FILMAGEM'
-        
-        # VERIFICAR SE GABI ESTÁ DISPONÍVEL (TAKE)
-        gabi_available = (gabi in daily_available_servers.get('TAKE', []) and 
-                         gabi not in allocated_for_day)
-        
-        # EXCEÇÃO: Se ambos estão disponíveis, alocar juntos
-        if gabriel_available and gabi_available:
-            # Alocar Gabriel primeiro (PRODUÇÃO ou FILMAGEM)
-            funcao_gabriel = gabriel_area
-            if gabriel_area == 'FILMAGEM':
-                funcao_gabriel = "Filmagem" if area_counters[gabriel_area] == 0 else "Suporte Filmagem"
-            
-            escala_final_slots.append({
-                "Data": coluna_data,
-                "Funcao": funcao_gabriel,
-                "Voluntario": gabriel
-            })
-            allocated_for_day.add(gabriel)
-            shifts_count[gabriel] = shifts_count.get(gabriel, 0) + 1
-            daily_available_servers[gabriel_area].remove(gabriel)
-            area_counters[gabriel_area] += 1
-            
-            # Alocar Gabi no TAKE
-            funcao_gabi = "Fotografo" if area_counters['TAKE'] == 0 else "Suporte"
-            
-            escala_final_slots.append({
-                "Data": coluna_data,
-                "Funcao": funcao_gabi,
-                "Voluntario": gabi
-            })
-            allocated_for_day.add(gabi)
-            shifts_count[gabi] = shifts_count.get(gabi, 0) + 1
-            daily_available_servers['TAKE'].remove(gabi)
-            area_counters['TAKE'] += 1
-
-        # ALOCAÇÃO NORMAL PARA CADA ÁREA
+def _estrutura_replanejada(escala, num_servidores_por_area):
+    """
+    Slots do rascunho para as áreas ativas: mantém a ordem atual, remove as
+    áreas desativadas e acrescenta no fim de cada data os slots das áreas novas.
+
+    Retorna (escala, origem): origem[i] é o índice do slot no rascunho recebido, ou None.
+    """
+    registro = obter_registro()
+    areas_funcoes = [registro.area_da_funcao(funcao) for funcao in escala.funcoes]
+    codigos_funcao = escala.codigo_funcao.tolist()
+    pessoas = escala.voluntario.tolist()
+
+    novos = MontadorEscala()
+    origem = []
+    for data, indices in escala.slots_por_data().items():
+        ocupados = Counter()
+        for indice in indices:
+            area = areas_funcoes[codigos_funcao[indice]]
+            if area in num_servidores_por_area:
+                novos.adicionar(data, escala.funcoes[codigos_funcao[indice]], pessoas[indice])
+                origem.append(indice)
+                ocupados[area] += 1
         for area, num_servidores in num_servidores_por_area.items():
-            area_pool = daily_available_servers.get(area, [])
-            
-            # Só alocar se houver voluntários disponíveis para esta área
-            if not area_pool:
-                # Preencher com "Não designado" se não houver voluntários
-                for i in range(area_counters[area], num_servidores):
-                    funcao = area
-                    if area == 'TAKE':
-                        funcao = "Fotografo" if i == 0 else "Suporte"
-                    elif area == 'FILMAGEM':
-                        funcao = "Filmagem" if i == 0 else "Suporte Filmagem"
-                    
-                    escala_final_slots.append({
-                        "Data": coluna_data,
-                        "Funcao": funcao,
-                        "Voluntario": "Não designado"
-                    })
-                continue
-            
-            for i in range(area_counters[area], num_servidores):
-                funcao = area
-                if area == 'TAKE':
-                    funcao = "Fotografo" if i == 0 else "Suporte"
-                elif area == 'FILMAGEM':
-                    funcao = "Filmagem" if i == 0 else "Suporte Filmagem"
-                
-                voluntario = None
-                for v in area_pool:
-                    if v not in allocated_for_day:
-                        voluntario = v
-                        break
-                
-                if voluntario:
-                    allocated_for_day.add(voluntario)
-                    shifts_count[voluntario] = shifts_count.get(voluntario, 0) + 1
-                    area_pool.remove(voluntario)
-                else:
-                    voluntario = "Não designado"
-                
-                escala_final_slots.append({
-                    "Data": coluna_data,
-                    "Funcao": funcao,
-                    "Voluntario": voluntario
-                })
-                
-                area_counters[area] += 1
+            for posicao in range(ocupados[area], num_servidores):
+                novos.adicionar(data, registro.nome_funcao(area, posicao), ID_NAO_DESIGNADO)
+                origem.append(None)
+    return novos.escala(), origem
+
+@instrumentation.medida("replanejar_rascunho")
+def replanejar_rascunho(df, escala, fixos=(), ministerios_ativos=None, indisponiveis=(), escopo=None,
+                        historico=None, ao_progredir=None, cancelado=None):
+    """
+    Refaz parte de um rascunho sem tocar nos slots fixados à mão.
 
-    return escala_final_slots, available_servers_per_day, None
+    `escala` é o rascunho atual (como retornado por gerar_rascunho) e `fixos`
+    os índices dos slots que não podem mudar. Só as combinações data×área
+    de `escopo` são refeitas; sem escopo, entram as que têm algum slot não
+    fixo a corrigir: vazio, em conflito de horário, com voluntário indisponível na
+    data, listado em `indisponiveis`, acima do seu limite de turnos ou no
+    mesmo culto que alguém com quem não pode servir. Áreas
+    desativadas saem do rascunho e áreas novas entram vazias, no fim de
+    cada data. O restante é mantido e conta para o limite de turnos; as
+    vagas refeitas são resolvidas pelo alocador ótimo.
 
-def ler_planilha(filepath):
-    """Lê um arquivo .xlsx e retorna um DataFrame do pandas."""
+    Com um `historico` (ver shift_history), os turnos publicados no mês de
+    cada data, fora as datas do próprio rascunho, também contam para o
+    limite nela e quem serviu menos no acumulado tem preferência.
+
+    `ao_progredir(concluidos, total, mensagem)` é chamado a cada fase do
+    solver; se o evento `cancelado` for marcado, o replanejamento para na
+    fase seguinte e retorna o erro "Replanejamento cancelado.".
+
+    Retorna (nova_escala, origem, disponiveis, error): os slots ficam na
+    mesma ordem quando os ministérios não mudam, origem[i] é o índice em
+    `escala` do slot i da nova escala (None para os de áreas novas) e
+    disponiveis tem só as datas e áreas refeitas (data -> área ->
+    voluntários livres).
+    """
+    if 'ÁREA DE ATUAÇÃO' not in df.columns:
+        return None, None, None, "A coluna 'ÁREA DE ATUAÇÃO' não foi encontrada."
+
+    registro = obter_registro()
+    voluntarios = obter_registro_voluntarios()
+    if ministerios_ativos is None:
+        areas_rascunho = {registro.area_da_funcao(funcao) for funcao in escala.funcoes}
+        ministerios_ativos = [chave for chave in registro.chaves if chave in areas_rascunho]
+    num_servidores_por_area = {k: v for k, v in registro.servidores.items() if k in ministerios_ativos}
+    areas = list(num_servidores_por_area.keys())
+
+    novos, origem = _estrutura_replanejada(escala, num_servidores_por_area)
+    fixos = set(fixos)
+    fixo = [indice is not None and indice in fixos for indice in origem]
+
+    # Datas que não estão mais na planilha ficam como estão
+    colunas_datas = [data for data in novos.datas if data in df.columns]
+    indice_data = {data: i for i, data in enumerate(colunas_datas)}
+
+    with instrumentation.etapa("replanejar_rascunho.matrizes", linhas=len(df)):
+        disponibilidade, elegibilidade, ids_pessoa = montar_matrizes(df, areas, colunas_datas)
+    horarios = HorariosCultos()
+    sobrepostas = colunas_sobrepostas(*horarios.minutos(colunas_datas))
+    restricoes = obter_restricoes().compilar(areas, MAX_TURNOS_POR_PESSOA)
+
+    carga_inicial = prioridade = None
+    if historico:
+        # Republicar o rascunho substitui as datas dele no histórico, então elas não contam duas vezes
+        carga_inicial, prioridade = _vetores_historico(historico.sem_colunas(novos.datas), colunas_datas)
+
+    candidatos = {}
+    for i in range(len(colunas_datas)):
+        disponiveis_dia = disponibilidade[:, i]
+        for indice_area, area in enumerate(areas):
+            linhas = np.flatnonzero(disponiveis_dia & elegibilidade[:, indice_area])
+            ids_area = _candidatos_unicos(ids_pessoa[linhas])
+            if prioridade is not None:
+                ids_area = _ordenar_por_carga(ids_area, prioridade)
+            candidatos[(i, area)] = restricoes.ordenar(area, ids_area).tolist()
+
+    pessoas = novos.voluntario.tolist()
+    datas_codigos = [indice_data.get(data) for data in novos.datas]
+    areas_codigos = [registro.area_da_funcao(funcao) for funcao in novos.funcoes]
+    chaves = [(datas_codigos[codigo_data], areas_codigos[codigo_funcao])
+              for codigo_data, codigo_funcao in zip(novos.codigo_data.tolist(), novos.codigo_funcao.tolist())]
+    saindo = {voluntarios.id_de(nome) for nome in indisponiveis}
+
+    if escopo is None:
+        carga = Counter(p for p in pessoas if p != ID_NAO_DESIGNADO)
+        inicio, fim = horarios.minutos(novos.datas)
+        em_conflito = slots_sobrepostos(novos.voluntario, inicio[novos.codigo_data], fim[novos.codigo_data]).tolist()
+        presentes = {(chave[0], p) for chave, p in zip(chaves, pessoas)}
+        aptos = {chave: set(ids) for chave, ids in candidatos.items()}
+        escopo = {
+            chave for chave, p, e_fixo, conflito in zip(chaves, pessoas, fixo, em_conflito)
+            if not e_fixo and chave[0] is not None and (
+                p == ID_NAO_DESIGNADO or p in saindo or p not in aptos[chave]
+                or conflito or carga[p] + (0 if carga_inicial is None else carga_inicial[chave[0]][p])
+                > restricoes.limite[p]
+                or any((chave[0], outra) in presentes for outra in restricoes.exclusoes.get(p, ()))
+            )
+        }
+    else:
+        escopo = {(indice_data[data], area) for data, area in escopo if data in indice_data}
+
+    abertos = [i for i, chave in enumerate(chaves) if not fixo[i] and chave in escopo]
+    abertos_set = set(abertos)
+
+    # O que fica no rascunho ocupa o voluntário no dia (e nos cultos de horário
+    # sobreposto), impede quem não pode servir com ele e conta para o limite de turnos
+    carga_mantida = Counter()
+    ocupados = set()
+    for i, (chave, p) in enumerate(zip(chaves, pessoas)):
+        if i not in abertos_set and p != ID_NAO_DESIGNADO:
+            carga_mantida[p] += 1
+            ocupados.add((chave[0], p))
+
+    vagas = Counter(chaves[i] for i in abertos)
+    candidatos_abertos = {
+        chave: [p for p in candidatos[chave] if p not in saindo and (chave[0], p) not in ocupados
+                and not any((outra, p) in ocupados for outra in sobrepostas[chave[0]])
+                and not any((chave[0], outra) in ocupados for outra in restricoes.exclusoes.get(p, ()))]
+        for chave in vagas
+    }
+    carga_por_data = _carga_por_data(carga_inicial)
+    preferidos = {(i, area): restricoes.preferem(area, ids) for (i, area), ids in candidatos_abertos.items()}
+    fixos_par = _fixos_pares(candidatos_abertos, len(colunas_datas), restricoes, carga_mantida, carga_por_data)
+
+    avancar = _avancar(ao_progredir, cancelado) if ao_progredir or cancelado else None
+    ao_iniciar_fase = _progresso_fases(avancar, max(MAX_TURNOS_POR_PESSOA, restricoes.maior_limite))
+
+    with instrumentation.etapa("replanejar_rascunho.resolver", slots=len(abertos)):
+        try:
+            atribuicoes = resolver_escala_otima(candidatos_abertos, dict(vagas), len(colunas_datas),
+                                                MAX_TURNOS_POR_PESSOA, fixos_par, dict(carga_mantida),
+                                                ao_iniciar_fase=ao_iniciar_fase,
+                                                sobrepostas=_sobrepostas_por_data(sobrepostas),
+                                                limites=restricoes.limites, exclusoes=restricoes.exclusoes,
+                                                carga_por_data=carga_por_data,
+                                                preferidos={chave: ids for chave, ids in preferidos.items() if ids})
+        except GeracaoCancelada:
+            return None, None, None, "Replanejamento cancelado."
+
+    escalados = {chave: iter(ids) for chave, ids in atribuicoes.items()}
+    for i in abertos:
+        novos.voluntario[i] = next(escalados.get(chaves[i], iter(())), ID_NAO_DESIGNADO)
+
+    disponiveis = {}
+    for (i, area), ids in candidatos_abertos.items():
+        escalados_chave = set(atribuicoes.get((i, area), ()))
+        disponiveis.setdefault(colunas_datas[i], {})[area] = [
+            voluntarios.nome(p) for p in ids if p not in escalados_chave
+        ]
+    return novos, origem, disponiveis, None
+
+def _nome_coluna(valor, posicao, vistos):
+    """Cabeçalho em maiúsculas, com nomes vazios e repetidos tratados como no pandas."""
+    if valor is None:
+        nome = f"UNNAMED: {posicao}"
+    elif isinstance(valor, (datetime.datetime, datetime.date)):
+        nome = valor.strftime('%d/%m/%Y')
+    else:
+        nome = str(valor).upper().strip()
+
+    if nome in vistos:
+        vistos[nome] += 1
+        nome = f"{nome}.{vistos[nome]}"
+    else:
+        vistos[nome] = 0
+    return nome
+
+# Incrementar sempre que o DataFrame produzido por ler_planilha mudar, invalidando o cache
+VERSAO_LEITOR = 2
+
+def _ler_xlsx(filepath):
+    linhas = iterar_linhas(filepath)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return pd.DataFrame()
+
+    vistos = {}
+    colunas = [_nome_coluna(valor, i, vistos) for i, valor in enumerate(cabecalho)]
+    texto = {i: [] for i, nome in enumerate(colunas) if nome in ('NOME', 'ÁREA DE ATUAÇÃO')}
+    datas = {i: bytearray() for i, nome in enumerate(colunas) if nome not in COLUNAS_IGNORAR}
+
+    for linha in linhas:
+        if all(valor is None for valor in linha):
+            continue
+        linha = linha + (None,) * (len(colunas) - len(linha))
+        for i, valores in texto.items():
+            valores.append(linha[i])
+        for i, respostas in datas.items():
+            respostas.append(linha[i] == 'SIM')
+
+    dados = {colunas[i]: pd.Series(valores, dtype=object) for i, valores in texto.items()}
+    dados.update({colunas[i]: np.frombuffer(respostas, dtype=bool) for i, respostas in datas.items()})
+    return pd.DataFrame(dados, columns=[nome for i, nome in enumerate(colunas) if i in texto or i in datas])
+
+def _carregar_do_cache(chave):
     try:
-        df = pd.read_excel(filepath)
-        df.columns = df.columns.str.upper().str.strip()
+        return sheet_cache.carregar(chave)
+    except Exception as e:
+        print(f"Cache de planilha ignorado: {e}")
+        return None
+
+def _salvar_no_cache(chave, df):
+    try:
+        sheet_cache.salvar(chave, df)
+    except Exception as e:
+        print(f"Não foi possível salvar a planilha no cache: {e}")
+
+@instrumentation.medida("ler_planilha")
+def ler_planilha(filepath, usar_cache=True):
+    """
+    Lê um arquivo .xlsx e retorna um DataFrame do pandas.
+
+    As linhas são lidas em streaming e apenas NOME, ÁREA DE ATUAÇÃO e as
+    colunas de datas são mantidas. As respostas de cada data viram uma
+    coluna booleana (True para 'SIM'). Com `usar_cache`, uma planilha já
+    lida é carregada do cache em disco (ver sheet_cache) sem abrir o Excel.
+    """
+    try:
+        chave = None
+        if usar_cache:
+            chave = sheet_cache.chave_cache(filepath, VERSAO_LEITOR)
+            df = _carregar_do_cache(chave)
+            if df is not None:
+                instrumentation.contar("planilha.cache_acertos")
+                return df, None
+            instrumentation.contar("planilha.cache_faltas")
+
+        with instrumentation.etapa("ler_planilha.xlsx"):
+            df = _ler_xlsx(filepath)
+        if chave:
+            _salvar_no_cache(chave, df)
         return df, None
     except FileNotFoundError:
         return None, "Arquivo não encontrado. Verifique o caminho do arquivo."
     except Exception as e:
-        return None, f"Erro ao ler o arquivo: {e}"
\ No newline at end of file
+        return None, f"Erro ao ler o arquivo: {e}"
@@ -0,0 +1,114 @@
+"""
+Colunas de data da planilha interpretadas uma única vez.
+
+Cada cabeçalho ("05/01/2025 DOMINGO", "08/01 QUARTA 20h", ...) vira uma
+ColunaData com a data, o dia da semana e o horário do culto quando
+informado. O resultado fica em cache por texto, então o alocador, o
+editor e os exportadores compartilham a mesma interpretação, e
+IndiceDatas mantém as colunas em ordem cronológica.
+"""
+import datetime
+import functools
+import re
+from collections import namedtuple
+
+_DATA = re.compile(r'(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?')
+_HORARIO = re.compile(r'\b(\d{1,2})\s*(?:[:h]\s*(\d{2})?)(?:\s*(?:-|às|as|a)\s*(\d{1,2})\s*(?:[:h]\s*(\d{2})?))?', re.IGNORECASE)
+
+DIAS_SEMANA = ['SEGUNDA', 'TERÇA', 'QUARTA', 'QUINTA', 'SEXTA', 'SÁBADO', 'DOMINGO']
+
+ColunaData = namedtuple('ColunaData', ['rotulo', 'data', 'dia_semana', 'inicio', 'fim'])
+ColunaData.__doc__ = """
+Cabeçalho de uma coluna de data: `data` é um datetime.date (None se o
+texto não tiver data), `dia_semana` o nome em maiúsculas e `inicio`/`fim`
+o horário do culto (datetime.time) quando o cabeçalho o informa.
+"""
+
+def _hora(horas, minutos):
+    horas = int(horas)
+    if horas > 23:
+        return None
+    return datetime.time(horas, int(minutos or 0))
+
+def _ano_provavel(dia, mes, resto):
+    """Ano de uma data sem ano: o corrente, ou o vizinho em que o dia da semana escrito bate."""
+    atual = datetime.date.today().year
+    dia_semana = next((i for i, nome in enumerate(DIAS_SEMANA) if nome in resto.upper()), None)
+    if dia_semana is not None:
+        for ano in (atual, atual + 1, atual - 1):
+            try:
+                if datetime.date(ano, mes, dia).weekday() == dia_semana:
+                    return ano
+            except ValueError:
+                break
+    return atual
+
+@functools.lru_cache(maxsize=4096)
+def interpretar_coluna(rotulo):
+    """ColunaData do cabeçalho; sem ano, usa o ano corrente ou o vizinho que bate com o dia da semana."""
+    texto = str(rotulo)
+    match = _DATA.search(texto)
+    if not match:
+        return ColunaData(texto, None, None, None, None)
+
+    dia, mes, ano = match.groups()
+    resto = texto[match.end():]
+    if ano is None:
+        ano = _ano_provavel(int(dia), int(mes), resto)
+    elif len(ano) == 2:
+        ano = 2000 + int(ano)
+    try:
+        data = datetime.date(int(ano), int(mes), int(dia))
+    except ValueError:
+        return ColunaData(texto, None, None, None, None)
+
+    inicio = fim = None
+    horario = _HORARIO.search(resto)
+    if horario:
+        inicio = _hora(horario.group(1), horario.group(2))
+        if horario.group(3):
+            fim = _hora(horario.group(3), horario.group(4))
+
+    return ColunaData(texto, data, DIAS_SEMANA[data.weekday()], inicio, fim)
+
+def chave_cronologica(rotulo, posicao=0):
+    """Chave de ordenação: colunas com data em ordem cronológica, as demais no fim, na posição original."""
+    coluna = interpretar_coluna(rotulo)
+    if coluna.data is None:
+        return (1, datetime.date.min, datetime.time.min, posicao)
+    return (0, coluna.data, coluna.inicio or datetime.time.min, posicao)
+
+class IndiceDatas:
+    """
+    Colunas de data de uma planilha em ordem cronológica.
+
+    `rotulos` ficam ordenados por data e horário (empates e colunas sem
+    data mantêm a ordem da planilha) e `posicao(rotulo)` dá o índice de cada
+    um nessa ordem.
+    """
+
+    def __init__(self, rotulos):
+        rotulos = list(rotulos)
+        ordem = sorted(range(len(rotulos)), key=lambda i: chave_cronologica(rotulos[i], i))
+        self.rotulos = [rotulos[i] for i in ordem]
+        self.colunas = [interpretar_coluna(rotulo) for rotulo in self.rotulos]
+        self._posicoes = {rotulo: i for i, rotulo in enumerate(self.rotulos)}
+
+    def __len__(self):
+        return len(self.rotulos)
+
+    def __iter__(self):
+        return iter(self.rotulos)
+
+    def __contains__(self, rotulo):
+        return rotulo in self._posicoes
+
+    def posicao(self, rotulo):
+        return self._posicoes[rotulo]
+
+    def coluna(self, rotulo):
+        return self.colunas[self._posicoes[rotulo]]
+
+    def ordenar(self, rotulos):
+        """Ordena outros rótulos pela mesma regra (rótulos fora do índice vão para o fim)."""
+        return sorted(rotulos, key=lambda r: self._posicoes.get(r, len(self._posicoes)))
@@ -0,0 +1,289 @@
+"""
+Armazenamento do rascunho da escala em SQLite.
+
+Cada geração cria uma sessão com seus slots e a disponibilidade por data e
+área, em tabelas indexadas. Editar um slot é um UPDATE de uma linha,
+gravado na hora; reabrir o editor carrega os slots e busca a
+disponibilidade de cada data apenas quando ela é exibida.
+
+Escalas publicadas entram no histórico, que guarda só quantos turnos cada
+voluntário fez em cada data (ver shift_history) e sobrevive a "Nova Escala".
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import instrumentation
+
+NAO_DESIGNADO = "Não designado"
+
+DB_PATH = os.environ.get(
+    "PIBSHIFT_DB",
+    os.path.join(os.path.expanduser("~"), ".pibshift", "rascunhos.db")
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sessoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criada_em TEXT NOT NULL,
+    arquivo TEXT,
+    ministerios TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slots (
+    sessao_id INTEGER NOT NULL REFERENCES sessoes(id) ON DELETE CASCADE,
+    slot_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    funcao TEXT NOT NULL,
+    voluntario TEXT NOT NULL,
+    PRIMARY KEY (sessao_id, slot_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_slots_data ON slots (sessao_id, data);
+CREATE TABLE IF NOT EXISTS disponibilidade (
+    sessao_id INTEGER NOT NULL REFERENCES sessoes(id) ON DELETE CASCADE,
+    data TEXT NOT NULL,
+    area TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    voluntario TEXT NOT NULL,
+    PRIMARY KEY (sessao_id, data, area, posicao)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS slots_fixos (
+    sessao_id INTEGER NOT NULL REFERENCES sessoes(id) ON DELETE CASCADE,
+    slot_id INTEGER NOT NULL,
+    PRIMARY KEY (sessao_id, slot_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS historico_datas (
+    data TEXT PRIMARY KEY,
+    mes TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS historico (
+    data TEXT NOT NULL REFERENCES historico_datas(data) ON DELETE CASCADE,
+    voluntario TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    turnos INTEGER NOT NULL,
+    PRIMARY KEY (data, voluntario)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_historico_mes ON historico (mes, voluntario);
+"""
+
+class RascunhoStore:
+    """Acesso ao banco de rascunhos; seguro para uso pelas threads dos eventos do Flet."""
+
+    def __init__(self, caminho=DB_PATH):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.execute("PRAGMA foreign_keys=ON")
+            self._conexao.executescript(_ESQUEMA)
+
+    @instrumentation.medida("rascunho.criar_sessao")
+    def criar_sessao(self, escala, available_servers, ministerios_ativos, arquivo=None):
+        """Grava um rascunho novo (uma Escala), substituindo os anteriores, e retorna o id da sessão."""
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM sessoes")
+            cursor = self._conexao.execute(
+                "INSERT INTO sessoes (criada_em, arquivo, ministerios) VALUES (?, ?, ?)",
+                (datetime.datetime.now().isoformat(timespec="seconds"), arquivo, json.dumps(ministerios_ativos))
+            )
+            sessao_id = cursor.lastrowid
+            self._conexao.executemany(
+                "INSERT INTO slots VALUES (?, ?, ?, ?, ?)",
+                ((sessao_id, slot_id, data, funcao, voluntario)
+                 for slot_id, (data, funcao, voluntario) in enumerate(escala.linhas()))
+            )
+            self._conexao.executemany(
+                "INSERT INTO disponibilidade VALUES (?, ?, ?, ?, ?)",
+                ((sessao_id, data, area, posicao, voluntario)
+                 for data, areas in available_servers.items()
+                 for area, voluntarios in areas.items()
+                 for posicao, voluntario in enumerate(voluntarios))
+            )
+        return sessao_id
+
+    def sessao_atual(self):
+        """Id da sessão mais recente, ou None se não houver rascunho."""
+        with self._lock:
+            linha = self._conexao.execute("SELECT MAX(id) FROM sessoes").fetchone()
+        return linha[0] if linha else None
+
+    def arquivo(self, sessao_id):
+        """Planilha de onde o rascunho foi gerado."""
+        with self._lock:
+            linha = self._conexao.execute("SELECT arquivo FROM sessoes WHERE id = ?", (sessao_id,)).fetchone()
+        return linha[0] if linha else None
+
+    def ministerios(self, sessao_id):
+        with self._lock:
+            linha = self._conexao.execute("SELECT ministerios FROM sessoes WHERE id = ?", (sessao_id,)).fetchone()
+        return json.loads(linha[0]) if linha else []
+
+    @instrumentation.medida("rascunho.carregar_escala")
+    def carregar_escala(self, sessao_id):
+        """Escala da sessão na ordem original, no mesmo formato gerado por gerar_rascunho."""
+        from schedule import Escala
+
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT data, funcao, voluntario FROM slots WHERE sessao_id = ? ORDER BY slot_id",
+                (sessao_id,)
+            ).fetchall()
+        return Escala.de_colunas(*zip(*linhas)) if linhas else Escala.de_colunas((), (), ())
+
+    @instrumentation.medida("rascunho.carregar_disponiveis")
+    def carregar_disponiveis(self, sessao_id, data):
+        """Voluntários disponíveis por área em uma única data."""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT area, voluntario FROM disponibilidade WHERE sessao_id = ? AND data = ? "
+                "ORDER BY area, posicao",
+                (sessao_id, data)
+            ).fetchall()
+        disponiveis = {}
+        for area, voluntario in linhas:
+            disponiveis.setdefault(area, []).append(voluntario)
+        return disponiveis
+
+    @instrumentation.medida("rascunho.atualizar_slot")
+    def atualizar_slot(self, sessao_id, slot_id, voluntario):
+        """Salva a troca de voluntário de um slot."""
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "UPDATE slots SET voluntario = ? WHERE sessao_id = ? AND slot_id = ?",
+                (voluntario, sessao_id, slot_id)
+            )
+
+    def slots_fixos(self, sessao_id):
+        """Ids dos slots fixados à mão, que o replanejamento não altera."""
+        with self._lock:
+            linhas = self._conexao.execute("SELECT slot_id FROM slots_fixos WHERE sessao_id = ?", (sessao_id,))
+            return {linha[0] for linha in linhas}
+
+    def fixar_slot(self, sessao_id, slot_id, fixo=True):
+        with self._lock, self._conexao:
+            if fixo:
+                self._conexao.execute("INSERT OR IGNORE INTO slots_fixos VALUES (?, ?)", (sessao_id, slot_id))
+            else:
+                self._conexao.execute(
+                    "DELETE FROM slots_fixos WHERE sessao_id = ? AND slot_id = ?", (sessao_id, slot_id)
+                )
+
+    @instrumentation.medida("rascunho.aplicar_replanejamento")
+    def aplicar_replanejamento(self, sessao_id, alteracoes, disponiveis):
+        """
+        Grava um replanejamento em uma única transação.
+
+        `alteracoes`: slot_id -> novo voluntário; `disponiveis`: data -> área ->
+        voluntários livres, substituindo a disponibilidade só dessas áreas.
+        """
+        with self._lock, self._conexao:
+            self._conexao.executemany(
+                "UPDATE slots SET voluntario = ? WHERE sessao_id = ? AND slot_id = ?",
+                ((voluntario, sessao_id, slot_id) for slot_id, voluntario in alteracoes.items())
+            )
+            self._substituir_disponiveis(sessao_id, disponiveis)
+
+    def _substituir_disponiveis(self, sessao_id, disponiveis):
+        self._conexao.executemany(
+            "DELETE FROM disponibilidade WHERE sessao_id = ? AND data = ? AND area = ?",
+            ((sessao_id, data, area) for data, areas in disponiveis.items() for area in areas)
+        )
+        self._conexao.executemany(
+            "INSERT INTO disponibilidade VALUES (?, ?, ?, ?, ?)",
+            ((sessao_id, data, area, posicao, voluntario)
+             for data, areas in disponiveis.items()
+             for area, voluntarios in areas.items()
+             for posicao, voluntario in enumerate(voluntarios))
+        )
+
+    @instrumentation.medida("rascunho.substituir_escala")
+    def substituir_escala(self, sessao_id, escala, fixos, disponiveis, ministerios_ativos):
+        """
+        Troca os slots da sessão por uma Escala com outra estrutura (ex.: após
+        mudar os ministérios), em uma única transação.
+
+        `fixos` são os novos índices dos slots fixados; a disponibilidade de
+        áreas que saíram é removida e a de `disponiveis` substituída.
+        """
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "UPDATE sessoes SET ministerios = ? WHERE id = ?", (json.dumps(ministerios_ativos), sessao_id)
+            )
+            self._conexao.execute("DELETE FROM slots WHERE sessao_id = ?", (sessao_id,))
+            self._conexao.executemany(
+                "INSERT INTO slots VALUES (?, ?, ?, ?, ?)",
+                ((sessao_id, slot_id, data, funcao, voluntario)
+                 for slot_id, (data, funcao, voluntario) in enumerate(escala.linhas()))
+            )
+            self._conexao.execute("DELETE FROM slots_fixos WHERE sessao_id = ?", (sessao_id,))
+            self._conexao.executemany(
+                "INSERT INTO slots_fixos VALUES (?, ?)", ((sessao_id, slot_id) for slot_id in sorted(fixos))
+            )
+            areas = list(ministerios_ativos)
+            self._conexao.execute(
+                f"DELETE FROM disponibilidade WHERE sessao_id = ? AND area NOT IN ({', '.join('?' * len(areas))})",
+                (sessao_id, *areas)
+            )
+            self._substituir_disponiveis(sessao_id, disponiveis)
+
+    def descartar(self):
+        """Remove todos os rascunhos."""
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM sessoes")
+
+    @instrumentation.medida("rascunho.publicar")
+    def publicar(self, escala, chave_da_data, mes_da_data):
+        """
+        Registra uma Escala no histórico, substituindo as datas que já estavam lá.
+
+        `chave_da_data(data)` devolve a chave com que cada coluna de data é
+        guardada e `mes_da_data(data)` o seu mês ('AAAA-MM').
+        Retorna o número de datas publicadas.
+        """
+        chaves = {}
+        datas = {}
+        turnos = {}
+        for data, _, voluntario in escala.linhas():
+            chave = chaves.get(data)
+            if chave is None:
+                chave = chaves[data] = chave_da_data(data)
+                datas.setdefault(chave, mes_da_data(data))
+            if voluntario != NAO_DESIGNADO:
+                turnos[(chave, voluntario)] = turnos.get((chave, voluntario), 0) + 1
+
+        with self._lock, self._conexao:
+            # Datas gravadas com outra forma da mesma chave (ex.: texto do cabeçalho) também são substituídas
+            gravadas = [linha[0] for linha in self._conexao.execute("SELECT data FROM historico_datas")]
+            substituidas = [data for data in gravadas if data in datas or chave_da_data(data) in datas]
+            self._conexao.executemany("DELETE FROM historico_datas WHERE data = ?", ((data,) for data in substituidas))
+            self._conexao.executemany("INSERT INTO historico_datas VALUES (?, ?)", datas.items())
+            self._conexao.executemany(
+                "INSERT INTO historico VALUES (?, ?, ?, ?)",
+                ((data, voluntario, datas[data], n) for (data, voluntario), n in turnos.items())
+            )
+        return len(datas)
+
+    def carregar_historico(self):
+        """(datas publicadas, [(data, mes, voluntario, turnos)])."""
+        with self._lock:
+            datas = [linha[0] for linha in self._conexao.execute("SELECT data FROM historico_datas")]
+            turnos = self._conexao.execute("SELECT data, mes, voluntario, turnos FROM historico").fetchall()
+        return datas, turnos
+
+    def limpar_historico(self):
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM historico_datas")
+
+_store = None
+_store_lock = threading.Lock()
+
+def obter_store():
+    """Banco de rascunhos compartilhado, aberto na primeira utilização."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RascunhoStore()
+    return _store
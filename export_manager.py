@@ -1,124 +1,110 @@
-from fpdf import FPDF
-from ics import Calendar, Event
-import datetime
+from pdf_renderer import RenderizadorPDF, agrupar_por_data
+from ics_writer import EscritorICS
+from utils import nome_arquivo_seguro
+from schedule import como_dataframe
+import functools
+import instrumentation
+import numpy as np
 import pandas as pd
-import re
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-def exportar_pdf(escala_df, filename):
+def _aceita_escala(exportador):
+    """Lets an exporter receive a schedule.Escala as well as a DataFrame."""
+    @functools.wraps(exportador)
+    def exportar(escala, *args, **kwargs):
+        return exportador(como_dataframe(escala), *args, **kwargs)
+    return exportar
+
+@instrumentation.medida("exportar_pdf")
+@_aceita_escala
+def exportar_pdf(escala_df, filename, layout='tabela', colunas_mural=3, titulo="Escala PibShift"):
     """
-    Exports the schedule to a PDF file with a table format.
+    Exports the schedule to a PDF file grouped by date.
+
+    layout='tabela' draws a paginated Função | Voluntário table with the
+    headers repeated on every page; layout='mural' lays the date blocks out
+    in `colunas_mural` columns per page.
     """
     try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, "Escala PibShift", 0, 1, 'C')
-        pdf.ln(10)
+        renderizador = RenderizadorPDF(titulo)
 
         # Verificar se o DataFrame não está vazio
         if escala_df.empty:
-            pdf.set_font("Arial", size=12)
-            pdf.cell(0, 10, "Nenhuma escala para exportar", 0, 1, 'C')
-            pdf.output(filename)
+            renderizador.vazio("Nenhuma escala para exportar")
+            renderizador.salvar(filename)
             return True, "PDF criado (sem dados)"
 
-        pdf.set_font("Arial", "B", 12)
-        # Cabeçalhos da tabela
-        col_widths = [40, 60, 80]  # Larguras das colunas
-        headers = ["Data", "Função", "Voluntário"]
-        
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 10, header, 1, 0, 'C')
-        pdf.ln()
-
-        pdf.set_font("Arial", size=10)
-        # Linhas da tabela
-        for index, row in escala_df.iterrows():
-            data = str(row.get('Data', ''))[:20]  # Limitar tamanho
-            funcao = str(row.get('Funcao', ''))[:25]
-            voluntario = str(row.get('Voluntario', ''))[:30]
-            
-            pdf.cell(col_widths[0], 8, data, 1, 0, 'L')
-            pdf.cell(col_widths[1], 8, funcao, 1, 0, 'L')
-            pdf.cell(col_widths[2], 8, voluntario, 1, 1, 'L')
-
-        pdf.output(filename)
+        grupos = agrupar_por_data(escala_df)
+        if layout == 'mural':
+            renderizador.mural(*grupos, colunas=colunas_mural)
+        else:
+            renderizador.tabela(*grupos)
+
+        renderizador.salvar(filename)
         return True, f"PDF exportado com sucesso: {filename}"
     except Exception as e:
         return False, f"Erro ao gerar PDF: {str(e)}"
 
-def exportar_ics(escala_df, filename):
+@instrumentation.medida("exportar_ics")
+@_aceita_escala
+def exportar_ics(escala_df, filename, pasta_voluntarios=None):
     """
-    Exports the schedule to an iCalendar (.ics) file.
+    Exports the schedule to an iCalendar (.ics) file, streaming each event to disk.
+
+    Service times, location and attendee e-mails come from
+    config/calendario.json. When `pasta_voluntarios` is given, a personal
+    calendar per volunteer is written there in the same pass; `filename`
+    may be None to write only the personal calendars.
     """
     try:
         if escala_df.empty:
             return False, "Nenhum evento para exportar"
 
-        c = Calendar()
-        eventos_criados = 0
-        
-        for i, row in escala_df.iterrows():
-            if row.get('Voluntario') == 'Não designado':
-                continue
-                
-            e = Event()
-            e.name = f"PibShift - {row.get('Funcao', 'Serviço')}"
-            e.description = f"Voluntário: {row.get('Voluntario', '')}"
-            
-            # Parse da data
-            data_str = str(row.get('Data', ''))
-            
-            # Extrair data usando regex (DD/MM/YYYY ou DD/MM)
-            match = re.search(r'(\d{1,2})/(\d{1,2})(?:/(\d{4}))?', data_str)
-            if match:
-                dia, mes, ano = match.groups()
-                ano = ano or datetime.datetime.now().year
-                
-                try:
-                    event_date = datetime.datetime(int(ano), int(mes), int(dia), 19, 0)  # 19:00
-                    e.begin = event_date
-                    e.end = event_date.replace(hour=22, minute=0)  # 3 horas de duração
-                    
-                    c.events.add(e)
-                    eventos_criados += 1
-                except ValueError:
-                    continue
-        
-        if eventos_criados == 0:
+        eventos, individuais = EscritorICS().escrever(escala_df, filename, pasta_voluntarios)
+
+        if eventos == 0:
+            for caminho in [filename, *individuais.values()]:
+                if caminho and os.path.exists(caminho):
+                    os.remove(caminho)
             return False, "Nenhum evento válido encontrado"
-            
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.writelines(c.serialize_iter())
 
-        return True, f"ICS exportado com {eventos_criados} eventos: {filename}"
+        if pasta_voluntarios:
+            return True, f"ICS exportado com {eventos} eventos e {len(individuais)} calendários individuais"
+        return True, f"ICS exportado com {eventos} eventos: {filename}"
     except Exception as e:
         return False, f"Erro ao gerar ICS: {str(e)}"
 
-def copiar_whatsapp(escala_df):
+@instrumentation.medida("copiar_whatsapp")
+@_aceita_escala
+def copiar_whatsapp(escala_df, titulo="Escala PibShift"):
     """
     Formats the schedule as a string to be copied to WhatsApp.
     """
     try:
         if escala_df.empty:
-            return "📋 *Escala PibShift*\n\nNenhuma escala disponível"
-        
-        whatsapp_string = "📋 *Escala PibShift*\n\n"
-        
-        # Agrupar por data
-        for data, grupo in escala_df.groupby('Data'):
-            whatsapp_string += f"📅 *{data}*\n"
-            for i, row in grupo.iterrows():
-                funcao = row.get('Funcao', 'N/A')
-                voluntario = row.get('Voluntario', 'Vazio')
-                emoji = "✅" if voluntario != "Não designado" else "❌"
-                whatsapp_string += f"{emoji} *{funcao}:* {voluntario}\n"
-            whatsapp_string += "\n"
-        
-        return whatsapp_string
+            return f"📋 *{titulo}*\n\nNenhuma escala disponível"
+
+        partes = [f"📋 *{titulo}*\n\n"]
+
+        # Agrupar por data, na ordem da escala
+        datas, inicios, funcoes, voluntarios = agrupar_por_data(escala_df)
+        for indice, data in enumerate(datas):
+            partes.append(f"📅 *{data}*\n")
+            for i in range(inicios[indice], inicios[indice + 1]):
+                emoji = "✅" if voluntarios[i] != "Não designado" else "❌"
+                partes.append(f"{emoji} *{funcoes[i]}:* {voluntarios[i]}\n")
+            partes.append("\n")
+
+        return "".join(partes)
     except Exception as e:
         return f"❌ Erro ao formatar: {str(e)}"
 
+@instrumentation.medida("exportar_xlsx")
+@_aceita_escala
 def exportar_xlsx(escala_df, filename):
     """Exports the schedule to an Excel (.xlsx) file."""
     try:
@@ -131,4 +117,198 @@ def exportar_xlsx(escala_df, filename):
         df_to_export.to_excel(filename, index=False, engine='openpyxl')
         return True, f"Excel exportado: {filename}"
     except Exception as e:
-        return False, f"Erro ao exportar Excel: {str(e)}"
\ No newline at end of file
+        return False, f"Erro ao exportar Excel: {str(e)}"
+
+ARQUIVOS_EXPORTACAO = {
+    'pdf': 'escala_pibshift.pdf',
+    'xlsx': 'escala_pibshift.xlsx',
+    'ics': 'escala_pibshift.ics',
+    'whatsapp': 'escala_pibshift.txt',
+}
+
+def _exportar_formato(formato, escala_df, filename):
+    """Executa um exportador; roda em um processo do pool de exportar_tudo."""
+    if formato == 'pdf':
+        return exportar_pdf(escala_df, filename)
+    if formato == 'xlsx':
+        return exportar_xlsx(escala_df, filename)
+    if formato == 'ics':
+        return exportar_ics(escala_df, filename)
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(copiar_whatsapp(escala_df))
+        return True, f"Texto do WhatsApp exportado: {filename}"
+    except Exception as e:
+        return False, f"Erro ao exportar texto do WhatsApp: {str(e)}"
+
+@instrumentation.medida("exportar_tudo")
+@_aceita_escala
+def exportar_tudo(escala_df, pasta, formatos=None, ao_progredir=None, cancelado=None, max_workers=None):
+    """
+    Exports the schedule to every format at once, each one in a worker process.
+
+    `escala_df` is copied once and the same snapshot is sent to every
+    exporter. `ao_progredir(concluidos, total, mensagem)` is called as each
+    format finishes. If the `cancelado` event is set, formats that have not
+    started yet are skipped. Returns a dict formato -> (success, message).
+    """
+    formatos = formatos or list(ARQUIVOS_EXPORTACAO)
+    snapshot = escala_df[['Data', 'Funcao', 'Voluntario']].copy() if not escala_df.empty \
+        else pd.DataFrame(columns=['Data', 'Funcao', 'Voluntario'])
+    resultados = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(formatos), os.cpu_count() or 1)) as executor:
+        futuros = {
+            executor.submit(_exportar_formato, formato, snapshot,
+                            os.path.join(pasta, ARQUIVOS_EXPORTACAO[formato])): formato
+            for formato in formatos
+        }
+        pendentes = set(futuros)
+        while pendentes:
+            if cancelado is not None and cancelado.is_set():
+                for futuro in pendentes:
+                    futuro.cancel()
+            concluidos, pendentes = wait(pendentes, timeout=0.1, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                formato = futuros[futuro]
+                if futuro.cancelled():
+                    resultados[formato] = (False, f"{formato.upper()}: exportação cancelada")
+                else:
+                    try:
+                        resultados[formato] = futuro.result()
+                    except Exception as e:
+                        resultados[formato] = (False, f"Erro ao exportar {formato}: {str(e)}")
+                if ao_progredir:
+                    ao_progredir(len(resultados), len(formatos), resultados[formato][1])
+
+    return resultados
+
+
+def _particionar_por_voluntario(escala_df):
+    """
+    Separa a escala por voluntário com uma única ordenação.
+
+    Retorna (voluntarios, inicios, ordem, ordens_slot): as linhas de
+    voluntarios[i] são ordem[inicios[i]:inicios[i + 1]], na ordem da escala,
+    e ordens_slot traz a ordem de cada linha entre as da mesma data e função
+    na escala completa (usada nos UIDs do ICS). Slots não designados ficam de fora.
+    """
+    ordens_slot = escala_df.groupby(['Data', 'Funcao'], sort=False).cumcount().to_numpy()
+    codigos, voluntarios = pd.factorize(escala_df['Voluntario'])
+    designados = codigos[codigos >= 0]
+    ordem = np.flatnonzero(codigos >= 0)[np.argsort(designados, kind='stable')]
+    inicios = np.searchsorted(codigos[ordem], np.arange(len(voluntarios) + 1))
+    manter = [i for i, v in enumerate(voluntarios) if v != "Não designado"]
+    return [voluntarios[i] for i in manter], [(inicios[i], inicios[i + 1]) for i in manter], ordem, ordens_slot
+
+def _exportar_lote_voluntarios(lote, pasta):
+    """
+    Gera PDF, ICS e texto de WhatsApp de cada voluntário do lote; roda em um processo do pool.
+
+    `lote` é uma lista de (voluntario, nome_pasta, escala_pessoal, ordens_slot).
+    Retorna (arquivos, erros) com os caminhos relativos a `pasta`.
+    """
+    arquivos = []
+    erros = []
+    for voluntario, nome_pasta, escala_pessoal, ordens_slot in lote:
+        destino = os.path.join(pasta, nome_pasta)
+        os.makedirs(destino, exist_ok=True)
+        titulo = f"Escala PibShift - {voluntario}"
+
+        success, message = exportar_pdf(escala_pessoal, os.path.join(destino, f"{nome_pasta}.pdf"), titulo=titulo)
+        if success:
+            arquivos.append(os.path.join(nome_pasta, f"{nome_pasta}.pdf"))
+        else:
+            erros.append(f"{voluntario}: {message}")
+
+        try:
+            caminho_ics = os.path.join(destino, f"{nome_pasta}.ics")
+            eventos, _ = EscritorICS().escrever(escala_pessoal, caminho_ics, ordens=ordens_slot, individual=True)
+            if eventos:
+                arquivos.append(os.path.join(nome_pasta, f"{nome_pasta}.ics"))
+            else:
+                os.remove(caminho_ics)
+        except Exception as e:
+            erros.append(f"{voluntario}: Erro ao gerar ICS: {str(e)}")
+
+        with open(os.path.join(destino, f"{nome_pasta}.txt"), 'w', encoding='utf-8') as f:
+            f.write(copiar_whatsapp(escala_pessoal, titulo=titulo))
+        arquivos.append(os.path.join(nome_pasta, f"{nome_pasta}.txt"))
+
+    return arquivos, erros
+
+@instrumentation.medida("exportar_por_voluntario")
+@_aceita_escala
+def exportar_por_voluntario(escala_df, arquivo_zip, ao_progredir=None, cancelado=None, max_workers=None):
+    """
+    Exports a personal PDF, ICS and WhatsApp text for each volunteer, packed into one zip.
+
+    The schedule is partitioned by volunteer once; volunteers are split into
+    batches that run in worker processes, and each batch's files go into the
+    zip as soon as it finishes. `ao_progredir(concluidos, total, mensagem)`
+    counts volunteers; setting `cancelado` skips batches that have not
+    started and discards the archive.
+    """
+    try:
+        if escala_df.empty:
+            return False, "Nenhuma escala para exportar"
+
+        snapshot = escala_df[['Data', 'Funcao', 'Voluntario']].reset_index(drop=True)
+        voluntarios, faixas, ordem, ordens_slot = _particionar_por_voluntario(snapshot)
+        if not voluntarios:
+            return False, "Nenhum voluntário designado na escala"
+
+        # Um nome de pasta por voluntário, sem repetir mesmo que os nomes coincidam após a limpeza
+        pessoas = []
+        usados = set()
+        for voluntario, (inicio, fim) in zip(voluntarios, faixas):
+            base = nome_pasta = nome_arquivo_seguro(voluntario, 'voluntario')
+            sufixo = 2
+            while nome_pasta in usados:
+                nome_pasta = f"{base}_{sufixo}"
+                sufixo += 1
+            usados.add(nome_pasta)
+            linhas = ordem[inicio:fim]
+            pessoas.append((voluntario, nome_pasta, snapshot.iloc[linhas].reset_index(drop=True), ordens_slot[linhas]))
+
+        workers = max_workers or os.cpu_count() or 1
+        tamanho_lote = max(1, -(-len(pessoas) // (workers * 4)))
+        lotes = [pessoas[i:i + tamanho_lote] for i in range(0, len(pessoas), tamanho_lote)]
+
+        pasta_temporaria = tempfile.mkdtemp(prefix="pibshift_")
+        erros = []
+        concluidos = 0
+        try:
+            with zipfile.ZipFile(arquivo_zip, 'w', zipfile.ZIP_DEFLATED) as pacote, \
+                    ProcessPoolExecutor(max_workers=min(workers, len(lotes))) as executor:
+                futuros = {executor.submit(_exportar_lote_voluntarios, lote, pasta_temporaria): lote for lote in lotes}
+                pendentes = set(futuros)
+                while pendentes:
+                    if cancelado is not None and cancelado.is_set():
+                        for futuro in pendentes:
+                            futuro.cancel()
+                    prontos, pendentes = wait(pendentes, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for futuro in prontos:
+                        if futuro.cancelled():
+                            continue
+                        try:
+                            arquivos, erros_lote = futuro.result()
+                        except Exception as e:
+                            arquivos, erros_lote = [], [f"Erro ao exportar lote: {str(e)}"]
+                        erros.extend(erros_lote)
+                        for relativo in arquivos:
+                            pacote.write(os.path.join(pasta_temporaria, relativo), relativo)
+                        concluidos += len(futuros[futuro])
+                        if ao_progredir:
+                            ao_progredir(concluidos, len(pessoas), futuros[futuro][-1][0])
+        finally:
+            shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+        if cancelado is not None and cancelado.is_set():
+            os.remove(arquivo_zip)
+            return False, "Exportação cancelada"
+        if erros:
+            return False, " | ".join(erros)
+        return True, f"Escalas individuais de {len(pessoas)} voluntários exportadas: {arquivo_zip}"
+    except Exception as e:
+        return False, f"Erro ao exportar escalas individuais: {str(e)}"
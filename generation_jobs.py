@@ -0,0 +1,212 @@
+"""
+Geração de escalas em segundo plano.
+
+A interface pede uma geração ao ExecutorGeracao e volta a responder na
+hora: ler_planilha, gerar_rascunho e a gravação do rascunho rodam em uma
+única thread de trabalho, que informa o progresso data a data e pode ser
+cancelada entre duas datas. Nunca há duas gerações em paralelo: um pedido
+igual ao que está rodando só passa a acompanhá-lo, e um pedido diferente
+cancela o atual e fica na fila no lugar de qualquer outro que ainda não
+começou. O replanejamento de um rascunho usa a mesma fila.
+"""
+import threading
+import time
+import instrumentation
+
+# Intervalo mínimo entre duas notificações de progresso, para não inundar a interface
+INTERVALO_PROGRESSO = 0.1
+
+class TrabalhoGeracao:
+    """
+    Um pedido de geração e quem aguarda por ele.
+
+    `parametros` identifica o pedido (pedidos iguais são atendidos por um
+    único trabalho), `executar(trabalho)` o atende e `entrada` leva dados
+    que não entram nessa comparação.
+    """
+
+    def __init__(self, parametros, ao_progredir, ao_concluir, executar=None, entrada=None):
+        self.parametros = parametros
+        self.executar = executar
+        self.entrada = entrada
+        self.cancelado = threading.Event()
+        self.ouvintes = [(ao_progredir, ao_concluir)]
+        self._ultimo_progresso = 0.0
+
+    def acompanhar(self, ao_progredir, ao_concluir):
+        if (ao_progredir, ao_concluir) not in self.ouvintes:
+            self.ouvintes.append((ao_progredir, ao_concluir))
+
+    def progredir(self, concluidos, total, mensagem, forcar=False):
+        agora = time.monotonic()
+        if not forcar and agora - self._ultimo_progresso < INTERVALO_PROGRESSO:
+            return
+        self._ultimo_progresso = agora
+        for ao_progredir, _ in list(self.ouvintes):
+            if ao_progredir is not None:
+                try:
+                    ao_progredir(concluidos, total, mensagem)
+                except Exception as e:
+                    print(f"Erro ao exibir o progresso da geração: {e}")
+
+    def concluir(self, resultado, error):
+        for _, ao_concluir in list(self.ouvintes):
+            if ao_concluir is not None:
+                ao_concluir(resultado, error, self.cancelado.is_set())
+
+def executar_geracao(trabalho):
+    """Lê a planilha, gera o rascunho e o grava; retorna (sessao_id, error)."""
+    from core_logic import ler_planilha, gerar_rascunho
+    from draft_store import obter_store
+
+    caminho, ministerios_ativos, modo, usar_historico = trabalho.parametros
+    trabalho.progredir(0, 1, "Lendo planilha...", forcar=True)
+    df, error = ler_planilha(caminho)
+    if error:
+        return None, error
+
+    historico = None
+    if usar_historico:
+        from shift_history import HistoricoTurnos
+        historico = HistoricoTurnos.carregar()
+
+    rascunho, available_servers, error = gerar_rascunho(
+        df, list(ministerios_ativos), modo, historico,
+        ao_progredir=trabalho.progredir, cancelado=trabalho.cancelado
+    )
+    if error:
+        return None, error
+    if trabalho.cancelado.is_set():
+        return None, "Geração cancelada."
+
+    trabalho.progredir(1, 1, "Salvando rascunho...", forcar=True)
+    return obter_store().criar_sessao(rascunho, available_servers, list(ministerios_ativos), caminho), None
+
+def executar_replanejamento(trabalho):
+    """Relê a planilha do rascunho e o replaneja; retorna ((escala, origem, disponiveis), error)."""
+    from core_logic import ler_planilha, replanejar_rascunho
+    from draft_store import obter_store
+    from shift_history import HistoricoTurnos
+
+    sessao_id, ministerios_ativos, _, indisponiveis = trabalho.parametros
+    escala, fixos = trabalho.entrada
+    store = obter_store()
+    trabalho.progredir(0, 1, "Lendo planilha...", forcar=True)
+    df, error = ler_planilha(store.arquivo(sessao_id))
+    if error:
+        return None, error
+
+    novos, origem, disponiveis, error = replanejar_rascunho(
+        df, escala, fixos, list(ministerios_ativos), indisponiveis,
+        historico=HistoricoTurnos.carregar(store),
+        ao_progredir=trabalho.progredir, cancelado=trabalho.cancelado
+    )
+    if error:
+        return None, error
+    if trabalho.cancelado.is_set():
+        return None, "Replanejamento cancelado."
+    return (novos, origem, disponiveis), None
+
+class ExecutorGeracao:
+    """Fila de gerações com no máximo um trabalho rodando e um aguardando."""
+
+    def __init__(self, executar=executar_geracao, replanejar=executar_replanejamento):
+        self._executar = executar
+        self._replanejar = replanejar
+        self._lock = threading.Lock()
+        self._atual = None
+        self._pendente = None
+        self._thread = None
+
+    def solicitar(self, caminho, ministerios_ativos, modo='guloso', usar_historico=False,
+                  ao_progredir=None, ao_concluir=None):
+        """
+        Pede uma geração e retorna o TrabalhoGeracao que a atenderá.
+
+        `ao_progredir(concluidos, total, mensagem)` e
+        `ao_concluir(sessao_id, error, cancelado)` são chamados na thread de
+        trabalho.
+        """
+        parametros = (caminho, tuple(ministerios_ativos), modo, bool(usar_historico))
+        return self._enfileirar(parametros, self._executar, None, ao_progredir, ao_concluir)
+
+    def replanejar(self, sessao_id, escala, fixos, ministerios_ativos, indisponiveis=(),
+                   ao_progredir=None, ao_concluir=None):
+        """
+        Pede o replanejamento de um rascunho (ver core_logic.replanejar_rascunho).
+
+        `escala` e `fixos` devem ser cópias que a interface não altera mais.
+        `ao_concluir((nova_escala, origem, disponiveis), error, cancelado)`
+        recebe o resultado ainda sem gravar; como em `solicitar`, os
+        callbacks rodam na thread de trabalho.
+        """
+        parametros = (sessao_id, tuple(ministerios_ativos), 'replanejar', tuple(sorted(indisponiveis)))
+        return self._enfileirar(parametros, self._replanejar, (escala, set(fixos)), ao_progredir, ao_concluir)
+
+    def _enfileirar(self, parametros, executar, entrada, ao_progredir, ao_concluir):
+        substituido = None
+        with self._lock:
+            for trabalho in (self._pendente, self._atual):
+                if trabalho is not None and trabalho.parametros == parametros and not trabalho.cancelado.is_set():
+                    trabalho.acompanhar(ao_progredir, ao_concluir)
+                    return trabalho
+
+            trabalho = TrabalhoGeracao(parametros, ao_progredir, ao_concluir, executar, entrada)
+            if self._atual is not None:
+                self._atual.cancelado.set()
+            substituido, self._pendente = self._pendente, trabalho
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._processar, name="pibshift-geracao", daemon=True)
+                self._thread.start()
+
+        if substituido is not None:
+            substituido.cancelado.set()
+            substituido.concluir(None, "Geração cancelada.")
+        return trabalho
+
+    def cancelar(self):
+        """Cancela o trabalho em andamento e o que estiver aguardando."""
+        with self._lock:
+            pendente, self._pendente = self._pendente, None
+            if self._atual is not None:
+                self._atual.cancelado.set()
+        if pendente is not None:
+            pendente.cancelado.set()
+            pendente.concluir(None, "Geração cancelada.")
+
+    def ocupado(self):
+        with self._lock:
+            return self._atual is not None or self._pendente is not None
+
+    def _processar(self):
+        while True:
+            with self._lock:
+                trabalho, self._pendente = self._pendente, None
+                self._atual = trabalho
+                if trabalho is None:
+                    self._thread = None
+                    return
+
+            try:
+                with instrumentation.etapa("geracao.trabalho", modo=trabalho.parametros[2]):
+                    resultado, error = trabalho.executar(trabalho)
+            except Exception as e:
+                resultado, error = None, f"Erro inesperado: {str(e)}"
+
+            with self._lock:
+                self._atual = None
+            try:
+                trabalho.concluir(resultado, error)
+            except Exception as e:
+                print(f"Erro ao entregar o resultado da geração: {e}")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def obter_executor_geracao():
+    """Executor de gerações compartilhado pelas telas."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ExecutorGeracao()
+    return _executor
@@ -0,0 +1,206 @@
+"""
+Escrita de calendários iCalendar (.ics) em streaming.
+
+Cada VEVENT é escrito direto no arquivo assim que a linha da escala é
+lida, sem montar o calendário em memória. A data de cada coluna é
+interpretada uma única vez (ver date_columns e service_times), os UIDs
+são derivados do slot (data, função e ordem da função na data) e, em uma
+única passada, os eventos podem ir para o calendário geral e para um
+calendário por voluntário.
+"""
+import datetime
+import hashlib
+import os
+from collections import OrderedDict
+from service_times import CALENDARIO_PADRAO, HorariosCultos
+from utils import carregar_config, nome_arquivo_seguro
+
+NAO_DESIGNADO = "Não designado"
+MAX_ARQUIVOS_ABERTOS = 64
+
+def _escapar(texto):
+    """Escapa um valor TEXT conforme a RFC 5545."""
+    return (str(texto).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+def _dobrar(linha):
+    """Quebra a linha em trechos de até 75 octetos, como exige a RFC 5545."""
+    codificada = linha.encode("utf-8")
+    if len(codificada) <= 75:
+        return linha + "\r\n"
+    partes = []
+    inicio = 0
+    limite = 75
+    while inicio < len(codificada):
+        fim = min(inicio + limite, len(codificada))
+        # Não corta um caractere UTF-8 no meio
+        while fim < len(codificada) and (codificada[fim] & 0xC0) == 0x80:
+            fim -= 1
+        partes.append(codificada[inicio:fim].decode("utf-8"))
+        inicio = fim
+        limite = 74  # as linhas de continuação começam com um espaço
+    return "\r\n ".join(partes) + "\r\n"
+
+def uid_individual(id_slot, voluntario):
+    """UID de um evento no calendário pessoal do voluntário, o mesmo em qualquer exportação."""
+    return hashlib.sha1(f"{id_slot}|{voluntario}".encode("utf-8")).hexdigest()
+
+def nome_arquivo_voluntario(voluntario):
+    """Nome de arquivo seguro para o calendário de um voluntário."""
+    return f"{nome_arquivo_seguro(voluntario, 'voluntario')}.ics"
+
+class CalendarioICS:
+    """Um arquivo .ics aberto para escrita; pode ser fechado e reaberto para continuar."""
+
+    def __init__(self, caminho, nome):
+        self.caminho = caminho
+        self.eventos = 0
+        self._arquivo = open(caminho, "w", encoding="utf-8", newline="")
+        self._arquivo.write(
+            "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//PibShift//Escala//PT-BR\r\n"
+            "CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n" + _dobrar(f"X-WR-CALNAME:{_escapar(nome)}")
+        )
+
+    def suspender(self):
+        """Fecha o arquivo sem encerrar o calendário, liberando o descritor."""
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def escrever(self, texto_evento):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "a", encoding="utf-8", newline="")
+        self._arquivo.write(texto_evento)
+        self.eventos += 1
+
+    def fechar(self):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "a", encoding="utf-8", newline="")
+        self._arquivo.write("END:VCALENDAR\r\n")
+        self._arquivo.close()
+        self._arquivo = None
+
+class EscritorICS:
+    """
+    Converte as linhas da escala em VEVENTs usando os horários configurados.
+
+    `config` segue o formato de config/calendario.json: horário padrão
+    (inicio/fim), horários por dia da semana (ex.: "DOMINGO", "SABADO"),
+    local e e-mails dos participantes por nome.
+    """
+
+    def __init__(self, config=None):
+        config = config or carregar_config("calendario.json", CALENDARIO_PADRAO)
+        self.horarios = HorariosCultos(config)
+        self.local = config.get("local", "")
+        self.participantes = config.get("participantes", {})
+        self._carimbo = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def intervalo(self, data_str):
+        """(início, fim) do culto descrito pela coluna de data, ou None se não houver data (ver service_times)."""
+        return self.horarios.intervalo(data_str)
+
+    def evento(self, uid, intervalo, funcao, voluntario):
+        """Texto de um VEVENT pronto para gravação (horário local flutuante)."""
+        inicio, fim = intervalo
+        linhas = [
+            "BEGIN:VEVENT",
+            f"UID:{uid}@pibshift",
+            f"DTSTAMP:{self._carimbo}",
+            f"DTSTART:{inicio:%Y%m%dT%H%M%S}",
+            f"DTEND:{fim:%Y%m%dT%H%M%S}",
+            f"SUMMARY:{_escapar(f'PibShift - {funcao}')}",
+            f"DESCRIPTION:{_escapar(f'Voluntário: {voluntario}')}",
+        ]
+        if self.local:
+            linhas.append(f"LOCATION:{_escapar(self.local)}")
+        email = self.participantes.get(voluntario)
+        if email:
+            cn = voluntario.replace('"', "'")
+            linhas.append(f'ATTENDEE;CN="{cn}";ROLE=REQ-PARTICIPANT:mailto:{email}')
+        linhas.append("END:VEVENT")
+        return "".join(_dobrar(linha) for linha in linhas)
+
+    def escrever(self, escala_df, filename=None, pasta_voluntarios=None, ordens=None, individual=False):
+        """
+        Escreve a escala em `filename` e/ou um .ics por voluntário em `pasta_voluntarios`.
+
+        `ordens` informa a ordem de cada linha entre as da mesma data e
+        função na escala completa; é necessário quando `escala_df` é só um
+        recorte da escala, para que os UIDs sejam os mesmos.
+
+        Retorna (eventos, arquivos): o total de eventos escritos e um dict
+        voluntário -> caminho dos calendários individuais.
+
+        Com `individual=True`, `filename` é o calendário pessoal de um
+        voluntário e usa os mesmos UIDs dos calendários de `pasta_voluntarios`.
+        """
+        geral = CalendarioICS(filename, "Escala PibShift") if filename else None
+        individuais = {}
+        # Calendários individuais com arquivo aberto, do menos ao mais recentemente usado
+        abertos = OrderedDict()
+        ocorrencias = {}
+        caminhos = set()
+        eventos = 0
+
+        if pasta_voluntarios:
+            os.makedirs(pasta_voluntarios, exist_ok=True)
+
+        try:
+            for i, (data, funcao, voluntario) in enumerate(zip(escala_df['Data'].to_numpy(),
+                                                               escala_df['Funcao'].to_numpy(),
+                                                               escala_df['Voluntario'].to_numpy())):
+                data, funcao, voluntario = str(data), str(funcao), str(voluntario)
+                # A ordem da função na data identifica o slot mesmo se o voluntário mudar
+                if ordens is None:
+                    chave_slot = (data, funcao)
+                    ordem = ocorrencias.get(chave_slot, 0)
+                    ocorrencias[chave_slot] = ordem + 1
+                else:
+                    ordem = int(ordens[i])
+
+                if voluntario == NAO_DESIGNADO:
+                    continue
+                intervalo = self.intervalo(data)
+                if intervalo is None:
+                    continue
+
+                id_slot = hashlib.sha1(f"{data}|{funcao}|{ordem}".encode("utf-8")).hexdigest()
+                if geral:
+                    uid = uid_individual(id_slot, voluntario) if individual else id_slot
+                    geral.escrever(self.evento(uid, intervalo, funcao, voluntario))
+
+                if pasta_voluntarios:
+                    calendario = individuais.get(voluntario)
+                    if calendario is None:
+                        calendario = individuais[voluntario] = CalendarioICS(
+                            self._caminho_individual(pasta_voluntarios, voluntario, caminhos),
+                            f"PibShift - {voluntario}"
+                        )
+                    if voluntario in abertos:
+                        abertos.move_to_end(voluntario)
+                    else:
+                        if len(abertos) >= MAX_ARQUIVOS_ABERTOS:
+                            abertos.popitem(last=False)[1].suspender()
+                        abertos[voluntario] = calendario
+                    calendario.escrever(self.evento(uid_individual(id_slot, voluntario), intervalo, funcao, voluntario))
+                eventos += 1
+        finally:
+            if geral:
+                geral.fechar()
+            for calendario in individuais.values():
+                calendario.fechar()
+
+        return eventos, {voluntario: c.caminho for voluntario, c in individuais.items()}
+
+    @staticmethod
+    def _caminho_individual(pasta, voluntario, caminhos):
+        """Caminho do calendário do voluntário, com sufixo se o nome de arquivo já foi usado."""
+        nome = nome_arquivo_voluntario(voluntario)
+        caminho = os.path.join(pasta, nome)
+        sufixo = 2
+        while caminho in caminhos:
+            caminho = os.path.join(pasta, f"{nome[:-4]}_{sufixo}.ics")
+            sufixo += 1
+        caminhos.add(caminho)
+        return caminho
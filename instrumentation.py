@@ -0,0 +1,125 @@
+"""
+Medição de tempo das etapas do pipeline (spans) e contadores.
+
+Desativada por padrão: nesse caso `etapa()` devolve um contexto vazio
+compartilhado e as funções decoradas com `medida()` só testam uma flag,
+então o custo fica perto de zero. Ativada (Configurações > Diagnóstico ou
+PIBSHIFT_DIAGNOSTICO=1), cada etapa guarda início, duração e thread em um
+buffer circular, soma um resumo por nome e pode ser exportada como trace
+JSON no formato do Chrome (abre em chrome://tracing ou no Perfetto).
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTOS = 20000
+
+_ativo = os.environ.get("PIBSHIFT_DIAGNOSTICO") == "1"
+_lock = threading.Lock()
+_eventos = deque(maxlen=MAX_EVENTOS)
+_resumo = {}
+_contadores = {}
+_origem = time.perf_counter()
+_NULO = contextlib.nullcontext()
+
+def ativar(ativo=True):
+    global _ativo
+    _ativo = bool(ativo)
+
+def ativo():
+    return _ativo
+
+def limpar():
+    """Descarta etapas e contadores registrados até agora."""
+    with _lock:
+        _eventos.clear()
+        _resumo.clear()
+        _contadores.clear()
+
+def _registrar(nome, inicio, duracao, atributos):
+    with _lock:
+        _eventos.append((nome, inicio, duracao, threading.get_ident(), atributos))
+        resumo = _resumo.get(nome)
+        if resumo is None:
+            _resumo[nome] = [1, duracao, duracao]
+        else:
+            resumo[0] += 1
+            resumo[1] += duracao
+            if duracao > resumo[2]:
+                resumo[2] = duracao
+
+class _Etapa:
+    __slots__ = ("nome", "atributos", "inicio")
+
+    def __init__(self, nome, atributos):
+        self.nome = nome
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        _registrar(self.nome, self.inicio, time.perf_counter() - self.inicio, self.atributos)
+        return False
+
+def etapa(nome, **atributos):
+    """Contexto que mede o bloco como uma etapa chamada `nome`."""
+    if not _ativo:
+        return _NULO
+    return _Etapa(nome, atributos)
+
+def medida(nome):
+    """Decorador que mede cada chamada da função como a etapa `nome`."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida_funcao(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            with _Etapa(nome, None):
+                return funcao(*args, **kwargs)
+        return medida_funcao
+    return decorador
+
+def contar(nome, quantidade=1):
+    """Soma `quantidade` ao contador `nome`."""
+    if _ativo:
+        with _lock:
+            _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+def resumo():
+    """Lista de (etapa, chamadas, total_s, media_s, maximo_s), da etapa mais demorada para a menos."""
+    with _lock:
+        linhas = [(nome, n, total, total / n, maximo) for nome, (n, total, maximo) in _resumo.items()]
+    return sorted(linhas, key=lambda linha: linha[2], reverse=True)
+
+def contadores():
+    with _lock:
+        return dict(_contadores)
+
+def exportar_trace(filename):
+    """Grava as etapas e contadores como trace JSON (Trace Event Format)."""
+    with _lock:
+        eventos = list(_eventos)
+        valores = dict(_contadores)
+
+    pid = os.getpid()
+    trace = [
+        {
+            "name": nome, "ph": "X", "pid": pid, "tid": tid,
+            "ts": round((inicio - _origem) * 1e6, 1), "dur": round(duracao * 1e6, 1),
+            **({"args": atributos} if atributos else {}),
+        }
+        for nome, inicio, duracao, tid, atributos in eventos
+    ]
+    if valores:
+        fim = max((e["ts"] + e["dur"] for e in trace), default=0)
+        trace.append({"name": "contadores", "ph": "C", "pid": pid, "tid": 0, "ts": fim, "args": valores})
+
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+    return len(eventos)
@@ -1,21 +1,33 @@
 import flet as ft
-from core_logic import ler_planilha, gerar_rascunho, verificar_conflitos
-from export_manager import exportar_pdf, exportar_ics, exportar_xlsx, copiar_whatsapp
+from area_rules import obter_registro
+from search_index import IndiceBusca
+from draft_store import obter_store
+from generation_jobs import obter_executor_geracao
+import instrumentation
 import json
-import pandas as pd
-import time
 import threading
+from collections import OrderedDict
 
 def GerarEscalaView(page, navigate_to):
     # Estado dos ministérios selecionados
+    registro = obter_registro()
     ministerios_selecionados = {
-        'PRODUÇÃO': ft.Checkbox(value=True, label="Produção"),
-        'FILMAGEM': ft.Checkbox(value=True, label="Filmagem"), 
-        'PROJEÇÃO': ft.Checkbox(value=True, label="Projeção"),
-        'TAKE': ft.Checkbox(value=True, label="Take"),
-        'ILUMINAÇÃO': ft.Checkbox(value=True, label="Iluminação")
+        chave: ft.Checkbox(value=True, label=registro.rotulos[chave])
+        for chave in registro.chaves
     }
     
+    modo_otimo = ft.Switch(
+        label="Distribuição otimizada (resolve o mês inteiro)",
+        value=False,
+        tooltip="Preenche o máximo de funções e equilibra os turnos entre os voluntários"
+    )
+
+    continuar_historico = ft.Switch(
+        label="Continuar a partir das escalas publicadas",
+        value=False,
+        tooltip="Planeja só as datas ainda não publicadas, contando os turnos já servidos"
+    )
+
     file_path = ft.TextField(
         label="Arquivo de entrada (.xlsx)", 
         read_only=True, 
@@ -24,9 +36,17 @@ def GerarEscalaView(page, navigate_to):
     )
     
     escala_container = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
-    loading = ft.ProgressRing(visible=False)
     escala_df_global = None
 
+    # Progresso da geração, que roda em segundo plano (ver generation_jobs)
+    progresso_geracao = ft.ProgressBar(value=0, expand=True)
+    texto_geracao = ft.Text("", size=12)
+    painel_geracao = ft.Row([
+        progresso_geracao,
+        texto_geracao,
+        ft.TextButton("Cancelar", icon=ft.Icons.CLOSE, on_click=lambda e: obter_executor_geracao().cancelar()),
+    ], visible=obter_executor_geracao().ocupado())
+
     def get_button_bgcolor():
         return ft.Colors.BLUE_GREY_50 if page.theme_mode == ft.ThemeMode.LIGHT else ft.Colors.BLUE_GREY_900
 
@@ -65,43 +85,48 @@ def GerarEscalaView(page, navigate_to):
         
         page.update()
 
+    def ao_progredir(concluidos, total, mensagem):
+        progresso_geracao.value = concluidos / total if total else None
+        texto_geracao.value = f"{concluidos}/{total} — {mensagem}" if total > 1 else mensagem
+        painel_geracao.update()
+
+    def ao_concluir(sessao_id, error, cancelado):
+        # Geração substituída por um pedido mais novo: o painel continua com o novo
+        if cancelado and obter_executor_geracao().ocupado():
+            return
+        painel_geracao.visible = False
+        page.update()
+        if cancelado:
+            page.snack_bar = ft.SnackBar(ft.Text("Geração cancelada"), bgcolor=ft.Colors.ORANGE)
+            page.snack_bar.open = True
+            page.update()
+        elif error:
+            mostrar_erro(error)
+        else:
+            navigate_to(1)
+
     def processar_para_edicao(e):
-        nonlocal escala_df_global
-        
         if not file_path.value:
             mostrar_erro("Por favor, selecione um arquivo de escala.")
             return
 
-        loading.visible = True
-        page.update()
-
-        try:
-            df, error = ler_planilha(file_path.value)
-            if error:
-                mostrar_erro(error)
-                return
-
-            ministerios_ativos = [k for k, v in ministerios_selecionados.items() if v.value]
-            if not ministerios_ativos:
-                mostrar_erro("Selecione pelo menos um ministério.")
-                return
+        ministerios_ativos = [k for k, v in ministerios_selecionados.items() if v.value]
+        if not ministerios_ativos:
+            mostrar_erro("Selecione pelo menos um ministério.")
+            return
 
-            rascunho, available_servers, error = gerar_rascunho(df, ministerios_ativos)
-            if error:
-                mostrar_erro(error)
-                return
-            
-            page.client_storage.set("rascunho_escala", json.dumps(rascunho))
-            page.client_storage.set("available_servers", json.dumps(available_servers))
-            page.client_storage.set("ministerios_ativos", json.dumps(ministerios_ativos))
+        progresso_geracao.value = None
+        texto_geracao.value = "Iniciando..."
+        painel_geracao.visible = True
+        page.update()
 
-            navigate_to(1)
-            
-        except Exception as e:
-            mostrar_erro(f"Erro inesperado: {str(e)}")
-        finally:
-            loading.visible = False
-            page.update()
+        # Cliques repetidos acompanham a geração em andamento em vez de iniciar outra
+        obter_executor_geracao().solicitar(
+            file_path.value, ministerios_ativos,
+            modo='otimo' if modo_otimo.value else 'guloso',
+            usar_historico=continuar_historico.value,
+            ao_progredir=ao_progredir, ao_concluir=ao_concluir,
+        )
 
     def mostrar_erro(message):
         page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=ft.Colors.RED)
@@ -118,6 +143,8 @@ def GerarEscalaView(page, navigate_to):
                 ft.Divider(),
                 ft.Text("Ministérios:", weight=ft.FontWeight.BOLD),
                 ft.Row([cb for cb in ministerios_selecionados.values()], wrap=True),
+                modo_otimo,
+                continuar_historico,
                 ft.Row([
                     file_path,
                     ft.ElevatedButton(
@@ -138,7 +165,7 @@ def GerarEscalaView(page, navigate_to):
                         expand=True
                     ),
                 ], alignment=ft.MainAxisAlignment.CENTER),
-                ft.Row([loading], alignment=ft.MainAxisAlignment.CENTER),
+                painel_geracao,
             ],
             spacing=20,
             expand=True
@@ -147,14 +174,22 @@ def GerarEscalaView(page, navigate_to):
         expand=True
     )
 
-def EditarEscalaView(page):
-    rascunho_str = page.client_storage.get("rascunho_escala")
-    rascunho_slots = json.loads(rascunho_str) if rascunho_str else []
+@instrumentation.medida("editor.abrir")
+def EditarEscalaView(page, navigate_to=None):
+    from core_logic import IndiceConflitos
+
+    store = obter_store()
+    sessao_id = store.sessao_atual()
+    escala = store.carregar_escala(sessao_id) if sessao_id else None
+    # Slots escolhidos à mão, preservados pelo replanejamento
+    slots_fixos = store.slots_fixos(sessao_id) if sessao_id else set()
     
-    available_servers_str = page.client_storage.get("available_servers")
-    available_servers = json.loads(available_servers_str) if available_servers_str else {}
+    # Disponibilidade de cada data, buscada no banco quando o card da data é construído
+    available_servers = {}
     
-    if not rascunho_slots:
+    registro = obter_registro()
+
+    if not escala:
         return ft.Column([
             ft.Text("Editar Escala", size=24, weight=ft.FontWeight.BOLD),
             ft.Text("Nenhum rascunho encontrado. Gere uma escala primeiro."),
@@ -186,145 +221,248 @@ def EditarEscalaView(page):
         expand=True
     )
 
-    escala_por_dia = {}
-    for slot in rascunho_slots:
-        data = slot['Data']
-        if data not in escala_por_dia:
-            escala_por_dia[data] = []
-        escala_por_dia[data].append(slot)
+    # Cada slot é identificado pela sua posição na escala
+    escala_por_dia = escala.slots_por_data()
+    # Cards (e resultados da busca) em ordem cronológica
+    escala_por_dia = {data: escala_por_dia[data] for data in escala.indice_datas().rotulos}
+
+    # Voluntário de cada slot ao abrir o editor, que continua entre as opções do dropdown
+    nomes_iniciais = escala.nomes()
+    indice_conflitos = IndiceConflitos(escala)
 
     dropdown_refs = {}
-    
-    # CONTAINER PRINCIPAL COM SCROLL
-    cards_container = ft.Column(
-        scroll=ft.ScrollMode.AUTO,
-        expand=True
+    alertas_conflito = {}
+    botoes_fixar = {}
+
+    # CARDS VIRTUALIZADOS: só as linhas perto da área visível têm controles;
+    # as demais são espaços vazios de mesma altura, construídos sob demanda
+    CARDS_POR_LINHA = 3
+    LINHAS_POR_LOTE = 4
+    MAX_LINHAS_VIVAS = 12
+    ALTURA_SLOT = 60
+    ALTURA_CABECALHO_CARD = 110
+    slots_por_card = max(len(slots) for slots in escala_por_dia.values())
+    altura_linha = ALTURA_CABECALHO_CARD + slots_por_card * ALTURA_SLOT
+
+    datas_visiveis = list(escala_por_dia.keys())
+    linhas_vivas = {}
+    # Os eventos do Flet rodam em threads diferentes (assim como a busca e o
+    # replanejamento): quem mexe nos cards, na escala ou nos índices segura este lock
+    lock_editor = threading.RLock()
+    # Cards já construídos são reaproveitados quando a linha ou o filtro muda
+    cards_construidos = OrderedDict()
+    MAX_CARDS_CONSTRUIDOS = 2 * MAX_LINHAS_VIVAS * CARDS_POR_LINHA
+
+    lista_cards = ft.ListView(
+        expand=True,
+        item_extent=altura_linha,
+        spacing=0,
+        on_scroll_interval=100,
     )
-    
-    # CONTAINER RESPONSIVO
-    responsive_container = ft.ResponsiveRow(
-        spacing=15,
-        run_spacing=15,
-        expand=False
+
+    def num_linhas():
+        return -(-len(datas_visiveis) // CARDS_POR_LINHA)
+
+    def obter_card(data):
+        card = cards_construidos.get(data)
+        if card is not None:
+            cards_construidos.move_to_end(data)
+            instrumentation.contar("editor.cards_reaproveitados")
+            return card
+
+        with instrumentation.etapa("editor.construir_card", data=data):
+            card = cards_construidos[data] = construir_card(data)
+        instrumentation.contar("editor.cards_construidos")
+        if len(cards_construidos) > MAX_CARDS_CONSTRUIDOS:
+            em_uso = {d for datas in linhas_vivas.values() for d in datas}
+            for antiga in [d for d in cards_construidos if d not in em_uso and d != data]:
+                if len(cards_construidos) <= MAX_CARDS_CONSTRUIDOS:
+                    break
+                esquecer_card(antiga)
+        return card
+
+    def esquecer_card(data):
+        cards_construidos.pop(data, None)
+        for slot_id in escala_por_dia[data]:
+            dropdown_refs.pop(slot_id, None)
+            alertas_conflito.pop(slot_id, None)
+            botoes_fixar.pop(slot_id, None)
+
+    def reconstruir_cards(datas):
+        """Reconstrói apenas os cards das datas informadas; os demais continuam como estão."""
+        for data in datas:
+            esquecer_card(data)
+        linhas = [i for i, datas_linha in linhas_vivas.items() if datas.intersection(datas_linha)]
+        for indice_linha in linhas:
+            lista_cards.controls[indice_linha] = construir_linha(indice_linha)
+        if linhas:
+            lista_cards.update()
+
+    def descartar_linha(indice_linha):
+        linhas_vivas.pop(indice_linha)
+        lista_cards.controls[indice_linha] = ft.Container(height=altura_linha)
+
+    def construir_linha(indice_linha):
+        datas = datas_visiveis[indice_linha * CARDS_POR_LINHA:(indice_linha + 1) * CARDS_POR_LINHA]
+        linhas_vivas[indice_linha] = datas
+        cards = [obter_card(data) for data in datas]
+        # Completa a última linha para manter a largura dos cards
+        cards += [ft.Container(expand=1) for _ in range(CARDS_POR_LINHA - len(cards))]
+        return ft.Container(
+            content=ft.Row(cards, vertical_alignment=ft.CrossAxisAlignment.START, spacing=5),
+            height=altura_linha,
+        )
+
+    def sincronizar_janela(primeira, ultima):
+        """Garante controles reais para as linhas [primeira, ultima] e libera as distantes."""
+        mudou = False
+        limite = min(num_linhas(), ultima + 1 + LINHAS_POR_LOTE)
+        while len(lista_cards.controls) < limite:
+            lista_cards.controls.append(construir_linha(len(lista_cards.controls)))
+            mudou = True
+
+        for indice_linha in range(primeira, min(ultima + 1, len(lista_cards.controls))):
+            if indice_linha not in linhas_vivas:
+                lista_cards.controls[indice_linha] = construir_linha(indice_linha)
+                mudou = True
+
+        if len(linhas_vivas) > MAX_LINHAS_VIVAS:
+            centro = (primeira + ultima) / 2
+            distantes = sorted(
+                (i for i in linhas_vivas if i < primeira or i > ultima),
+                key=lambda i: abs(i - centro),
+                reverse=True
+            )
+            for indice_linha in distantes[:len(linhas_vivas) - MAX_LINHAS_VIVAS]:
+                descartar_linha(indice_linha)
+                mudou = True
+        return mudou
+
+    def on_scroll(e: ft.OnScrollEvent):
+        primeira = max(0, int(e.pixels // altura_linha) - 1)
+        ultima = int((e.pixels + e.viewport_dimension) // altura_linha) + 1
+        with lock_editor:
+            if sincronizar_janela(primeira, ultima):
+                lista_cards.update()
+
+    lista_cards.on_scroll = on_scroll
+
+    def mostrar_datas(datas):
+        """Troca as datas exibidas, mantendo as linhas que não mudaram."""
+        if datas == datas_visiveis:
+            return
+        linhas_anteriores = dict(linhas_vivas)
+        datas_visiveis[:] = datas
+        linhas_vivas.clear()
+
+        controles = []
+        for indice_linha in range(min(num_linhas(), 2 * LINHAS_POR_LOTE)):
+            datas_linha = datas_visiveis[indice_linha * CARDS_POR_LINHA:(indice_linha + 1) * CARDS_POR_LINHA]
+            if linhas_anteriores.get(indice_linha) == datas_linha:
+                linhas_vivas[indice_linha] = datas_linha
+                controles.append(lista_cards.controls[indice_linha])
+            else:
+                controles.append(construir_linha(indice_linha))
+        lista_cards.controls = controles
+        lista_cards.update()
+
+    indice_busca = IndiceBusca(
+        (data, [data] + [escala.funcao(slot_id) for slot_id in slots] + [escala.nome(slot_id) for slot_id in slots])
+        for data, slots in escala_por_dia.items()
     )
-    
-    todos_os_cards = []
-    cards_data = {}
-    alertas_conflito = {}
+    ATRASO_BUSCA = 0.25
+    temporizador_busca = None
+    ultima_busca = None
+
+    def aplicar_filtro(termo_busca):
+        try:
+            with lock_editor:
+                # Um temporizador já disparado pode chegar depois de uma busca mais nova
+                if termo_busca == ultima_busca:
+                    mostrar_datas(indice_busca.buscar(termo_busca))
+        except Exception as ex:
+            print(f"Erro ao filtrar escala: {ex}")
 
     def filtrar_cards(e):
-        termo_busca = e.control.value.lower().strip()
-        responsive_container.controls.clear()
-        
-        if not termo_busca:
-            for card in todos_os_cards:
-                responsive_container.controls.append(card)
-        else:
-            cards_filtrados = []
-            for card, card_info in cards_data.items():
-                data_match = termo_busca in card_info['data'].lower()
-                funcoes_match = any(termo_busca in funcao.lower() for funcao in card_info['funcoes'])
-                voluntarios_match = any(termo_busca in voluntario.lower() for voluntario in card_info['voluntarios'])
-                
-                if data_match or funcoes_match or voluntarios_match:
-                    cards_filtrados.append(card)
-            
-            for card in cards_filtrados:
-                responsive_container.controls.append(card)
-        
-        page.update()
+        # Aguarda uma pausa na digitação antes de filtrar
+        nonlocal temporizador_busca, ultima_busca
+        ultima_busca = e.control.value or ""
+        if temporizador_busca:
+            temporizador_busca.cancel()
+        temporizador_busca = threading.Timer(ATRASO_BUSCA, aplicar_filtro, args=(ultima_busca,))
+        temporizador_busca.daemon = True
+        temporizador_busca.start()
 
     search_field.on_change = filtrar_cards
 
     def get_voluntarios_disponiveis(data, area):
-        if data in available_servers and area in available_servers[data]:
-            return available_servers[data][area]
-        return []
+        if data not in available_servers:
+            available_servers[data] = store.carregar_disponiveis(sessao_id, data)
+        return available_servers[data].get(area, [])
 
     def get_escala_atual_df():
-        escala_data = []
-        for data, slots in escala_por_dia.items():
-            for slot in slots:
-                dropdown_id = f"{data}_{slot['Funcao']}"
-                if dropdown_id in dropdown_refs:
-                    voluntario = dropdown_refs[dropdown_id].value
-                    funcao = slot['Funcao']
-                    
-                    escala_data.append({
-                        "Data": data,
-                        "Funcao": funcao,
-                        "Voluntario": voluntario
-                    })
-        
-        if not escala_data:
-            return pd.DataFrame(columns=['Data', 'Funcao', 'Voluntario'])
+        # Cópia do momento, montada direto das colunas de códigos
+        with lock_editor:
+            return escala.para_dataframe()
 
-        return pd.DataFrame(escala_data)
+    def aplicar_estilo_conflito(slot_id, atualizar=True):
+        """Aplica (ou remove) o destaque de conflito de um único slot."""
+        dropdown = dropdown_refs.get(slot_id)
+        if dropdown is None:
+            return
 
-    def verificar_conflitos_corrigido(escala_df):
-        """Verificação de conflitos corrigida - só marca se estiver em múltiplas funções no MESMO dia"""
-        conflitos = []
-        
-        # Agrupar por data e voluntário
-        for data, grupo_data in escala_df.groupby('Data'):
-            # Contar quantas funções cada voluntário tem nessa data específica
-            contagem_voluntarios = grupo_data[grupo_data['Voluntario'] != 'Não designado'].groupby('Voluntario').size()
-            
-            # Verificar voluntários com mais de uma função no MESMO dia
-            for voluntario, count in contagem_voluntarios.items():
-                if count > 1:
-                    conflitos.append((data, voluntario))
-        
-        return conflitos
+        alerta = alertas_conflito[slot_id]
+        em_conflito = indice_conflitos.em_conflito(slot_id)
+        if em_conflito:
+            dropdown.bgcolor = ft.Colors.ORANGE_100 if page.theme_mode == ft.ThemeMode.LIGHT else ft.Colors.AMBER_800
+            alerta.tooltip = (f"Conflito: {escala.nome(slot_id)} está em múltiplas funções "
+                              f"no dia {escala.data(slot_id)}")
+        else:
+            dropdown.bgcolor = None
+        alerta.visible = em_conflito
 
-    def verificar_e_mostrar_conflitos():
-        try:
-            escala_df = get_escala_atual_df()
-            if 'Voluntario' not in escala_df.columns:
-                escala_df['Voluntario'] = 'Não designado'
+        # Cards fora da tela guardam o estilo e o exibem quando voltarem
+        if atualizar and dropdown.page:
+            dropdown.update()
+            alerta.update()
 
-            # Usar a função corrigida
-            conflitos = verificar_conflitos_corrigido(escala_df)
-            
-            # Limpar alertas anteriores
-            for alerta in list(alertas_conflito.values()):
-                if hasattr(alerta, 'parent') and alerta.parent and alerta in alerta.parent.controls:
-                    alerta.parent.controls.remove(alerta)
-            alertas_conflito.clear()
-
-            # Remover cor de fundo de todos os dropdowns
-            for dropdown in dropdown_refs.values():
-                dropdown.bgcolor = None
-
-            # Aplicar alertas apenas para conflitos reais
-            for (data, voluntario) in conflitos:
-                for dropdown_id, dropdown in dropdown_refs.items():
-                    if data in dropdown_id and dropdown.value == voluntario:
-                        parent_row = dropdown.parent
-                        if parent_row and isinstance(parent_row, ft.Row):
-                            if dropdown_id not in alertas_conflito:
-                                alerta_icon = ft.Icon(
-                                    ft.Icons.WARNING,
-                                    color=get_alert_color(),
-                                    size=20,
-                                    tooltip=f"Conflito: {voluntario} está em múltiplas funções no dia {data}"
-                                )
-                                alertas_conflito[dropdown_id] = alerta_icon
-                                if alerta_icon not in parent_row.controls:
-                                    parent_row.controls.append(alerta_icon)
-                        
-                        # Aplicar cor de fundo apenas ao dropdown com conflito
-                        if page.theme_mode == ft.ThemeMode.LIGHT:
-                            dropdown.bgcolor = ft.Colors.ORANGE_100
-                        else:
-                            dropdown.bgcolor = ft.Colors.AMBER_800
-            
-            page.update()
-        except Exception as e:
-            print(f"Erro ao verificar conflitos: {e}")
+    def estilo_fixo(botao, fixo):
+        botao.icon = ft.Icons.PUSH_PIN if fixo else ft.Icons.PUSH_PIN_OUTLINED
+        botao.tooltip = "Fixado: mantido ao replanejar" if fixo else "Fixar este voluntário"
+
+    def fixar(slot_id, fixo):
+        if fixo == (slot_id in slots_fixos):
+            return
+        if fixo:
+            slots_fixos.add(slot_id)
+        else:
+            slots_fixos.discard(slot_id)
+        store.fixar_slot(sessao_id, slot_id, fixo)
+        botao = botoes_fixar.get(slot_id)
+        if botao is not None:
+            estilo_fixo(botao, fixo)
+            if botao.page:
+                botao.update()
+
+    def on_fixar_click(e):
+        slot_id = e.control.data
+        with lock_editor:
+            fixar(slot_id, slot_id not in slots_fixos)
 
     def on_dropdown_change(e):
-        verificar_e_mostrar_conflitos()
+        slot_id = e.control.data
+        with lock_editor:
+            indice_busca.atualizar(escala.data(slot_id), escala.nome(slot_id), e.control.value)
+            escala.definir(slot_id, e.control.value)
+            store.atualizar_slot(sessao_id, slot_id, e.control.value)
+            # Uma escolha feita à mão fica fixa; esvaziar o slot o devolve ao replanejamento
+            fixar(slot_id, e.control.value != "Não designado")
+            try:
+                with instrumentation.etapa("editor.conflitos"):
+                    for afetado in indice_conflitos.atualizar(slot_id, e.control.value):
+                        aplicar_estilo_conflito(afetado)
+            except Exception as ex:
+                print(f"Erro ao verificar conflitos: {ex}")
 
     pdf_file_picker = ft.FilePicker(on_result=lambda e: on_save_result(e, 'pdf'))
     excel_file_picker = ft.FilePicker(on_result=lambda e: on_save_result(e, 'excel'))
@@ -332,6 +470,8 @@ def EditarEscalaView(page):
 
     def on_save_result(e: ft.FilePickerResultEvent, tipo: str):
         if e.path:
+            from export_manager import exportar_pdf, exportar_ics, exportar_xlsx
+
             escala_df = get_escala_atual_df()
             
             if tipo == 'pdf':
@@ -349,6 +489,8 @@ def EditarEscalaView(page):
             page.update()
 
     def exportar_whatsapp(e):
+        from export_manager import copiar_whatsapp
+
         escala_df = get_escala_atual_df()
         texto = copiar_whatsapp(escala_df)
         page.set_clipboard(texto)
@@ -359,99 +501,331 @@ def EditarEscalaView(page):
         page.snack_bar.open = True
         page.update()
 
-    page.overlay.extend([pdf_file_picker, excel_file_picker, ics_file_picker])
+    # EXPORTAR TUDO: um snapshot da escala, todos os formatos em paralelo fora da thread da interface
+    exportacao_cancelada = threading.Event()
+    progresso_exportacao = ft.ProgressBar(value=0, expand=True)
+    texto_exportacao = ft.Text("", size=12, color=get_text_color())
+    painel_exportacao = ft.Row([
+        progresso_exportacao,
+        texto_exportacao,
+        ft.TextButton("Cancelar", icon=ft.Icons.CLOSE, on_click=lambda e: exportacao_cancelada.set()),
+    ], visible=False)
+
+    def executar_exportacao(escala_df, pasta):
+        def ao_progredir(concluidos, total, mensagem):
+            progresso_exportacao.value = concluidos / total
+            texto_exportacao.value = f"{concluidos}/{total} — {mensagem}"
+            painel_exportacao.update()
+
+        try:
+            from export_manager import exportar_tudo
+
+            resultados = exportar_tudo(escala_df, pasta, ao_progredir=ao_progredir, cancelado=exportacao_cancelada)
+            falhas = [message for success, message in resultados.values() if not success]
+            if exportacao_cancelada.is_set():
+                message, bgcolor = "Exportação cancelada", ft.Colors.ORANGE
+            elif falhas:
+                message, bgcolor = " | ".join(falhas), ft.Colors.RED
+            else:
+                message, bgcolor = f"Escala exportada em {len(resultados)} formatos: {pasta}", ft.Colors.GREEN
+        except Exception as ex:
+            message, bgcolor = f"Erro ao exportar: {str(ex)}", ft.Colors.RED
+        finally:
+            painel_exportacao.visible = False
+            botao_exportar_tudo.disabled = False
+            botao_por_voluntario.disabled = False
+
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=bgcolor)
+        page.snack_bar.open = True
+        page.update()
+
+    def executar_exportacao_individual(escala_df, arquivo_zip):
+        def ao_progredir(concluidos, total, voluntario):
+            progresso_exportacao.value = concluidos / total
+            texto_exportacao.value = f"{concluidos}/{total} voluntários — {voluntario}"
+            painel_exportacao.update()
+
+        try:
+            from export_manager import exportar_por_voluntario
 
-    # Criar cards
-    for data, slots in escala_por_dia.items():
+            success, message = exportar_por_voluntario(
+                escala_df, arquivo_zip, ao_progredir=ao_progredir, cancelado=exportacao_cancelada
+            )
+            if exportacao_cancelada.is_set():
+                bgcolor = ft.Colors.ORANGE
+            else:
+                bgcolor = ft.Colors.GREEN if success else ft.Colors.RED
+        except Exception as ex:
+            message, bgcolor = f"Erro ao exportar: {str(ex)}", ft.Colors.RED
+        finally:
+            painel_exportacao.visible = False
+            botao_exportar_tudo.disabled = False
+            botao_por_voluntario.disabled = False
+
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=bgcolor)
+        page.snack_bar.open = True
+        page.update()
+
+    def iniciar_exportacao(executar, destino):
+        escala_df = get_escala_atual_df()
+        exportacao_cancelada.clear()
+        progresso_exportacao.value = 0
+        texto_exportacao.value = "Exportando..."
+        painel_exportacao.visible = True
+        botao_exportar_tudo.disabled = True
+        botao_por_voluntario.disabled = True
+        page.update()
+        page.run_thread(executar, escala_df, destino)
+
+    def publicar(e):
+        from shift_history import publicar_escala
+
+        with lock_editor:
+            publicada = escala.copia()
+        success, message = publicar_escala(publicada)
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=ft.Colors.GREEN if success else ft.Colors.RED)
+        page.snack_bar.open = True
+        page.update()
+
+    # REPLANEJAR: roda na thread de geração (ver generation_jobs), com progresso e cancelamento
+    progresso_replanejamento = ft.ProgressBar(value=0, expand=True)
+    texto_replanejamento = ft.Text("", size=12, color=get_text_color())
+    painel_replanejamento = ft.Row([
+        progresso_replanejamento,
+        texto_replanejamento,
+        ft.TextButton("Cancelar", icon=ft.Icons.CLOSE, on_click=lambda e: obter_executor_geracao().cancelar()),
+    ], visible=False)
+
+    ministerios_replanejamento = {chave: ft.Checkbox(label=registro.rotulos[chave]) for chave in registro.chaves}
+    # Quem desistiu de servir: sai dos slots não fixados e não entra em nenhum outro
+    indisponiveis_replanejamento = ft.Column(scroll=ft.ScrollMode.AUTO, height=200, spacing=0)
+
+    def abrir_replanejamento(e):
+        ativos = store.ministerios(sessao_id) or registro.chaves
+        for chave, checkbox in ministerios_replanejamento.items():
+            checkbox.value = chave in ativos
+        indisponiveis_replanejamento.controls = [
+            ft.Checkbox(label=nome, value=False) for nome in sorted(set(escala.nomes().tolist()) - {"Não designado"})
+        ]
+        page.open(dialogo_replanejamento)
+
+    def mostrar_mensagem(message, bgcolor):
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor=bgcolor)
+        page.snack_bar.open = True
+        page.update()
+
+    def ao_progredir_replanejamento(concluidos, total, mensagem):
+        progresso_replanejamento.value = concluidos / total if total else None
+        texto_replanejamento.value = f"{concluidos}/{total} — {mensagem}" if total > 1 else mensagem
+        painel_replanejamento.update()
+
+    def aplicar_resultado(retrato, ministerios_ativos, resultado):
+        """Aplica o replanejamento de `retrato`, preservando o que foi editado enquanto ele rodava."""
+        novos, origem, disponiveis = resultado
+        editados = set((escala.voluntario != retrato.voluntario).nonzero()[0].tolist())
+
+        if len(novos) != len(retrato) or set(ministerios_ativos) != set(store.ministerios(sessao_id) or registro.chaves):
+            # Outra estrutura de slots: grava a nova escala e reabre o editor
+            fixos = set()
+            alterados = []
+            for slot_id, anterior in enumerate(origem):
+                if anterior is not None and anterior in editados:
+                    novos.definir(slot_id, escala.nome(anterior))
+                if anterior is not None and (anterior in slots_fixos or anterior in editados):
+                    fixos.add(slot_id)
+                elif anterior is None or novos.voluntario[slot_id] != retrato.voluntario[anterior]:
+                    alterados.append(slot_id)
+            store.substituir_escala(sessao_id, novos, fixos, disponiveis, ministerios_ativos)
+            if navigate_to is not None:
+                navigate_to(1)
+            return len(alterados), len({novos.data(slot_id) for slot_id in alterados})
+
+        alteracoes = {slot_id: novos.nome(slot_id)
+                      for slot_id in (novos.voluntario != retrato.voluntario).nonzero()[0].tolist()
+                      if slot_id not in editados}
+        store.aplicar_replanejamento(sessao_id, alteracoes, disponiveis)
+
+        # Conflitos de horário também mudam em slots de outras datas, cujos cards não são refeitos
+        afetados = set()
+        for slot_id, voluntario in alteracoes.items():
+            indice_busca.atualizar(escala.data(slot_id), escala.nome(slot_id), voluntario)
+            escala.definir(slot_id, voluntario)
+            afetados |= indice_conflitos.atualizar(slot_id, voluntario)
+        for data in disponiveis:
+            available_servers.pop(data, None)
+
+        datas_alteradas = {escala.data(slot_id) for slot_id in alteracoes}
+        reconstruir = datas_alteradas | set(disponiveis)
+        reconstruir_cards(reconstruir)
+        for slot_id in afetados:
+            if escala.data(slot_id) not in reconstruir:
+                aplicar_estilo_conflito(slot_id)
+        return len(alteracoes), len(datas_alteradas)
+
+    def replanejar(e):
+        page.close(dialogo_replanejamento)
+        ministerios_ativos = [chave for chave, checkbox in ministerios_replanejamento.items() if checkbox.value]
+        if not ministerios_ativos:
+            mostrar_mensagem("Selecione pelo menos um ministério.", ft.Colors.RED)
+            return
+        indisponiveis = [checkbox.label for checkbox in indisponiveis_replanejamento.controls if checkbox.value]
+        with lock_editor:
+            retrato = escala.copia()
+
+        def ao_concluir(resultado, error, cancelado):
+            if cancelado and obter_executor_geracao().ocupado():
+                return
+            painel_replanejamento.visible = False
+            botao_replanejar.disabled = False
+            page.update()
+            if cancelado:
+                mostrar_mensagem("Replanejamento cancelado", ft.Colors.ORANGE)
+                return
+            try:
+                if error:
+                    raise ValueError(error)
+                with lock_editor:
+                    num_slots, num_datas = aplicar_resultado(retrato, ministerios_ativos, resultado)
+                message = f"Replanejamento concluído: {num_slots} slot(s) em {num_datas} data(s)"
+                bgcolor = ft.Colors.GREEN
+            except Exception as ex:
+                message, bgcolor = f"Erro ao replanejar: {str(ex)}", ft.Colors.RED
+            mostrar_mensagem(message, bgcolor)
+
+        progresso_replanejamento.value = None
+        texto_replanejamento.value = "Iniciando..."
+        painel_replanejamento.visible = True
+        botao_replanejar.disabled = True
+        page.update()
+        obter_executor_geracao().replanejar(
+            sessao_id, retrato, set(slots_fixos), ministerios_ativos, indisponiveis,
+            ao_progredir=ao_progredir_replanejamento, ao_concluir=ao_concluir,
+        )
+
+    dialogo_replanejamento = ft.AlertDialog(
+        modal=True,
+        title=ft.Text("Replanejar"),
+        content=ft.Column([
+            ft.Text("Refaz os slots vazios, em conflito ou indisponíveis, mantendo os fixados.", size=12),
+            ft.Text("Ministérios:", weight=ft.FontWeight.BOLD),
+            ft.Row(list(ministerios_replanejamento.values()), wrap=True),
+            ft.Text("Não podem mais servir:", weight=ft.FontWeight.BOLD),
+            indisponiveis_replanejamento,
+        ], tight=True, width=420),
+        actions=[
+            ft.TextButton("Cancelar", on_click=lambda e: page.close(dialogo_replanejamento)),
+            ft.ElevatedButton("Replanejar", on_click=replanejar),
+        ],
+    )
+
+    botao_replanejar = ft.ElevatedButton(
+        "🔄 Replanejar",
+        on_click=abrir_replanejamento,
+        tooltip="Refaz os slots vazios, em conflito ou indisponíveis, mantendo os fixados",
+        bgcolor=get_button_bgcolor(),
+        color=get_button_color(),
+        style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
+    )
+
+    def on_pasta_exportacao(e: ft.FilePickerResultEvent):
+        if e.path:
+            iniciar_exportacao(executar_exportacao, e.path)
+
+    def on_zip_voluntarios(e: ft.FilePickerResultEvent):
+        if e.path:
+            iniciar_exportacao(executar_exportacao_individual, e.path)
+
+    pasta_exportacao_picker = ft.FilePicker(on_result=on_pasta_exportacao)
+    botao_exportar_tudo = ft.ElevatedButton(
+        "📦 Exportar tudo",
+        on_click=lambda e: pasta_exportacao_picker.get_directory_path(dialog_title="Pasta para exportar a escala"),
+        bgcolor=get_button_bgcolor(),
+        color=get_button_color(),
+        style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
+    )
+
+    zip_voluntarios_picker = ft.FilePicker(on_result=on_zip_voluntarios)
+    botao_por_voluntario = ft.ElevatedButton(
+        "👤 Escalas individuais",
+        on_click=lambda e: zip_voluntarios_picker.save_file(
+            allowed_extensions=["zip"], file_name="escalas_individuais.zip"
+        ),
+        tooltip="PDF, ICS e texto de WhatsApp de cada voluntário em um único .zip",
+        bgcolor=get_button_bgcolor(),
+        color=get_button_color(),
+        style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
+    )
+
+    page.overlay.extend([pdf_file_picker, excel_file_picker, ics_file_picker, pasta_exportacao_picker, zip_voluntarios_picker])
+
+    def construir_card(data):
         slot_controls = []
-        funcoes_card = []
-        voluntarios_card = []
         
-        for slot in slots:
-            dropdown_id = f"{data}_{slot['Funcao']}"
-            funcao_display = slot['Funcao']
-            
-            area_base = funcao_display.split(' ')[0] if ' ' in funcao_display else funcao_display
-            if area_base in ["Fotografo", "Suporte"]:
-                area_base = "TAKE"
+        for slot_id in escala_por_dia[data]:
+            funcao_display = escala.funcao(slot_id)
+            voluntario_atual = escala.nome(slot_id)
             
+            area_base = registro.area_da_funcao(funcao_display)
             voluntarios_disponiveis = get_voluntarios_disponiveis(data, area_base)
             
             opcoes_dropdown = [ft.dropdown.Option("Não designado")]
-            for voluntario in sorted(list(set(voluntarios_disponiveis + [slot['Voluntario']]))):
+            for voluntario in sorted(list(set(voluntarios_disponiveis + [nomes_iniciais[slot_id], voluntario_atual]))):
                 if voluntario != "Não designado":
                     opcoes_dropdown.append(ft.dropdown.Option(voluntario))
             
-            # DROPDOWN CORRIGIDO - BORDAS ARREDONDADAS E RESPONSIVO
+            # DROPDOWN CORRIGIDO - BORDAS ARREDONDADAS
             dropdown = ft.Dropdown(
-                value=slot['Voluntario'],
+                value=voluntario_atual,
                 options=opcoes_dropdown,
                 on_change=on_dropdown_change,
-                width=200,
+                expand=True,
                 border_radius=8,  # BORDAS ARREDONDADAS
                 border_color=ft.Colors.GREY_400,
                 text_size=14,
                 tooltip=f"Selecione um voluntário para {funcao_display}",
                 content_padding=10,
+                data=slot_id,
             )
-            dropdown_refs[dropdown_id] = dropdown
-            
-            funcoes_card.append(funcao_display.lower())
-            voluntarios_card.append(slot['Voluntario'].lower())
+            dropdown_refs[slot_id] = dropdown
+            alertas_conflito[slot_id] = ft.Icon(ft.Icons.WARNING, color=get_alert_color(), size=20, visible=False)
+            aplicar_estilo_conflito(slot_id, atualizar=False)
+            botoes_fixar[slot_id] = ft.IconButton(icon_size=18, on_click=on_fixar_click, data=slot_id)
+            estilo_fixo(botoes_fixar[slot_id], slot_id in slots_fixos)
             
-            # LINHA RESPONSIVA - se adapta ao tamanho da tela
-            linha = ft.ResponsiveRow([
-                ft.Container(
-                    ft.Text(funcao_display + ":", weight=ft.FontWeight.BOLD, color=get_text_color()),
-                    col={"sm": 12, "md": 4},
-                    padding=5
-                ),
-                ft.Container(
+            # Altura fixa por slot, para que todas as linhas da lista tenham a mesma altura
+            linha = ft.Container(
+                ft.Row([
+                    ft.Text(funcao_display + ":", weight=ft.FontWeight.BOLD, color=get_text_color(), width=130),
                     dropdown,
-                    col={"sm": 12, "md": 8},
-                    padding=5
-                )
-            ], vertical_alignment=ft.CrossAxisAlignment.CENTER)
+                    botoes_fixar[slot_id],
+                    alertas_conflito[slot_id],
+                ], vertical_alignment=ft.CrossAxisAlignment.CENTER, spacing=5),
+                height=ALTURA_SLOT,
+                padding=5
+            )
             
             slot_controls.append(linha)
 
         # Card individual
-        card = ft.Container(
+        return ft.Container(
             content=ft.Card(
                 content=ft.Container(
                     content=ft.Column([
                         ft.Text(f"📅 {data}", size=16, weight=ft.FontWeight.BOLD, color=get_text_color()),
                         ft.Divider(),
                         *slot_controls
-                    ]),
+                    ], spacing=0),
                     padding=15,
                 ),
                 elevation=5,
                 margin=10,
             ),
-            col={"sm": 12, "md": 6, "lg": 4},
+            expand=1,
             padding=5
         )
-        
-        cards_data[card] = {
-            'data': data.lower(),
-            'funcoes': funcoes_card,
-            'voluntarios': [v.lower() for v in voluntarios_card]
-        }
-        
-        todos_os_cards.append(card)
-
-    # Adicionar cards ao container
-    for card in todos_os_cards:
-        responsive_container.controls.append(card)
 
-    cards_container.controls.append(responsive_container)
-
-    def iniciar_verificacao():
-        time.sleep(0.5)
-        verificar_e_mostrar_conflitos()
-    
-    threading.Thread(target=iniciar_verificacao, daemon=True).start()
+    # Apenas o primeiro lote é construído antes da primeira exibição
+    sincronizar_janela(0, LINHAS_POR_LOTE - 1)
 
     return ft.Container(
         content=ft.Column(
@@ -511,13 +885,46 @@ def EditarEscalaView(page):
                         col={"sm": 6, "md": 3},
                         padding=5
                     ),
+                    ft.Container(
+                        botao_exportar_tudo,
+                        col={"sm": 6, "md": 6},
+                        padding=5,
+                        alignment=ft.alignment.center
+                    ),
+                    ft.Container(
+                        botao_por_voluntario,
+                        col={"sm": 6, "md": 6},
+                        padding=5,
+                        alignment=ft.alignment.center
+                    ),
+                    ft.Container(
+                        ft.ElevatedButton(
+                            "✅ Publicar escala",
+                            on_click=publicar,
+                            tooltip="Registra os turnos no histórico usado pelas próximas gerações",
+                            bgcolor=get_button_bgcolor(),
+                            color=get_button_color(),
+                            style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
+                        ),
+                        col={"sm": 6, "md": 6},
+                        padding=5,
+                        alignment=ft.alignment.center
+                    ),
+                    ft.Container(
+                        botao_replanejar,
+                        col={"sm": 6, "md": 6},
+                        padding=5,
+                        alignment=ft.alignment.center
+                    ),
                 ], alignment=ft.MainAxisAlignment.CENTER),
+                painel_exportacao,
+                painel_replanejamento,
                 
                 # Alerta de conflitos
                 ft.Container(
                     content=ft.Row([
                         ft.Icon(ft.Icons.WARNING, color=get_alert_color(), size=16),
-                        ft.Text("Ícone de alerta indica conflito: mesma pessoa em múltiplas funções no MESMO dia", 
+                        ft.Text("Ícone de alerta indica conflito: mesma pessoa em múltiplas funções no MESMO horário", 
                                size=12, color=get_text_color())
                     ]),
                     padding=10,
@@ -526,9 +933,9 @@ def EditarEscalaView(page):
                     margin=ft.margin.only(bottom=10)
                 ),
                 
-                # Container dos cards
+                # Lista virtualizada dos cards
                 ft.Container(
-                    content=cards_container,
+                    content=lista_cards,
                     expand=True,
                 )
             ],
@@ -541,24 +948,114 @@ def EditarEscalaView(page):
 
 def ConfiguracoesView(page):
     theme_switch = ft.Switch(label="Modo Escuro", value=page.theme_mode == ft.ThemeMode.DARK)
+
+    def salvar_configuracoes(**alteracoes):
+        try:
+            settings = json.loads(page.client_storage.get("pibshift.settings") or "{}")
+        except (TypeError, ValueError):
+            settings = {}
+        settings.update(alteracoes)
+        with instrumentation.etapa("client_storage.set"):
+            page.client_storage.set("pibshift.settings", json.dumps(settings))
     
     def on_theme_change(e):
         page.theme_mode = ft.ThemeMode.DARK if theme_switch.value else ft.ThemeMode.LIGHT
-        settings = {"theme_mode": page.theme_mode.value}
-        page.client_storage.set("pibshift.settings", json.dumps(settings))
+        salvar_configuracoes(theme_mode=page.theme_mode.value)
         page.update()
 
     theme_switch.on_change = on_theme_change
 
+    # DIAGNÓSTICO: tempos por etapa do pipeline, registrados só quando ativado
+    diagnostico_switch = ft.Switch(
+        label="Registrar tempos das etapas (diagnóstico)",
+        value=instrumentation.ativo(),
+        tooltip="Mede leitura da planilha, geração, gravação do rascunho, editor, conflitos e exportações"
+    )
+    tabela_diagnostico = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Etapa")),
+            ft.DataColumn(ft.Text("Chamadas"), numeric=True),
+            ft.DataColumn(ft.Text("Total (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("Média (ms)"), numeric=True),
+            ft.DataColumn(ft.Text("Máximo (ms)"), numeric=True),
+        ],
+        rows=[],
+    )
+    texto_contadores = ft.Text("", size=12)
+
+    def atualizar_diagnostico(e=None):
+        tabela_diagnostico.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(nome)),
+                ft.DataCell(ft.Text(str(chamadas))),
+                ft.DataCell(ft.Text(f"{total * 1000:.1f}")),
+                ft.DataCell(ft.Text(f"{media * 1000:.2f}")),
+                ft.DataCell(ft.Text(f"{maximo * 1000:.1f}")),
+            ])
+            for nome, chamadas, total, media, maximo in instrumentation.resumo()
+        ]
+        contadores = instrumentation.contadores()
+        if contadores:
+            texto_contadores.value = " · ".join(f"{nome}: {valor}" for nome, valor in sorted(contadores.items()))
+        elif not tabela_diagnostico.rows:
+            texto_contadores.value = ("Nenhuma etapa registrada ainda." if instrumentation.ativo()
+                                      else "Ative o diagnóstico e use o aplicativo para registrar os tempos.")
+        else:
+            texto_contadores.value = ""
+        if e is not None:
+            page.update()
+
+    def on_diagnostico_change(e):
+        instrumentation.ativar(diagnostico_switch.value)
+        salvar_configuracoes(diagnostico=diagnostico_switch.value)
+        atualizar_diagnostico(e)
+
+    def limpar_diagnostico(e):
+        instrumentation.limpar()
+        atualizar_diagnostico(e)
+
+    def on_trace_result(e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
+        try:
+            eventos = instrumentation.exportar_trace(e.path)
+            page.snack_bar = ft.SnackBar(ft.Text(f"Trace com {eventos} etapas exportado: {e.path}"), bgcolor=ft.Colors.GREEN)
+        except Exception as ex:
+            page.snack_bar = ft.SnackBar(ft.Text(f"Erro ao exportar trace: {str(ex)}"), bgcolor=ft.Colors.RED)
+        page.snack_bar.open = True
+        page.update()
+
+    diagnostico_switch.on_change = on_diagnostico_change
+    trace_picker = ft.FilePicker(on_result=on_trace_result)
+    page.overlay.append(trace_picker)
+    atualizar_diagnostico()
+
     return ft.Container(
         content=ft.Column(
             [
                 ft.Text("Configurações", size=24, weight=ft.FontWeight.BOLD),
                 ft.Divider(),
                 theme_switch,
+                ft.Divider(),
+                ft.Text("Diagnóstico de desempenho", size=18, weight=ft.FontWeight.BOLD),
+                diagnostico_switch,
+                ft.Row([
+                    ft.TextButton("Atualizar", icon=ft.Icons.REFRESH, on_click=atualizar_diagnostico),
+                    ft.TextButton("Limpar", icon=ft.Icons.DELETE_OUTLINE, on_click=limpar_diagnostico),
+                    ft.TextButton(
+                        "Exportar trace (JSON)",
+                        icon=ft.Icons.DOWNLOAD,
+                        on_click=lambda e: trace_picker.save_file(
+                            allowed_extensions=["json"], file_name="pibshift_trace.json"
+                        ),
+                    ),
+                ]),
+                texto_contadores,
+                ft.Row([tabela_diagnostico], scroll=ft.ScrollMode.AUTO),
             ],
-            spacing=20
+            spacing=20,
+            scroll=ft.ScrollMode.AUTO
         ),
         padding=20,
         expand=True
-    )
\ No newline at end of file
+    )
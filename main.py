@@ -1,10 +1,17 @@
+import startup_profile
 import os
 import sys
+import multiprocessing
 import flet as ft
+startup_profile.marcar("import flet")
 from interface_views import GerarEscalaView, EditarEscalaView, ConfiguracoesView
+from draft_store import obter_store
+import instrumentation
 import json
+startup_profile.marcar("import interface")
 
 def main(page: ft.Page):
+    startup_profile.marcar("conexão do Flet")
     page.title = "PibShift 2.0"
     
     page.window_icon = "favicon.ico" 
@@ -19,6 +26,8 @@ def main(page: ft.Page):
             settings = json.loads(settings_str)
             theme_value = settings.get("theme_mode", "light")
             page.theme_mode = ft.ThemeMode.DARK if theme_value == "dark" else ft.ThemeMode.LIGHT
+            if settings.get("diagnostico"):
+                instrumentation.ativar()
         page.update()
     except:
         page.theme_mode = ft.ThemeMode.LIGHT
@@ -28,7 +37,7 @@ def main(page: ft.Page):
         if view_index == 0:
             main_content.controls.append(GerarEscalaView(page, navigate_to))
         elif view_index == 1:
-            main_content.controls.append(EditarEscalaView(page))
+            main_content.controls.append(EditarEscalaView(page, navigate_to))
         elif view_index == 2:
             main_content.controls.append(ConfiguracoesView(page))
         rail.selected_index = view_index
@@ -65,9 +74,7 @@ def main(page: ft.Page):
 
     def nova_escala_click(e):
         # Limpa o rascunho salvo
-        page.client_storage.remove("rascunho_escala")
-        page.client_storage.remove("available_servers")
-        page.client_storage.remove("ministerios_ativos")
+        obter_store().descartar()
         # Navega para a tela de gerar escala
         navigate_to(0)
 
@@ -101,6 +108,10 @@ def main(page: ft.Page):
     # Carrega a view inicial
     navigate_to(0)
     page.update()
+    startup_profile.marcar("primeira tela")
+    startup_profile.imprimir_relatorio()
 
 if __name__ == "__main__":
+    # Necessário para os processos de exportação no executável empacotado
+    multiprocessing.freeze_support()
     ft.app(target=main, assets_dir="assets")
\ No newline at end of file
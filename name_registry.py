@@ -0,0 +1,127 @@
+import sys
+import threading
+import numpy as np
+from utils import carregar_config
+
+# Apelidos usados quando config/apelidos.json não existe
+APELIDOS_PADRAO = {
+    "gb marques": "Gabriel Marques",
+    "gabriel": "Gabriel Marques",
+    "gabi": "Gabi",
+}
+
+NAO_DESIGNADO = "Não designado"
+ID_NAO_DESIGNADO = -1
+
+class NormalizadorNomes:
+    """
+    Normaliza nomes de voluntários para "Primeiro Último", aplicando a tabela de apelidos.
+
+    Um nome idêntico a um apelido é resolvido direto; caso contrário, um
+    apelido corresponde quando suas palavras aparecem em sequência no nome,
+    como palavras inteiras, e vale o que vem primeiro na tabela. Os
+    resultados ficam em cache, internados.
+    """
+
+    def __init__(self, apelidos):
+        self._exatos = {}
+        self._por_primeira_palavra = {}
+        for prioridade, (apelido, nome_padronizado) in enumerate(apelidos.items()):
+            palavras = tuple(apelido.lower().split())
+            if not palavras:
+                continue
+            entrada = (prioridade, palavras, sys.intern(nome_padronizado))
+            self._exatos.setdefault(palavras, entrada)
+            self._por_primeira_palavra.setdefault(palavras[0], []).append(entrada)
+        self._cache = {}
+
+    def _buscar_apelido(self, palavras):
+        exato = self._exatos.get(palavras)
+        if exato:
+            return exato[2]
+
+        melhor = None
+        for i, palavra in enumerate(palavras):
+            for entrada in self._por_primeira_palavra.get(palavra, ()):
+                prioridade, palavras_apelido, _ = entrada
+                if melhor is not None and prioridade >= melhor[0]:
+                    continue
+                if palavras[i:i + len(palavras_apelido)] == palavras_apelido:
+                    melhor = entrada
+        return melhor[2] if melhor else None
+
+    def normalizar(self, nome_completo):
+        """Extrai o primeiro e o último nome de um nome completo."""
+        nome = self._cache.get(nome_completo)
+        if nome is None:
+            partes = nome_completo.split()
+            nome = self._buscar_apelido(tuple(parte.lower() for parte in partes))
+            if nome is None:
+                nome = " ".join([partes[0], partes[-1]]) if len(partes) > 1 else (partes[0] if partes else "")
+            nome = sys.intern(nome)
+            self._cache[nome_completo] = nome
+        return nome
+
+class RegistroVoluntarios:
+    """
+    Atribui a cada voluntário normalizado um id inteiro estável.
+
+    Os ids seguem a ordem de primeira aparição e nunca mudam durante o processo.
+    Nomes que só diferem em maiúsculas ("PEDRO CONCEIÇÃO", "Pedro Conceição")
+    têm o mesmo id e são exibidos como apareceram primeiro. "Não designado"
+    tem o id fixo ID_NAO_DESIGNADO. O registro é usado pela thread de geração
+    e pelas da interface ao mesmo tempo, então novos nomes entram sob um lock.
+    """
+
+    def __init__(self):
+        self._ids = {NAO_DESIGNADO.casefold(): ID_NAO_DESIGNADO}
+        self._lock = threading.Lock()
+        self.nomes = []
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def id_de(self, nome):
+        """Id do voluntário, registrando-o se ainda não existir."""
+        chave = nome.casefold()
+        id_voluntario = self._ids.get(chave)
+        if id_voluntario is None:
+            with self._lock:
+                id_voluntario = self._ids.get(chave)
+                if id_voluntario is None:
+                    # O nome entra na lista antes do id ficar visível para quem não segura o lock
+                    id_voluntario = len(self.nomes)
+                    self.nomes.append(nome)
+                    self._ids[chave] = id_voluntario
+        return id_voluntario
+
+    def id_existente(self, nome):
+        """Id do voluntário, ou None se ele nunca foi registrado."""
+        return self._ids.get(nome.casefold())
+
+    def nome(self, id_voluntario):
+        return NAO_DESIGNADO if id_voluntario == ID_NAO_DESIGNADO else self.nomes[id_voluntario]
+
+    def ids(self, nomes):
+        """Vetor de ids para uma sequência de nomes normalizados."""
+        return np.fromiter((self.id_de(nome) for nome in nomes), dtype=np.int64)
+
+_normalizador = None
+_registro_voluntarios = RegistroVoluntarios()
+
+def obter_normalizador():
+    """Normalizador com a tabela de apelidos da configuração, criado uma única vez por processo."""
+    global _normalizador
+    if _normalizador is None:
+        _normalizador = NormalizadorNomes(carregar_config("apelidos.json", APELIDOS_PADRAO))
+    return _normalizador
+
+def obter_registro_voluntarios():
+    return _registro_voluntarios
+
+def normalizar_nome(nome_completo):
+    return obter_normalizador().normalizar(nome_completo)
+
+def id_voluntario(nome):
+    """Id estável de um voluntário a partir do nome já normalizado."""
+    return _registro_voluntarios.id_de(nome)
@@ -0,0 +1,205 @@
+"""
+Renderização de escalas em PDF para escalas grandes.
+
+Trabalha sobre os arrays das colunas (sem iterrows), agrupa os slots por
+data na ordem da escala e desenha com chamadas de baixo nível (text/line/
+rect) em vez de uma célula por campo. Medidas de texto e cortes com
+reticências ficam em cache e são reaproveitados em todas as páginas.
+"""
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from date_columns import IndiceDatas
+
+FONTE = "Helvetica"
+MARGEM = 10
+ALTURA_LINHA = 7
+ALTURA_CABECALHO = 8
+ESPACO_GRUPOS = 3
+ESPACO_COLUNAS = 5
+
+def agrupar_por_data(escala_df):
+    """
+    Agrupa a escala por data, em ordem cronológica (ver date_columns).
+
+    Retorna (datas, inicios, funcoes, voluntarios): funcoes e voluntarios já
+    ordenados por data e `inicios[i]:inicios[i + 1]` delimita o grupo datas[i].
+    Dentro de cada data, as linhas mantêm a ordem da escala. Um DataFrame de
+    Escala.para_dataframe já traz as datas ordenadas nas categorias e
+    reaproveita o IndiceDatas da escala.
+    """
+    coluna = escala_df['Data']
+    if isinstance(coluna.dtype, pd.CategoricalDtype) and coluna.cat.ordered:
+        codigos = coluna.cat.codes.to_numpy()
+        # Só as datas presentes (um recorte por voluntário usa poucas)
+        presentes = np.unique(codigos)
+        datas = [str(data) for data in coluna.cat.categories[presentes]]
+        codigos = np.searchsorted(presentes, codigos)
+    else:
+        codigos, unicas = pd.factorize(coluna.astype(str))
+        # Ordena só as datas distintas e renumera os códigos nessa ordem
+        indice = IndiceDatas(unicas)
+        posicoes = np.array([indice.posicao(data) for data in unicas], dtype=np.int64)
+        codigos = posicoes[codigos]
+        datas = indice.rotulos
+    ordem = np.argsort(codigos, kind='stable')
+    inicios = np.searchsorted(codigos[ordem], np.arange(len(datas) + 1))
+    funcoes = escala_df['Funcao'].astype(str).to_numpy()[ordem]
+    voluntarios = escala_df['Voluntario'].astype(str).to_numpy()[ordem]
+    return datas, inicios, funcoes, voluntarios
+
+def _latin1(texto):
+    """Texto que a fonte padrão (latin-1) consegue desenhar; o que ficar de fora vira "?"."""
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
+
+class RenderizadorPDF:
+    """Desenha os grupos de uma escala em tabela paginada ou em mural de colunas."""
+
+    def __init__(self, titulo="Escala PibShift"):
+        self.pdf = FPDF(orientation="P", unit="mm", format="A4")
+        self.pdf.set_auto_page_break(False)
+        self.pdf.set_draw_color(160, 160, 160)
+        self.titulo = titulo
+        self.largura_util = self.pdf.w - 2 * MARGEM
+        self.limite_y = self.pdf.h - MARGEM
+        self._estilo = None
+        self._cache_texto = {}
+
+    def _fonte(self, estilo, tamanho):
+        if self._estilo != (estilo, tamanho):
+            self.pdf.set_font(FONTE, estilo, tamanho)
+            self._estilo = (estilo, tamanho)
+
+    def _ajustar(self, texto, largura):
+        """Texto em latin-1 cortado com reticências para caber na largura, com cache por estilo."""
+        chave = (self._estilo, texto, largura)
+        ajustado = self._cache_texto.get(chave)
+        if ajustado is None:
+            ajustado = _latin1(texto)
+            if self.pdf.get_string_width(ajustado) > largura:
+                # Busca binária pelo maior prefixo que cabe junto com "..."
+                baixo, alto = 0, len(ajustado)
+                while baixo < alto:
+                    meio = (baixo + alto + 1) // 2
+                    if self.pdf.get_string_width(ajustado[:meio] + "...") <= largura:
+                        baixo = meio
+                    else:
+                        alto = meio - 1
+                ajustado = ajustado[:baixo] + "..."
+            self._cache_texto[chave] = ajustado
+        return ajustado
+
+    def _texto(self, x, y, largura, altura, texto):
+        """Escreve o texto centralizado verticalmente na faixa [y, y + altura]."""
+        self.pdf.text(x + 1.5, y + altura / 2 + 1.2, self._ajustar(texto, largura - 3))
+
+    def _nova_pagina(self):
+        self.pdf.add_page()
+        self._estilo = None
+        y = MARGEM
+        if self.pdf.page_no() == 1:
+            self._fonte("B", 16)
+            titulo = self._ajustar(self.titulo, self.largura_util)
+            self.pdf.text((self.pdf.w - self.pdf.get_string_width(titulo)) / 2, y + 7, titulo)
+            y += 16
+        return y
+
+    def _cabecalho_grupo(self, x, y, largura, data, continuacao=False):
+        self.pdf.set_fill_color(225, 232, 240)
+        self.pdf.rect(x, y, largura, ALTURA_CABECALHO, style="DF")
+        self._fonte("B", 11)
+        self._texto(x, y, largura, ALTURA_CABECALHO, f"{data} (continuação)" if continuacao else data)
+        return y + ALTURA_CABECALHO
+
+    def _linhas(self, x, y, larguras, funcoes, voluntarios, inicio, fim):
+        """Desenha as linhas [inicio, fim) de um grupo e retorna o y final."""
+        self._fonte("", 10)
+        y_inicial = y
+        largura_total = sum(larguras)
+        for i in range(inicio, fim):
+            self._texto(x, y, larguras[0], ALTURA_LINHA, funcoes[i])
+            self._texto(x + larguras[0], y, larguras[1], ALTURA_LINHA, voluntarios[i])
+            y += ALTURA_LINHA
+            self.pdf.line(x, y, x + largura_total, y)
+        # Bordas verticais: uma linha por coluna para todo o trecho
+        for borda in (x, x + larguras[0], x + largura_total):
+            self.pdf.line(borda, y_inicial, borda, y)
+        return y
+
+    def tabela(self, datas, inicios, funcoes, voluntarios):
+        """Tabela Função | Voluntário agrupada por data, com cabeçalhos repetidos a cada página."""
+        larguras = (self.largura_util * 0.4, self.largura_util * 0.6)
+
+        def cabecalho_tabela(y):
+            self.pdf.set_fill_color(245, 245, 245)
+            self._fonte("B", 10)
+            x = MARGEM
+            for largura, titulo in zip(larguras, ("Função", "Voluntário")):
+                self.pdf.rect(x, y, largura, ALTURA_LINHA, style="DF")
+                self._texto(x, y, largura, ALTURA_LINHA, titulo)
+                x += largura
+            return y + ALTURA_LINHA
+
+        y = cabecalho_tabela(self._nova_pagina())
+        for indice, data in enumerate(datas):
+            inicio, fim = inicios[indice], inicios[indice + 1]
+            # Não deixa um cabeçalho de data sozinho no fim da página
+            if y + ESPACO_GRUPOS + ALTURA_CABECALHO + ALTURA_LINHA > self.limite_y:
+                y = cabecalho_tabela(self._nova_pagina())
+            else:
+                y += ESPACO_GRUPOS
+            y = self._cabecalho_grupo(MARGEM, y, self.largura_util, data)
+
+            while inicio < fim:
+                cabem = int((self.limite_y - y) // ALTURA_LINHA)
+                if cabem <= 0:
+                    y = cabecalho_tabela(self._nova_pagina())
+                    y = self._cabecalho_grupo(MARGEM, y, self.largura_util, data, continuacao=True)
+                    continue
+                parte = min(fim, inicio + cabem)
+                y = self._linhas(MARGEM, y, larguras, funcoes, voluntarios, inicio, parte)
+                inicio = parte
+
+    def mural(self, datas, inicios, funcoes, voluntarios, colunas=3):
+        """Blocos por data distribuídos em colunas, para impressão em mural."""
+        largura_coluna = (self.largura_util - ESPACO_COLUNAS * (colunas - 1)) / colunas
+        larguras = (largura_coluna * 0.45, largura_coluna * 0.55)
+
+        topo = self._nova_pagina()
+        coluna, y = 0, topo
+        for indice, data in enumerate(datas):
+            inicio, fim = inicios[indice], inicios[indice + 1]
+            altura = ALTURA_CABECALHO + (fim - inicio) * ALTURA_LINHA
+            # Blocos que não cabem na coluna passam para a próxima (ou para a próxima página)
+            if y + altura > self.limite_y and y > topo:
+                coluna += 1
+                y = topo
+                if coluna == colunas:
+                    topo = self._nova_pagina()
+                    coluna, y = 0, topo
+
+            x = MARGEM + coluna * (largura_coluna + ESPACO_COLUNAS)
+            y = self._cabecalho_grupo(x, y, largura_coluna, data)
+            while inicio < fim:
+                cabem = max(1, int((self.limite_y - y) // ALTURA_LINHA))
+                parte = min(fim, inicio + cabem)
+                y = self._linhas(x, y, larguras, funcoes, voluntarios, inicio, parte)
+                inicio = parte
+                if inicio < fim:
+                    # Bloco maior que uma coluna inteira: continua no topo da próxima
+                    coluna += 1
+                    if coluna == colunas:
+                        topo = self._nova_pagina()
+                        coluna = 0
+                    x = MARGEM + coluna * (largura_coluna + ESPACO_COLUNAS)
+                    y = self._cabecalho_grupo(x, topo, largura_coluna, data, continuacao=True)
+            y += ESPACO_GRUPOS
+
+    def vazio(self, mensagem):
+        y = self._nova_pagina()
+        self._fonte("", 12)
+        mensagem = self._ajustar(mensagem, self.largura_util)
+        self.pdf.text((self.pdf.w - self.pdf.get_string_width(mensagem)) / 2, y + 6, mensagem)
+
+    def salvar(self, filename):
+        self.pdf.output(filename)
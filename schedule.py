@@ -0,0 +1,166 @@
+"""
+Escala em colunas de códigos inteiros.
+
+Em vez de uma lista de dicts por slot, a escala guarda três vetores int32:
+o código da data, o código da função (índices nas listas `datas` e
+`funcoes`) e o id do voluntário (ver name_registry). O alocador monta a
+escala direto nesse formato, o banco de rascunhos grava e carrega a partir
+dela, o editor altera só o vetor de voluntários e os exportadores recebem
+um DataFrame categórico construído a partir dos mesmos códigos, sem passar
+por um objeto Python por slot.
+"""
+import numpy as np
+from date_columns import IndiceDatas
+from name_registry import obter_registro_voluntarios, ID_NAO_DESIGNADO, NAO_DESIGNADO
+
+COLUNAS = ['Data', 'Funcao', 'Voluntario']
+
+def _codificar(rotulos):
+    """(rótulos distintos na ordem de primeira aparição, código de cada item)."""
+    indices = {}
+    codigos = np.fromiter((indices.setdefault(rotulo, len(indices)) for rotulo in rotulos), dtype=np.int32)
+    return list(indices), codigos
+
+class Escala:
+    """
+    Slots da escala: `datas[codigo_data[i]]`, `funcoes[codigo_funcao[i]]` e
+    o voluntário de id `voluntario[i]` (ID_NAO_DESIGNADO quando vazio).
+    """
+
+    __slots__ = ('datas', 'funcoes', 'codigo_data', 'codigo_funcao', 'voluntario', '_indice_datas')
+
+    def __init__(self, datas, funcoes, codigo_data, codigo_funcao, voluntario):
+        self.datas = list(datas)
+        self.funcoes = list(funcoes)
+        self.codigo_data = np.asarray(codigo_data, dtype=np.int32)
+        self.codigo_funcao = np.asarray(codigo_funcao, dtype=np.int32)
+        self.voluntario = np.asarray(voluntario, dtype=np.int32)
+        self._indice_datas = None
+
+    @classmethod
+    def de_colunas(cls, datas, funcoes, voluntarios):
+        """Escala a partir de três sequências paralelas de rótulos e nomes."""
+        rotulos_datas, codigo_data = _codificar(datas)
+        rotulos_funcoes, codigo_funcao = _codificar(funcoes)
+        registro = obter_registro_voluntarios()
+        ids = np.fromiter((registro.id_de(str(nome)) for nome in voluntarios), dtype=np.int32)
+        return cls(rotulos_datas, rotulos_funcoes, codigo_data, codigo_funcao, ids)
+
+    @classmethod
+    def de_slots(cls, slots):
+        """Escala a partir de dicts Data/Funcao/Voluntario."""
+        slots = list(slots)
+        return cls.de_colunas([s['Data'] for s in slots], [s['Funcao'] for s in slots],
+                              [s['Voluntario'] for s in slots])
+
+    @classmethod
+    def de_dataframe(cls, df):
+        return cls.de_colunas(df['Data'].tolist(), df['Funcao'].tolist(), df['Voluntario'].tolist())
+
+    def __len__(self):
+        return len(self.voluntario)
+
+    def data(self, i):
+        return self.datas[self.codigo_data[i]]
+
+    def funcao(self, i):
+        return self.funcoes[self.codigo_funcao[i]]
+
+    def nome(self, i):
+        return obter_registro_voluntarios().nome(int(self.voluntario[i]))
+
+    def definir(self, i, nome):
+        """Troca o voluntário do slot `i`."""
+        self.voluntario[i] = obter_registro_voluntarios().id_de(nome)
+
+    def nomes(self):
+        """Nome do voluntário de cada slot, como vetor."""
+        # O índice -1 (ID_NAO_DESIGNADO) cai no último item, "Não designado"
+        nomes = np.array(obter_registro_voluntarios().nomes + [NAO_DESIGNADO], dtype=object)
+        return nomes[self.voluntario]
+
+    def linhas(self):
+        """Itera (data, funcao, voluntario) em ordem."""
+        datas = np.array(self.datas, dtype=object)[self.codigo_data] if self.datas else ()
+        funcoes = np.array(self.funcoes, dtype=object)[self.codigo_funcao] if self.funcoes else ()
+        return zip(datas, funcoes, self.nomes())
+
+    def slots(self):
+        """Slots como lista de dicts, no formato antigo."""
+        return [{"Data": data, "Funcao": funcao, "Voluntario": voluntario}
+                for data, funcao, voluntario in self.linhas()]
+
+    def slots_por_data(self):
+        """Dict data -> ids dos slots da data, na ordem da escala."""
+        por_data = {data: [] for data in self.datas}
+        for slot_id, codigo in enumerate(self.codigo_data.tolist()):
+            por_data[self.datas[codigo]].append(slot_id)
+        return por_data
+
+    def designados(self):
+        return self.voluntario != ID_NAO_DESIGNADO
+
+    def indice_datas(self):
+        """IndiceDatas das datas da escala, montado uma vez e reaproveitado pelo editor e exportadores."""
+        if self._indice_datas is None:
+            self._indice_datas = IndiceDatas(self.datas)
+        return self._indice_datas
+
+    def adotar_indice_datas(self, indice):
+        """Reaproveita um IndiceDatas já montado (o do gerador); ignorado se as datas forem outras."""
+        if indice.rotulos == self.datas:
+            self._indice_datas = indice
+
+    def copia(self):
+        copia = Escala(self.datas, self.funcoes, self.codigo_data.copy(), self.codigo_funcao.copy(),
+                       self.voluntario.copy())
+        copia._indice_datas = self._indice_datas
+        return copia
+
+    def para_dataframe(self):
+        """
+        DataFrame Data/Funcao/Voluntario com colunas categóricas sobre os mesmos códigos.
+
+        Só os voluntários presentes viram categorias; o DataFrame não
+        depende do registro de nomes e pode ir para outros processos. As
+        categorias de Data são ordenadas (ordered=True) em ordem cronológica,
+        para os exportadores agruparem sem interpretar as datas de novo.
+        """
+        import pandas as pd
+
+        ids_presentes, codigo_voluntario = np.unique(self.voluntario, return_inverse=True)
+        registro = obter_registro_voluntarios()
+        indice = self.indice_datas()
+        posicoes = np.array([indice.posicao(data) for data in self.datas], dtype=np.int32)
+        return pd.DataFrame({
+            'Data': pd.Categorical.from_codes(posicoes[self.codigo_data] if len(posicoes) else self.codigo_data,
+                                              indice.rotulos, ordered=True),
+            'Funcao': pd.Categorical.from_codes(self.codigo_funcao, self.funcoes),
+            'Voluntario': pd.Categorical.from_codes(
+                codigo_voluntario.reshape(-1), [registro.nome(int(p)) for p in ids_presentes]
+            ),
+        }, columns=COLUNAS)
+
+class MontadorEscala:
+    """Acumula slots um a um, como no alocador, e produz a Escala no fim."""
+
+    __slots__ = ('_datas', '_funcoes', '_codigo_data', '_codigo_funcao', '_voluntario')
+
+    def __init__(self):
+        self._datas = {}
+        self._funcoes = {}
+        self._codigo_data = []
+        self._codigo_funcao = []
+        self._voluntario = []
+
+    def adicionar(self, data, funcao, id_voluntario):
+        self._codigo_data.append(self._datas.setdefault(data, len(self._datas)))
+        self._codigo_funcao.append(self._funcoes.setdefault(funcao, len(self._funcoes)))
+        self._voluntario.append(id_voluntario)
+
+    def escala(self):
+        return Escala(self._datas, self._funcoes, self._codigo_data, self._codigo_funcao, self._voluntario)
+
+def como_dataframe(escala):
+    """DataFrame de uma Escala; um DataFrame recebido é devolvido como está."""
+    return escala.para_dataframe() if isinstance(escala, Escala) else escala
@@ -0,0 +1,97 @@
+from collections import Counter
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceBusca:
+    """
+    Índice de busca por substring sobre os cards da escala (data, funções e voluntários).
+
+    Cada card é um documento com um multiconjunto de textos em minúsculas.
+    Termos com 3 ou mais caracteres usam as listas de trigramas para achar os
+    candidatos; termos menores procuram no vocabulário de palavras. Em ambos
+    os casos os candidatos são confirmados com a mesma regra de substring da
+    busca linear. Trocar o voluntário de um slot atualiza só as listas dele.
+    """
+
+    def __init__(self, documentos):
+        """`documentos`: iterável de (chave, textos), na ordem de exibição."""
+        self._ordem = {}
+        self._textos = {}
+        self._trigramas = {}
+        self._palavras = {}
+        self._ultima_busca = None
+        for chave, textos in documentos:
+            self._ordem[chave] = len(self._ordem)
+            self._textos[chave] = Counter()
+            for texto in textos:
+                self.adicionar(chave, texto)
+
+    def _postar(self, postings, termo, chave, delta):
+        contagem = postings.setdefault(termo, Counter())
+        contagem[chave] += delta
+        if contagem[chave] <= 0:
+            del contagem[chave]
+            if not contagem:
+                del postings[termo]
+
+    def _indexar(self, chave, texto, delta):
+        textos = self._textos[chave]
+        textos[texto] += delta
+        if textos[texto] <= 0:
+            del textos[texto]
+        for trigrama in _trigramas(texto):
+            self._postar(self._trigramas, trigrama, chave, delta)
+        for palavra in set(texto.split()):
+            self._postar(self._palavras, palavra, chave, delta)
+        self._ultima_busca = None
+
+    def adicionar(self, chave, texto):
+        self._indexar(chave, texto.lower(), 1)
+
+    def remover(self, chave, texto):
+        self._indexar(chave, texto.lower(), -1)
+
+    def atualizar(self, chave, texto_antigo, texto_novo):
+        """Troca um texto do documento, por exemplo o voluntário de um slot."""
+        if texto_antigo != texto_novo:
+            self.remover(chave, texto_antigo)
+            self.adicionar(chave, texto_novo)
+
+    def _candidatos(self, termo):
+        if len(termo) >= 3:
+            candidatos = None
+            for trigrama in sorted(_trigramas(termo), key=lambda t: len(self._trigramas.get(t, ()))):
+                chaves = self._trigramas.get(trigrama)
+                if not chaves:
+                    return set()
+                candidatos = set(chaves) if candidatos is None else candidatos & chaves.keys()
+                if not candidatos:
+                    break
+            return candidatos
+
+        # Sem espaços (o termo já vem sem espaços nas pontas), um termo curto
+        # só pode estar dentro de uma única palavra
+        candidatos = set()
+        for palavra, chaves in self._palavras.items():
+            if termo in palavra:
+                candidatos.update(chaves)
+        return candidatos
+
+    def buscar(self, termo):
+        """Chaves dos documentos com algum texto contendo `termo`, na ordem original."""
+        termo = termo.lower().strip()
+        if not termo:
+            return list(self._ordem)
+
+        # Ao continuar digitando, o resultado só pode encolher
+        if self._ultima_busca and termo.startswith(self._ultima_busca[0]):
+            candidatos = self._ultima_busca[1]
+        else:
+            candidatos = self._candidatos(termo)
+
+        resultado = [chave for chave in candidatos
+                     if any(termo in texto for texto in self._textos[chave])]
+        resultado.sort(key=self._ordem.__getitem__)
+        self._ultima_busca = (termo, resultado)
+        return resultado
@@ -0,0 +1,145 @@
+"""
+Horários dos cultos e conflitos por sobreposição de horário.
+
+Cada coluna de data vira um intervalo [início, fim): o horário escrito no
+cabeçalho ("05/01 DOMINGO 10h-12h") tem prioridade, depois o horário do
+dia da semana em config/calendario.json e, por fim, o horário padrão. Um
+voluntário está em conflito quando dois slots seus têm intervalos que se
+sobrepõem, então um culto de manhã e outro à noite no mesmo dia não
+conflitam. As verificações ordenam os slots por voluntário e início e
+fazem uma única varredura, em O(n log n).
+"""
+import datetime
+import heapq
+import unicodedata
+import numpy as np
+from date_columns import interpretar_coluna
+from name_registry import ID_NAO_DESIGNADO
+from utils import carregar_config
+
+# Horários usados quando config/calendario.json não existe
+CALENDARIO_PADRAO = {
+    "inicio": "19:00",
+    "fim": "22:00",
+    "por_dia_semana": {},
+    "local": "",
+    "participantes": {},
+}
+
+_REFERENCIA = datetime.datetime(1, 1, 1)
+_MINUTO = datetime.timedelta(minutes=1)
+
+def _sem_acentos(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+def _hora(texto):
+    horas, minutos = texto.split(":")
+    return datetime.time(int(horas), int(minutos))
+
+class HorariosCultos:
+    """
+    Intervalo de cada coluna de data.
+
+    `config` segue o formato de config/calendario.json: horário padrão
+    (inicio/fim) e horários por dia da semana (ex.: "DOMINGO", "SABADO").
+    """
+
+    def __init__(self, config=None):
+        config = config or carregar_config("calendario.json", CALENDARIO_PADRAO)
+        self.horario_padrao = (_hora(config.get("inicio", "19:00")), _hora(config.get("fim", "22:00")))
+        self.por_dia_semana = {
+            _sem_acentos(dia.upper()): (_hora(h["inicio"]), _hora(h["fim"]))
+            for dia, h in config.get("por_dia_semana", {}).items()
+        }
+        self._datas = {}
+
+    def intervalo(self, rotulo):
+        """(início, fim) em datetime do culto descrito pela coluna, ou None se não houver data."""
+        if rotulo in self._datas:
+            return self._datas[rotulo]
+
+        intervalo = None
+        coluna = interpretar_coluna(rotulo)
+        if coluna.data is not None:
+            inicio_padrao, fim_padrao = self.por_dia_semana.get(_sem_acentos(coluna.dia_semana), self.horario_padrao)
+            inicio = datetime.datetime.combine(coluna.data, coluna.inicio or inicio_padrao)
+            if coluna.fim:
+                fim = datetime.datetime.combine(coluna.data, coluna.fim)
+            elif coluna.inicio:
+                # Só o início no cabeçalho: mantém a duração configurada
+                duracao = (datetime.datetime.combine(coluna.data, fim_padrao)
+                           - datetime.datetime.combine(coluna.data, inicio_padrao))
+                fim = inicio + (duracao if duracao > datetime.timedelta(0) else duracao + datetime.timedelta(days=1))
+            else:
+                fim = datetime.datetime.combine(coluna.data, fim_padrao)
+            if fim <= inicio:
+                fim += datetime.timedelta(days=1)
+            intervalo = (inicio, fim)
+        self._datas[rotulo] = intervalo
+        return intervalo
+
+    def minutos(self, rotulos):
+        """
+        (inicio, fim) em minutos, como vetores int64 alinhados com `rotulos`.
+
+        Uma coluna sem data recebe um intervalo só seu, que não se sobrepõe a
+        nenhuma outra coluna: conflita apenas consigo mesma, como antes.
+        """
+        inicio = np.empty(len(rotulos), dtype=np.int64)
+        fim = np.empty(len(rotulos), dtype=np.int64)
+        sem_data = {}
+        for i, rotulo in enumerate(rotulos):
+            intervalo = self.intervalo(rotulo)
+            if intervalo is None:
+                k = sem_data.setdefault(rotulo, len(sem_data))
+                inicio[i], fim[i] = -2 * k - 2, -2 * k - 1
+            else:
+                inicio[i] = (intervalo[0] - _REFERENCIA) // _MINUTO
+                fim[i] = (intervalo[1] - _REFERENCIA) // _MINUTO
+        return inicio, fim
+
+def slots_sobrepostos(pessoas, inicio, fim, livre=ID_NAO_DESIGNADO):
+    """
+    Máscara dos slots cuja pessoa tem outro slot com horário sobreposto.
+
+    `pessoas`, `inicio` e `fim` são vetores alinhados; slots com `livre`
+    (ninguém escalado) são ignorados.
+    """
+    pessoas = np.asarray(pessoas)
+    conflito = np.zeros(len(pessoas), dtype=bool)
+    escalados = np.flatnonzero(pessoas != livre)
+    if len(escalados) < 2:
+        return conflito
+
+    ordem = escalados[np.lexsort((inicio[escalados], pessoas[escalados]))]
+    p, ini, fi = pessoas[ordem], inicio[ordem], fim[ordem]
+
+    # Cada pessoa ganha uma faixa de tempo própria, para uma única varredura servir a todas
+    grupo = np.concatenate(([0], np.cumsum(p[1:] != p[:-1])))
+    minimo = ini.min()
+    deslocamento = grupo * (int(fi.max()) - int(minimo) + 1) - minimo
+    ini = ini + deslocamento
+    fi = fi + deslocamento
+
+    # Em ordem de início, um slot sobrepõe algum anterior se começa antes do maior fim visto,
+    # e algum posterior se o seguinte começa antes do seu fim
+    com_anterior = ini[1:] < np.maximum.accumulate(fi)[:-1]
+    com_seguinte = ini[1:] < fi[:-1]
+    conflito[ordem[1:][com_anterior]] = True
+    conflito[ordem[:-1][com_seguinte]] = True
+    return conflito
+
+def colunas_sobrepostas(inicio, fim):
+    """Para cada coluna, a lista das outras colunas cujo intervalo se sobrepõe ao dela."""
+    sobrepostas = [[] for _ in range(len(inicio))]
+    ativas = []
+    for i in sorted(range(len(inicio)), key=lambda i: inicio[i]):
+        while ativas and ativas[0][0] <= inicio[i]:
+            heapq.heappop(ativas)
+        for _, j in ativas:
+            sobrepostas[i].append(j)
+            sobrepostas[j].append(i)
+        heapq.heappush(ativas, (fim[i], i))
+    for lista in sobrepostas:
+        lista.sort()
+    return sobrepostas
@@ -0,0 +1,112 @@
+"""
+Cache em disco das planilhas já lidas por ler_planilha.
+
+A chave combina o hash SHA-256 do conteúdo, o tamanho, o mtime e a versão
+do leitor. Cada entrada é um .npz sem compressão: as colunas booleanas de
+datas ficam em uma única matriz e as colunas de texto em arrays Unicode
+com máscara de vazios. Quando o total passa do limite, as entradas usadas
+há mais tempo são removidas.
+"""
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get(
+    "PIBSHIFT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".pibshift", "cache")
+)
+TAMANHO_MAXIMO = 64 * 1024 * 1024
+
+# Evita recalcular o hash de um arquivo que não mudou desde a última leitura
+_hashes = {}
+
+def _hash_arquivo(filepath, estado):
+    chave = (os.path.abspath(filepath), estado.st_size, estado.st_mtime_ns)
+    digest = _hashes.get(chave)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloco)
+        digest = _hashes[chave] = sha.hexdigest()
+    return digest
+
+def chave_cache(filepath, versao_leitor):
+    estado = os.stat(filepath)
+    conteudo = _hash_arquivo(filepath, estado)
+    return hashlib.sha256(
+        f"{conteudo}:{estado.st_size}:{estado.st_mtime_ns}:{versao_leitor}".encode()
+    ).hexdigest()
+
+def _caminho_entrada(chave):
+    return os.path.join(CACHE_DIR, f"{chave}.npz")
+
+def carregar(chave):
+    """DataFrame em cache para a chave, ou None."""
+    caminho = _caminho_entrada(chave)
+    if not os.path.exists(caminho):
+        return None
+
+    with np.load(caminho, allow_pickle=False) as dados:
+        colunas = dados["colunas"].tolist()
+        colunas_bool = set(dados["colunas_bool"].tolist())
+        matriz = dados["matriz_bool"]
+
+        series = {}
+        indice_bool = 0
+        for i, coluna in enumerate(colunas):
+            if coluna in colunas_bool:
+                series[coluna] = matriz[:, indice_bool]
+                indice_bool += 1
+            else:
+                valores = dados[f"texto_{i}"].astype(object)
+                valores[dados[f"vazio_{i}"]] = None
+                series[coluna] = pd.Series(valores, dtype=object)
+
+    # Marca a entrada como usada recentemente, para a remoção por tamanho
+    os.utime(caminho)
+    return pd.DataFrame(series, columns=colunas)
+
+def salvar(chave, df):
+    """Grava o DataFrame no cache e remove entradas antigas se passar do limite."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    colunas_bool = [c for c in df.columns if df[c].dtype == bool]
+    matriz = (df[colunas_bool].to_numpy(dtype=bool) if colunas_bool
+              else np.zeros((len(df), 0), dtype=bool))
+    arrays = {
+        "colunas": np.array(list(df.columns), dtype=str),
+        "colunas_bool": np.array(colunas_bool, dtype=str),
+        "matriz_bool": matriz,
+    }
+    for i, coluna in enumerate(df.columns):
+        if coluna not in colunas_bool:
+            vazio = df[coluna].isna().to_numpy()
+            arrays[f"vazio_{i}"] = vazio
+            arrays[f"texto_{i}"] = np.array(["" if v else str(x) for x, v in zip(df[coluna], vazio)], dtype=str)
+
+    # Grava em arquivo temporário para que leitores nunca vejam uma entrada pela metade
+    temporario = _caminho_entrada(chave) + f".{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temporario, _caminho_entrada(chave))
+    limitar_tamanho()
+
+def limitar_tamanho(tamanho_maximo=TAMANHO_MAXIMO):
+    """Remove as entradas menos usadas até o cache caber em `tamanho_maximo` bytes."""
+    entradas = []
+    for nome in os.listdir(CACHE_DIR):
+        if nome.endswith(".npz"):
+            estado = os.stat(os.path.join(CACHE_DIR, nome))
+            entradas.append((estado.st_mtime, estado.st_size, nome))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, nome in sorted(entradas):
+        if total <= tamanho_maximo:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, nome))
+        except OSError:
+            continue
+        total -= tamanho
@@ -0,0 +1,89 @@
+"""
+Histórico de turnos das escalas publicadas.
+
+Publicar uma escala grava no banco (ver draft_store) quantos turnos cada
+voluntário fez em cada data. As datas são guardadas pela data interpretada
+do cabeçalho (ver chave_da_coluna), não pelo texto, para que "05/01" de
+anos diferentes não se confundam. HistoricoTurnos carrega esse histórico
+somado por mês, para que uma nova geração planeje só as datas ainda não
+publicadas: o limite de turnos de cada data conta o que já foi servido no
+mês dela e a ordem de escolha favorece quem serviu menos no acumulado.
+"""
+from date_columns import interpretar_coluna
+
+def mes_da_coluna(rotulo):
+    """Mês ('AAAA-MM') de uma coluna de data, ou '' se o cabeçalho não tiver data."""
+    data = interpretar_coluna(rotulo).data
+    return f"{data:%Y-%m}" if data else ""
+
+def chave_da_coluna(rotulo):
+    """
+    Chave de uma coluna de data no histórico: 'AAAA-MM-DD', mais ' HH:MM'
+    se o cabeçalho tiver horário, ou o próprio texto se não tiver data.
+    """
+    coluna = interpretar_coluna(rotulo)
+    if coluna.data is None:
+        return coluna.rotulo
+    if coluna.inicio is None:
+        return f"{coluna.data:%Y-%m-%d}"
+    return f"{coluna.data:%Y-%m-%d} {coluna.inicio:%H:%M}"
+
+class HistoricoTurnos:
+    """
+    Turnos já publicados: `datas` publicadas (por chave_da_coluna),
+    `por_data` (data -> (mês, voluntário -> turnos)), `por_mes` (mês ->
+    voluntário -> turnos) e `total` acumulado por voluntário.
+    """
+
+    def __init__(self, datas=(), turnos_por_data=()):
+        # Histórico gravado antes das chaves por data ainda tem o texto do cabeçalho
+        self.datas = {chave_da_coluna(data) for data in datas}
+        self.por_data = {}
+        for data, mes, voluntario, turnos in turnos_por_data:
+            turnos_data = self.por_data.setdefault(chave_da_coluna(data), (mes, {}))[1]
+            turnos_data[voluntario] = turnos_data.get(voluntario, 0) + turnos
+        self._somar()
+
+    def _somar(self):
+        self.por_mes = {}
+        self.total = {}
+        for mes, turnos_data in self.por_data.values():
+            turnos_mes = self.por_mes.setdefault(mes, {})
+            for voluntario, turnos in turnos_data.items():
+                turnos_mes[voluntario] = turnos_mes.get(voluntario, 0) + turnos
+                self.total[voluntario] = self.total.get(voluntario, 0) + turnos
+
+    @classmethod
+    def carregar(cls, store=None):
+        """Histórico gravado no banco de rascunhos."""
+        if store is None:
+            from draft_store import obter_store
+            store = obter_store()
+        return cls(*store.carregar_historico())
+
+    def __bool__(self):
+        return bool(self.datas)
+
+    def datas_novas(self, colunas):
+        """Colunas de data que ainda não foram publicadas, na ordem recebida."""
+        return [coluna for coluna in colunas if chave_da_coluna(coluna) not in self.datas]
+
+    def sem_colunas(self, colunas):
+        """Cópia do histórico sem as datas das colunas informadas (ex.: as da própria escala)."""
+        chaves = {chave_da_coluna(coluna) for coluna in colunas}
+        historico = HistoricoTurnos()
+        historico.datas = self.datas - chaves
+        historico.por_data = {data: turnos for data, turnos in self.por_data.items() if data not in chaves}
+        historico._somar()
+        return historico
+
+def publicar_escala(escala, store=None):
+    """Grava a Escala no histórico e retorna (success, message)."""
+    if store is None:
+        from draft_store import obter_store
+        store = obter_store()
+    try:
+        num_datas = store.publicar(escala, chave_da_coluna, mes_da_coluna)
+    except Exception as e:
+        return False, f"Erro ao publicar a escala: {e}"
+    return True, f"Escala publicada: {num_datas} data(s) no histórico."
@@ -0,0 +1,48 @@
+"""
+Medição do tempo de abertura do aplicativo.
+
+Ativado com `python main.py --perfil-inicio` ou PIBSHIFT_PERFIL_INICIO=1.
+main.py marca cada etapa (importações, conexão do Flet, primeira tela) e,
+ao terminar de desenhar a primeira tela, o relatório é impresso no stderr
+junto com as bibliotecas pesadas que já foram carregadas até ali.
+"""
+import os
+import sys
+import time
+
+INICIO = time.perf_counter()
+ATIVO = "--perfil-inicio" in sys.argv or os.environ.get("PIBSHIFT_PERFIL_INICIO") == "1"
+
+# Bibliotecas que não devem ser importadas antes da primeira tela
+MODULOS_PESADOS = ("pandas", "numpy", "fpdf", "openpyxl", "PIL")
+
+_marcas = []
+
+def marcar(etapa):
+    """Registra o fim de uma etapa da inicialização (sem custo quando desativado)."""
+    if ATIVO:
+        _marcas.append((etapa, time.perf_counter()))
+
+def marcas():
+    """Lista de (etapa, segundos da etapa, segundos desde o início)."""
+    resultado = []
+    anterior = INICIO
+    for etapa, instante in _marcas:
+        resultado.append((etapa, instante - anterior, instante - INICIO))
+        anterior = instante
+    return resultado
+
+def modulos_pesados_carregados():
+    return [modulo for modulo in MODULOS_PESADOS if modulo in sys.modules]
+
+def relatorio():
+    linhas = ["Perfil de inicialização do PibShift:"]
+    for etapa, duracao, total in marcas():
+        linhas.append(f"  {etapa:<20} {duracao * 1000:>8.1f} ms   (total {total * 1000:>8.1f} ms)")
+    pesados = modulos_pesados_carregados()
+    linhas.append(f"  Bibliotecas pesadas já carregadas: {', '.join(pesados) if pesados else 'nenhuma'}")
+    return "\n".join(linhas)
+
+def imprimir_relatorio():
+    if ATIVO:
+        print(relatorio(), file=sys.stderr)
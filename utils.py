@@ -1,4 +1,12 @@
 import datetime
+import json
+import os
+import re
+
+CONFIG_DIR = os.environ.get(
+    "PIBSHIFT_CONFIG_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+)
 
 def format_date(date_str):
     """
@@ -9,3 +17,21 @@ def format_date(date_str):
         return date_obj.strftime('%A, %d/%m/%Y')
     except (ValueError, TypeError):
         return date_str
+
+def carregar_config(nome_arquivo, padrao):
+    """
+    Loads a JSON file from the config directory, returning `padrao` when it does not exist.
+    """
+    caminho = os.path.join(CONFIG_DIR, nome_arquivo)
+    if not os.path.exists(caminho):
+        return padrao
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def nome_arquivo_seguro(texto, padrao='arquivo'):
+    """
+    Converts free text (e.g. a volunteer's name) into a file name without separators or special characters.
+    """
+    nome = re.sub(r'[^\w\- ]+', '', str(texto)).strip().replace(' ', '_')
+    return nome or padrao
@@ -0,0 +1,131 @@
+"""
+Restrições por voluntário declaradas em config/restricoes.json.
+
+- pares: dois voluntários que servem juntos quando ambos podem, cada um
+  em uma das áreas indicadas;
+- exclusoes: grupos de voluntários que nunca servem no mesmo culto;
+- preferencias: áreas em que o voluntário é escalado antes de as demais
+  áreas serem preenchidas, e antes dos outros voluntários; nas outras
+  áreas ele é tentado por último. No alocador ótimo ele só sai da área
+  preferida se isso preencher mais um slot;
+- limites: máximo de turnos de um voluntário, no lugar do limite geral.
+
+A configuração é lida por nome; `compilar` a traduz para os ids do
+name_registry em vetores e dicionários indexados por id, para que o
+alocador consulte qualquer restrição em tempo constante por candidato.
+"""
+import numpy as np
+from name_registry import normalizar_nome, obter_registro_voluntarios
+from utils import carregar_config
+
+# Restrições usadas quando config/restricoes.json não existe
+RESTRICOES_PADRAO = {
+    "pares": [
+        {"voluntarios": ["Gabriel Marques", "Gabi"], "areas": [["PRODUÇÃO", "FILMAGEM"], ["TAKE"]]},
+    ],
+    "exclusoes": [],
+    "preferencias": {},
+    "limites": {},
+}
+
+class RestricoesCompiladas:
+    """
+    Restrições de uma geração, por id de voluntário.
+
+    `limite[id]` é o máximo de turnos de cada voluntário, `limites` só os
+    que diferem do limite geral, `exclusoes` id -> ids que não podem servir
+    no mesmo culto, `pares` (id_a, areas_a, id_b, areas_b) e `ordem_area`
+    área -> vetor com a posição de cada voluntário na área: 0 se a prefere,
+    2 se prefere outras áreas e 1 para os demais.
+    """
+
+    __slots__ = ('limite', 'limites', 'maior_limite', 'exclusoes', 'pares', 'ordem_area')
+
+    def __init__(self, limite, limites, exclusoes, pares, ordem_area):
+        self.limite = limite
+        self.limites = limites
+        self.maior_limite = int(limite.max()) if len(limite) else 0
+        self.exclusoes = exclusoes
+        self.pares = pares
+        self.ordem_area = ordem_area
+
+    def preferem(self, area, ids):
+        """Dos candidatos, os que preferem a área, na ordem recebida."""
+        ordem = self.ordem_area.get(area)
+        if ordem is None:
+            return []
+        return [id_voluntario for id_voluntario in ids if ordem[id_voluntario] == 0]
+
+    def ordenar(self, area, ids):
+        """Candidatos em ordem de preferência pela área, mantendo a ordem recebida nos empates."""
+        ordem = self.ordem_area.get(area)
+        if ordem is None:
+            return ids
+        return ids[np.argsort(ordem[ids], kind='stable')]
+
+class RestricoesEscala:
+    """Restrições da configuração, ainda por nome."""
+
+    def __init__(self, config):
+        self.pares = [
+            ([normalizar_nome(nome) for nome in par["voluntarios"]], par.get("areas") or [[], []])
+            for par in config.get("pares", [])
+        ]
+        self.exclusoes = [[normalizar_nome(nome) for nome in grupo] for grupo in config.get("exclusoes", [])]
+        self.preferencias = {normalizar_nome(nome): areas for nome, areas in config.get("preferencias", {}).items()}
+        self.limites = {normalizar_nome(nome): int(n) for nome, n in config.get("limites", {}).items()}
+
+    def compilar(self, areas, max_turnos):
+        """
+        RestricoesCompiladas para as áreas ativas e o limite geral de turnos.
+
+        Voluntários que ainda não apareceram em nenhuma planilha são ignorados.
+        """
+        voluntarios = obter_registro_voluntarios()
+        ativas = set(areas)
+
+        def ids_existentes(nomes):
+            ids = (voluntarios.id_existente(nome) for nome in nomes)
+            return [id_voluntario for id_voluntario in ids if id_voluntario is not None]
+
+        limite = np.full(len(voluntarios), max_turnos, dtype=np.int64)
+        limites = {}
+        for nome, n in self.limites.items():
+            id_voluntario = voluntarios.id_existente(nome)
+            if id_voluntario is not None:
+                limite[id_voluntario] = limites[id_voluntario] = n
+
+        exclusoes = {}
+        for grupo in self.exclusoes:
+            ids = ids_existentes(grupo)
+            for id_voluntario in ids:
+                exclusoes.setdefault(id_voluntario, set()).update(i for i in ids if i != id_voluntario)
+
+        pares = []
+        for (nome_a, nome_b), (areas_a, areas_b) in self.pares:
+            id_a, id_b = voluntarios.id_existente(nome_a), voluntarios.id_existente(nome_b)
+            areas_a = [area for area in areas_a if area in ativas]
+            areas_b = [area for area in areas_b if area in ativas]
+            if id_a is not None and id_b is not None and areas_a and areas_b:
+                pares.append((id_a, areas_a, id_b, areas_b))
+
+        ordem_area = {}
+        for nome, areas_preferidas in self.preferencias.items():
+            id_voluntario = voluntarios.id_existente(nome)
+            if id_voluntario is None:
+                continue
+            if not ordem_area:
+                ordem_area = {area: np.ones(len(voluntarios), dtype=np.int8) for area in areas}
+            for area, ordem in ordem_area.items():
+                ordem[id_voluntario] = 0 if area in areas_preferidas else 2
+
+        return RestricoesCompiladas(limite, limites, exclusoes, pares, ordem_area)
+
+_restricoes = None
+
+def obter_restricoes():
+    """Restrições da configuração, lidas uma única vez por processo."""
+    global _restricoes
+    if _restricoes is None:
+        _restricoes = RestricoesEscala(carregar_config("restricoes.json", RESTRICOES_PADRAO))
+    return _restricoes
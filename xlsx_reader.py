@@ -0,0 +1,145 @@
+"""
+Leitura em streaming das linhas de um arquivo .xlsx.
+
+O caminho rápido lê o XML da primeira planilha direto do zip com
+iterparse, liberando cada linha depois de usada. Arquivos com estrutura
+inesperada caem no modo read-only do openpyxl, que é mais lento mas mais
+tolerante. Nos dois casos, células numéricas com formato de data viram
+datetime, como no openpyxl.
+"""
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from openpyxl import load_workbook
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def _indice_coluna(referencia):
+    """Converte a referência de uma célula ('AB12') no índice da coluna (27)."""
+    indice = 0
+    for caractere in referencia:
+        if caractere.isdigit():
+            break
+        indice = indice * 26 + (ord(caractere.upper()) - 64)
+    return indice - 1
+
+def _primeira_planilha(arquivo):
+    """(caminho do XML da primeira planilha, época das datas) do workbook."""
+    workbook = ET.fromstring(arquivo.read("xl/workbook.xml"))
+    propriedades = workbook.find(f"{_NS}workbookPr")
+    data_1904 = propriedades is not None and propriedades.get("date1904") in ("1", "true")
+    epoca = CALENDAR_MAC_1904 if data_1904 else CALENDAR_WINDOWS_1900
+
+    id_relacao = workbook.findall(f"{_NS}sheets/{_NS}sheet")[0].get(f"{_NS_REL}id")
+    relacoes = ET.fromstring(arquivo.read("xl/_rels/workbook.xml.rels"))
+    for relacao in relacoes.iter(f"{_NS_PKG_REL}Relationship"):
+        if relacao.get("Id") == id_relacao:
+            alvo = relacao.get("Target")
+            caminho = alvo.lstrip("/") if alvo.startswith("/") else posixpath.normpath(posixpath.join("xl", alvo))
+            return caminho, epoca
+    raise KeyError(id_relacao)
+
+def _estilos_data(arquivo):
+    """Índices (como texto, igual ao atributo s das células) dos estilos com formato de data."""
+    if "xl/styles.xml" not in arquivo.namelist():
+        return frozenset()
+    estilos = ET.fromstring(arquivo.read("xl/styles.xml"))
+    formatos = dict(BUILTIN_FORMATS)
+    for formato in estilos.iter(f"{_NS}numFmt"):
+        formatos[int(formato.get("numFmtId"))] = formato.get("formatCode", "")
+
+    celulas = estilos.find(f"{_NS}cellXfs")
+    if celulas is None:
+        return frozenset()
+    return frozenset(
+        str(indice) for indice, xf in enumerate(celulas.findall(f"{_NS}xf"))
+        if is_date_format(formatos.get(int(xf.get("numFmtId", 0)), ""))
+    )
+
+def _texto_rico(elemento):
+    """Texto de um <si>/<is>, juntando os trechos e ignorando a guia fonética."""
+    partes = []
+    for filho in elemento:
+        if filho.tag == f"{_NS}t":
+            partes.append(filho.text or "")
+        elif filho.tag == f"{_NS}r":
+            partes.extend(t.text or "" for t in filho.iter(f"{_NS}t"))
+    return "".join(partes)
+
+def _strings_compartilhadas(arquivo):
+    if "xl/sharedStrings.xml" not in arquivo.namelist():
+        return []
+    strings = []
+    with arquivo.open("xl/sharedStrings.xml") as xml:
+        for _, elemento in ET.iterparse(xml):
+            if elemento.tag == f"{_NS}si":
+                strings.append(_texto_rico(elemento))
+                elemento.clear()
+    return strings
+
+def _valor_celula(celula, strings, estilos_data, epoca):
+    tipo = celula.get("t", "n")
+    if tipo == "inlineStr":
+        inline = celula.find(f"{_NS}is")
+        return _texto_rico(inline) if inline is not None else None
+
+    valor = celula.findtext(f"{_NS}v")
+    if valor is None:
+        return None
+    if tipo == "s":
+        return strings[int(valor)]
+    if tipo in ("str", "e"):
+        return valor
+    if tipo == "b":
+        return valor == "1"
+    numero = float(valor)
+    if estilos_data and celula.get("s") in estilos_data:
+        return from_excel(numero, epoca)
+    return int(numero) if numero.is_integer() else numero
+
+def _linhas_xml(filepath):
+    with zipfile.ZipFile(filepath) as arquivo:
+        strings = _strings_compartilhadas(arquivo)
+        estilos_data = _estilos_data(arquivo)
+        caminho, epoca = _primeira_planilha(arquivo)
+        with arquivo.open(caminho) as xml:
+            for _, elemento in ET.iterparse(xml):
+                if elemento.tag != f"{_NS}row":
+                    continue
+                valores = {}
+                proxima = 0
+                for celula in elemento.iter(f"{_NS}c"):
+                    referencia = celula.get("r")
+                    coluna = _indice_coluna(referencia) if referencia else proxima
+                    valores[coluna] = _valor_celula(celula, strings, estilos_data, epoca)
+                    proxima = coluna + 1
+                elemento.clear()
+                if valores:
+                    linha = [None] * (max(valores) + 1)
+                    for coluna, valor in valores.items():
+                        linha[coluna] = valor
+                    yield tuple(linha)
+
+def _linhas_openpyxl(filepath):
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iterar_linhas(filepath):
+    """Gera as linhas da primeira planilha como tuplas de valores, uma de cada vez."""
+    try:
+        linhas = _linhas_xml(filepath)
+        primeira = next(linhas, None)
+    except (KeyError, IndexError, ValueError, ET.ParseError):
+        yield from _linhas_openpyxl(filepath)
+        return
+
+    if primeira is not None:
+        yield primeira
+        yield from linhas